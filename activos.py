@@ -0,0 +1,149 @@
+#!/usr/bin/env python3
+"""
+Recursos estáticos con huella de contenido.
+
+Como script (y como etapa de preprocess_all.py) copia las imágenes de
+data/processed/ y data/imagenes/ a data/activos/ con el hash de su
+contenido en el nombre (network_graph_web.3f2a9c1b0e.png) y escribe
+data/activos/manifest.json con la correspondencia ruta original -> ruta
+con huella. Un nombre con huella nunca cambia de contenido, así que el
+servidor lo envía como inmutable y el navegador no vuelve a pedirlo.
+
+La etapa escribe también index.html con las referencias reescritas a
+través del manifiesto y el manifiesto inyectado para las rutas que se
+construyen en JavaScript (data/processed/index.html); la etapa compresion
+lo precomprime y el servidor lo envía mientras siga al día. Si index.html
+o el manifiesto cambian después, el servidor reescribe la página al vuelo.
+Se conservan también los archivos del manifiesto anterior para que una
+página ya abierta no se quede sin imágenes tras una reconstrucción.
+"""
+
+import hashlib
+import re
+from pathlib import Path
+
+import codec_json
+import escritura
+
+BASE_DIR = Path(__file__).parent
+DIRECTORIO = 'data/activos'
+MANIFIESTO = f'{DIRECTORIO}/manifest.json'
+
+# Longitud de la huella (caracteres hexadecimales del SHA-256)
+LONGITUD_HUELLA = 10
+
+# Imágenes generadas por la construcción
+IMAGENES_PROCESADAS = [
+    'data/processed/network_graph.png',
+    'data/processed/network_graph_web.png',
+    'data/processed/timeline_graph.png',
+    'data/processed/timeline_graph_web.png',
+]
+
+# Árbol de imágenes subidas a mano (personajes, etc.)
+ARBOL_IMAGENES = 'data/imagenes'
+
+# Página cuyas referencias se reescriben y dónde se deja la versión reescrita
+PAGINA = 'index.html'
+PAGINA_REESCRITA = 'data/processed/index.html'
+
+EXTENSIONES_IMAGEN = {'.png', '.jpg', '.jpeg', '.gif', '.webp', '.svg'}
+
+
+def _imagenes_del_arbol():
+    raiz = BASE_DIR / ARBOL_IMAGENES
+    if not raiz.is_dir():
+        return []
+    return sorted(
+        ruta.relative_to(BASE_DIR).as_posix() for ruta in raiz.rglob('*')
+        if ruta.is_file() and ruta.suffix.lower() in EXTENSIONES_IMAGEN
+    )
+
+
+def entradas():
+    """
+    Entradas de la etapa: la página, las imágenes procesadas, el árbol de
+    imágenes (para que cualquier cambio dentro lo afecte) y cada imagen y
+    subdirectorio suyo (para detectar ediciones por mtime).
+    """
+    raiz = BASE_DIR / ARBOL_IMAGENES
+    directorios = sorted(
+        ruta.relative_to(BASE_DIR).as_posix() for ruta in raiz.rglob('*') if ruta.is_dir()
+    ) if raiz.is_dir() else []
+    return [PAGINA] + IMAGENES_PROCESADAS + [ARBOL_IMAGENES] + directorios + _imagenes_del_arbol()
+
+
+def ruta_con_huella(relativa, cuerpo):
+    """Ruta en data/activos/ con la huella del contenido antes de la extensión"""
+    ruta = Path(relativa).relative_to('data')
+    huella = hashlib.sha256(cuerpo).hexdigest()[:LONGITUD_HUELLA]
+    return f"{DIRECTORIO}/{ruta.parent.as_posix()}/{ruta.stem}.{huella}{ruta.suffix}"
+
+
+def leer_manifiesto():
+    try:
+        return codec_json.leer(BASE_DIR / MANIFIESTO)
+    except (OSError, ValueError):
+        return {}
+
+
+def generar_activos():
+    """Copia las imágenes con huella y escribe el manifiesto y la página reescrita"""
+    anterior = leer_manifiesto()
+    manifiesto = {}
+    copiados = 0
+    for relativa in IMAGENES_PROCESADAS + _imagenes_del_arbol():
+        origen = BASE_DIR / relativa
+        if not origen.exists():
+            continue
+        cuerpo = origen.read_bytes()
+        destino = ruta_con_huella(relativa, cuerpo)
+        if not (BASE_DIR / destino).exists():
+            (BASE_DIR / destino).parent.mkdir(parents=True, exist_ok=True)
+            escritura.escribir_atomico(BASE_DIR / destino, cuerpo)
+            copiados += 1
+        manifiesto[relativa] = destino
+
+    cuerpo = codec_json.volcar(manifiesto, ordenar=True)
+    (BASE_DIR / DIRECTORIO).mkdir(parents=True, exist_ok=True)
+    escritura.escribir_atomico(BASE_DIR / MANIFIESTO, cuerpo)
+
+    pagina = BASE_DIR / PAGINA
+    if pagina.exists():
+        (BASE_DIR / PAGINA_REESCRITA).parent.mkdir(parents=True, exist_ok=True)
+        escritura.escribir_atomico(BASE_DIR / PAGINA_REESCRITA,
+                                   reescribir_pagina(pagina.read_bytes(), manifiesto))
+
+    # Borrar las huellas que ya no usa ni este manifiesto ni el anterior
+    conservar = set(manifiesto.values()) | set(anterior.values()) | {MANIFIESTO}
+    borrados = 0
+    for ruta in (BASE_DIR / DIRECTORIO).rglob('*'):
+        if ruta.is_file() and ruta.relative_to(BASE_DIR).as_posix() not in conservar:
+            ruta.unlink()
+            borrados += 1
+
+    print(f"✓ {len(manifiesto)} recursos con huella ({copiados} nuevos, {borrados} obsoletos borrados)")
+    return manifiesto
+
+
+def reescribir_pagina(cuerpo, manifiesto):
+    """
+    Página HTML con las rutas del manifiesto sustituidas por sus versiones
+    con huella y el manifiesto disponible como window.MANIFIESTO_ACTIVOS.
+    """
+    texto = cuerpo.decode('utf-8')
+    if manifiesto:
+        # Las claves más largas primero para que ninguna tape a otra
+        patron = re.compile('|'.join(
+            re.escape(clave) for clave in sorted(manifiesto, key=len, reverse=True)
+        ))
+        texto = patron.sub(lambda m: manifiesto[m.group()], texto)
+    guion = ('<script>window.MANIFIESTO_ACTIVOS = '
+             + codec_json.volcar(manifiesto, compacto=True).decode('utf-8').replace('</', '<\\/')
+             + ';</script>\n')
+    texto = texto.replace('</head>', guion + '</head>', 1)
+    return texto.encode('utf-8')
+
+
+if __name__ == '__main__':
+    generar_activos()
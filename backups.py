@@ -0,0 +1,271 @@
+#!/usr/bin/env python3
+"""
+Historial de versiones de los archivos de data/ direccionado por contenido.
+
+Cada versión se guarda una sola vez en data/backups/objetos/ con su hash
+SHA-256 como nombre, así que las versiones repetidas (en cualquier archivo)
+no ocupan espacio extra. Los objetos se comprimen con zlib y, si hay una
+versión anterior del mismo archivo, también usándola como diccionario
+(zdict). zlib solo aprovecha los últimos 32 KB del diccionario, así que
+con versiones anteriores más grandes ni se intenta; y el objeto se guarda
+como delta solo si ocupa menos de UMBRAL_DELTA veces la versión completa
+comprimida. Las cadenas de deltas se limitan a MAX_CADENA para que
+restaurar siga siendo barato.
+
+El servidor registra las versiones en segundo plano (en_segundo_plano),
+en un único hilo para que se guarden en el orden de los guardados, fuera
+del candado del archivo.
+
+El índice de cada archivo (data/backups/indices/<archivo>) lista sus
+versiones y se poda según la política de retención: se conservan las
+RETENER_ULTIMAS más recientes y la última de cada uno de los RETENER_DIAS
+días anteriores. Los objetos que dejan de estar referenciados se borran.
+
+Uso:
+    python backups.py lista personajes.json
+    python backups.py restaurar personajes.json <hash>
+    python backups.py importar [--borrar]   # incorpora los *.json.bak* sueltos
+"""
+
+import argparse
+import hashlib
+import sys
+import threading
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from pathlib import Path
+
+import codec_json
+import escritura
+
+BASE_DIR = Path(__file__).parent
+DIRECTORIO = BASE_DIR / 'data' / 'backups'
+
+# Longitud máxima de una cadena de deltas antes de guardar una versión completa
+MAX_CADENA = 8
+
+# Fracción de la versión completa comprimida por debajo de la cual compensa
+# guardar el delta (si no, se pagaría la reconstrucción sin ahorrar nada)
+UMBRAL_DELTA = 0.9
+
+# Ventana de zlib: un diccionario más largo solo aporta sus últimos bytes
+MAX_BASE_DELTA = 32 * 1024
+
+# Hilo único para registrar versiones sin retrasar los guardados
+_HILO = ThreadPoolExecutor(max_workers=1, thread_name_prefix='backups')
+
+# Política de retención por archivo
+RETENER_ULTIMAS = 20
+RETENER_DIAS = 30
+
+
+def calcular_hash(cuerpo):
+    return hashlib.sha256(cuerpo).hexdigest()
+
+
+class AlmacenBackups:
+    """Almacén de versiones deduplicado y con deltas"""
+
+    def __init__(self, directorio=DIRECTORIO, deltas=True):
+        self.directorio = Path(directorio)
+        self.objetos = self.directorio / 'objetos'
+        self.indices = self.directorio / 'indices'
+        self.deltas = deltas
+        # Los objetos se comparten entre archivos: guardar y podar no se
+        # solapan, ni entre hilos ni entre procesos del servidor
+        self._candado = threading.Lock()
+
+    def _ruta_objeto(self, hash_):
+        return self.objetos / hash_[:2] / hash_[2:]
+
+    def _ruta_indice(self, archivo):
+        return self.indices / archivo
+
+    def _cabecera(self, hash_):
+        """Hash de la versión base de un objeto (None si está completo)"""
+        with open(self._ruta_objeto(hash_), 'rb') as f:
+            cabecera = f.readline().split()
+        return cabecera[1].decode('ascii') if cabecera[0] == b'D' else None
+
+    def _longitud_cadena(self, hash_):
+        longitud = 0
+        while (hash_ := self._cabecera(hash_)) is not None:
+            longitud += 1
+        return longitud
+
+    def versiones(self, archivo):
+        """Versiones guardadas de un archivo, de la más antigua a la más reciente"""
+        try:
+            return codec_json.leer(self._ruta_indice(archivo))
+        except FileNotFoundError:
+            return []
+
+    def coincidencias(self, archivo, prefijo):
+        """
+        Hashes distintos de las versiones de un archivo que empiezan por
+        prefijo (una versión que reaparece en el historial cuenta una vez)
+        """
+        return sorted({v['hash'] for v in self.versiones(archivo) if v['hash'].startswith(prefijo)})
+
+    def _escribir_indice(self, archivo, versiones):
+        self.indices.mkdir(parents=True, exist_ok=True)
+        cuerpo = codec_json.volcar(versiones)
+        escritura.escribir_atomico(self._ruta_indice(archivo), cuerpo)
+
+    def _escribir_objeto(self, hash_, cuerpo, base=None):
+        ruta = self._ruta_objeto(hash_)
+        ruta.parent.mkdir(parents=True, exist_ok=True)
+        completo = zlib.compress(cuerpo)
+        datos = b'Z\n' + completo
+        if base is not None:
+            compresor = zlib.compressobj(zdict=self.leer(base))
+            delta = compresor.compress(cuerpo) + compresor.flush()
+            if len(delta) < UMBRAL_DELTA * len(completo):
+                datos = b'D ' + base.encode('ascii') + b'\n' + delta
+        escritura.escribir_atomico(ruta, datos)
+
+    def leer(self, hash_):
+        """Contenido de una versión (reconstruye los deltas y verifica el hash)"""
+        with open(self._ruta_objeto(hash_), 'rb') as f:
+            cabecera = f.readline().split()
+            comprimido = f.read()
+        if cabecera[0] == b'D':
+            descompresor = zlib.decompressobj(zdict=self.leer(cabecera[1].decode('ascii')))
+            cuerpo = descompresor.decompress(comprimido) + descompresor.flush()
+        else:
+            cuerpo = zlib.decompress(comprimido)
+        if calcular_hash(cuerpo) != hash_:
+            raise ValueError(f"Backup corrupto: {hash_}")
+        return cuerpo
+
+    def guardar(self, archivo, cuerpo, fecha=None):
+        """
+        Registra una versión de un archivo. Si es idéntica a la última no
+        hace nada; si el contenido ya existe en el almacén solo se añade al
+        índice.
+
+        Returns:
+            El hash de la versión
+        """
+        hash_ = calcular_hash(cuerpo)
+        fecha = fecha or datetime.now().isoformat(timespec='seconds')
+        with self._candado, escritura.bloqueo_entre_procesos('backups'):
+            versiones = self.versiones(archivo)
+            if versiones and versiones[-1]['hash'] == hash_:
+                return hash_
+
+            if not self._ruta_objeto(hash_).exists():
+                base = None
+                if self.deltas and versiones:
+                    anterior = versiones[-1]
+                    if (anterior.get('tamano', 0) <= MAX_BASE_DELTA
+                            and self._ruta_objeto(anterior['hash']).exists()
+                            and self._longitud_cadena(anterior['hash']) < MAX_CADENA):
+                        base = anterior['hash']
+                self._escribir_objeto(hash_, cuerpo, base)
+
+            versiones.append({'hash': hash_, 'fecha': fecha, 'tamano': len(cuerpo)})
+            conservadas = retener(versiones)
+            self._escribir_indice(archivo, conservadas)
+            if len(conservadas) < len(versiones):
+                self._recoger_basura()
+        return hash_
+
+    def _recoger_basura(self):
+        """Borra los objetos que ningún índice necesita (directa o como base)"""
+        vivos = set()
+        for indice in self.indices.iterdir():
+            pendientes = [v['hash'] for v in self.versiones(indice.name)]
+            while pendientes:
+                hash_ = pendientes.pop()
+                if hash_ in vivos or not self._ruta_objeto(hash_).exists():
+                    continue
+                vivos.add(hash_)
+                base = self._cabecera(hash_)
+                if base is not None:
+                    pendientes.append(base)
+
+        for ruta in self.objetos.glob('*/*'):
+            if ruta.parent.name + ruta.name not in vivos:
+                ruta.unlink()
+
+
+def en_segundo_plano(funcion, *args):
+    """
+    Ejecuta funcion(*args) en el hilo de backups. Los errores se informan
+    pero no llegan a quien guardó: el archivo ya está escrito.
+    """
+    def informar(futuro):
+        error = futuro.exception()
+        if error is not None:
+            print(f"✗ No se pudo registrar la versión en el historial: {error}")
+    _HILO.submit(funcion, *args).add_done_callback(informar)
+
+
+def retener(versiones, ahora=None):
+    """Aplica la política de retención a una lista de versiones ordenada"""
+    ahora = ahora or datetime.now()
+    limite = (ahora - timedelta(days=RETENER_DIAS)).date()
+    conservar = set(range(max(0, len(versiones) - RETENER_ULTIMAS), len(versiones)))
+    ultima_del_dia = {}
+    for i, version in enumerate(versiones):
+        dia = datetime.fromisoformat(version['fecha']).date()
+        if dia >= limite:
+            ultima_del_dia[dia] = i
+    conservar.update(ultima_del_dia.values())
+    return [v for i, v in enumerate(versiones) if i in conservar]
+
+
+# Almacén compartido por server.py
+almacen = AlmacenBackups()
+
+
+def importar_sueltos(borrar=False):
+    """Incorpora al almacén los backups sueltos (*.json.bak, .bak2, ...) de data/"""
+    sueltos = sorted(
+        (BASE_DIR / 'data').glob('*.json.bak*'),
+        key=lambda r: r.stat().st_mtime
+    )
+    for ruta in sueltos:
+        archivo = ruta.name.split('.bak')[0]
+        fecha = datetime.fromtimestamp(ruta.stat().st_mtime).isoformat(timespec='seconds')
+        hash_ = almacen.guardar(archivo, ruta.read_bytes(), fecha)
+        print(f"✓ {ruta.name} → {archivo} {hash_[:12]}")
+        if borrar:
+            ruta.unlink()
+    print(f"✓ {len(sueltos)} backups importados")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    ordenes = parser.add_subparsers(dest='orden', required=True)
+    lista = ordenes.add_parser('lista', help='Listar las versiones de un archivo')
+    lista.add_argument('archivo')
+    restaurar = ordenes.add_parser('restaurar', help='Restaurar una versión en data/')
+    restaurar.add_argument('archivo')
+    restaurar.add_argument('hash')
+    importar = ordenes.add_parser('importar', help='Incorporar los *.json.bak* sueltos')
+    importar.add_argument('--borrar', action='store_true', help='Borrarlos tras importarlos')
+    args = parser.parse_args(argv)
+
+    if args.orden == 'lista':
+        for version in almacen.versiones(args.archivo):
+            print(f"{version['hash'][:12]}  {version['fecha']}  {version['tamano']:>8} bytes")
+    elif args.orden == 'restaurar':
+        coincidencias = almacen.coincidencias(args.archivo, args.hash)
+        if len(coincidencias) != 1:
+            print(f"✗ {len(coincidencias)} versiones coinciden con {args.hash}")
+            return 1
+        ruta = BASE_DIR / 'data' / args.archivo
+        if ruta.exists():
+            almacen.guardar(args.archivo, ruta.read_bytes())
+        escritura.escribir_atomico(ruta, almacen.leer(coincidencias[0]))
+        print(f"✓ {args.archivo} restaurado a {coincidencias[0][:12]}")
+    else:
+        importar_sueltos(borrar=args.borrar)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,319 @@
+#!/usr/bin/env python3
+"""
+Codificación binaria compacta de los JSON de data/ (MessagePack con tabla
+de textos).
+
+Los procesados repiten una y otra vez las mismas claves y valores cortos
+(data-tipo, color, etapa, "#fff"...). Aquí se codifican como un array
+MessagePack [VERSION, tabla, datos] donde:
+
+  - tabla es la lista de textos repetidos, los más frecuentes primero;
+  - las claves de los objetos son el índice de su texto en la tabla;
+  - los valores de texto que están en la tabla se escriben como una
+    extensión de tipo EXT_TEXTO cuyo contenido es el índice (big-endian).
+
+Como script (y como etapa de preprocess_all.py) escribe junto a cada JSON
+de data/processed/ su hermano .msgpack. El servidor lo envía a los clientes
+que lo piden en Accept (application/msgpack); para lo que no tenga hermano
+codifica al vuelo una vez por versión. Usa el paquete msgpack si está
+instalado (pip install msgpack) y si no un codificador propio que produce
+los mismos bytes.
+"""
+
+import struct
+from collections import Counter
+from pathlib import Path
+
+import codec_json
+import compresion
+import escritura
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+BASE_DIR = Path(__file__).parent
+
+VERSION = 1
+TIPO = 'application/msgpack'
+EXTENSION = '.msgpack'
+
+# Tipo de extensión MessagePack para las referencias a la tabla
+EXT_TEXTO = 1
+
+# Los valores más cortos no ahorran nada al pasar a referencia
+LONGITUD_MINIMA_VALOR = 4
+
+# Nombres con los que los clientes piden MessagePack
+TIPOS_ACEPTADOS = ('application/msgpack', 'application/x-msgpack', 'application/vnd.msgpack')
+
+# JSON procesados que se codifican en la construcción
+ARTEFACTOS = [a for a in compresion.ARTEFACTOS if a.endswith('.json')]
+
+
+class Referencia:
+    """Valor de texto sustituido por su índice en la tabla"""
+
+    __slots__ = ('indice',)
+
+    def __init__(self, indice):
+        self.indice = indice
+
+    def bytes(self):
+        if self.indice < 0x100:
+            return struct.pack('>B', self.indice)
+        if self.indice < 0x10000:
+            return struct.pack('>H', self.indice)
+        return struct.pack('>I', self.indice)
+
+
+def _contar(valor, claves, valores):
+    if isinstance(valor, dict):
+        for clave, v in valor.items():
+            claves[clave] += 1
+            _contar(v, claves, valores)
+    elif isinstance(valor, list):
+        for v in valor:
+            _contar(v, claves, valores)
+    elif isinstance(valor, str) and len(valor) >= LONGITUD_MINIMA_VALOR:
+        valores[valor] += 1
+
+
+def construir_tabla(datos):
+    """
+    Tabla de textos: todas las claves y los valores que aparecen más de una
+    vez, por frecuencia descendente (y alfabético a igualdad) para que los
+    más usados tengan los índices de un byte.
+    """
+    claves, valores = Counter(), Counter()
+    _contar(datos, claves, valores)
+    frecuencias = Counter(claves)
+    for texto, veces in valores.items():
+        if veces > 1:
+            frecuencias[texto] += veces
+    return sorted(frecuencias, key=lambda t: (-frecuencias[t], t))
+
+
+def _sustituir(valor, indices):
+    if isinstance(valor, dict):
+        return {indices[k]: _sustituir(v, indices) for k, v in valor.items()}
+    if isinstance(valor, list):
+        return [_sustituir(v, indices) for v in valor]
+    if isinstance(valor, str):
+        indice = indices.get(valor)
+        return Referencia(indice) if indice is not None and len(valor) >= LONGITUD_MINIMA_VALOR else valor
+    return valor
+
+
+# --- Codificador MessagePack propio (formato mínimo, como msgpack.packb) ---
+
+def _empaquetar(valor, salida):
+    if valor is None:
+        salida.append(0xc0)
+    elif valor is True:
+        salida.append(0xc3)
+    elif valor is False:
+        salida.append(0xc2)
+    elif isinstance(valor, int):
+        if 0 <= valor < 0x80:
+            salida.append(valor)
+        elif -0x20 <= valor < 0:
+            salida.append(valor & 0xff)
+        elif valor >= 0:
+            for limite, formato, marca in ((0x100, '>B', 0xcc), (0x10000, '>H', 0xcd),
+                                           (0x100000000, '>I', 0xce), (0x10000000000000000, '>Q', 0xcf)):
+                if valor < limite:
+                    salida.append(marca)
+                    salida += struct.pack(formato, valor)
+                    break
+            else:
+                raise OverflowError("Entero demasiado grande para MessagePack")
+        else:
+            for limite, formato, marca in ((0x80, '>b', 0xd0), (0x8000, '>h', 0xd1),
+                                           (0x80000000, '>i', 0xd2), (0x8000000000000000, '>q', 0xd3)):
+                if valor >= -limite:
+                    salida.append(marca)
+                    salida += struct.pack(formato, valor)
+                    break
+            else:
+                raise OverflowError("Entero demasiado grande para MessagePack")
+    elif isinstance(valor, float):
+        salida.append(0xcb)
+        salida += struct.pack('>d', valor)
+    elif isinstance(valor, str):
+        texto = valor.encode('utf-8')
+        n = len(texto)
+        if n < 0x20:
+            salida.append(0xa0 | n)
+        elif n < 0x100:
+            salida += struct.pack('>BB', 0xd9, n)
+        elif n < 0x10000:
+            salida += struct.pack('>BH', 0xda, n)
+        else:
+            salida += struct.pack('>BI', 0xdb, n)
+        salida += texto
+    elif isinstance(valor, Referencia):
+        contenido = valor.bytes()
+        salida += struct.pack('>Bb', {1: 0xd4, 2: 0xd5, 4: 0xd6}[len(contenido)], EXT_TEXTO)
+        salida += contenido
+    elif isinstance(valor, (list, tuple)):
+        n = len(valor)
+        if n < 0x10:
+            salida.append(0x90 | n)
+        elif n < 0x10000:
+            salida += struct.pack('>BH', 0xdc, n)
+        else:
+            salida += struct.pack('>BI', 0xdd, n)
+        for v in valor:
+            _empaquetar(v, salida)
+    elif isinstance(valor, dict):
+        n = len(valor)
+        if n < 0x10:
+            salida.append(0x80 | n)
+        elif n < 0x10000:
+            salida += struct.pack('>BH', 0xde, n)
+        else:
+            salida += struct.pack('>BI', 0xdf, n)
+        for k, v in valor.items():
+            _empaquetar(k, salida)
+            _empaquetar(v, salida)
+    else:
+        raise TypeError(f"Tipo no admitido en MessagePack: {type(valor).__name__}")
+
+
+def _extension(valor):
+    if isinstance(valor, Referencia):
+        return msgpack.ExtType(EXT_TEXTO, valor.bytes())
+    raise TypeError(f"Tipo no admitido en MessagePack: {type(valor).__name__}")
+
+
+def codificar(datos):
+    """Bytes MessagePack con tabla de textos de unos datos JSON"""
+    tabla = construir_tabla(datos)
+    indices = {texto: i for i, texto in enumerate(tabla)}
+    documento = [VERSION, tabla, _sustituir(datos, indices)]
+    if msgpack is not None:
+        return msgpack.packb(documento, default=_extension, use_bin_type=True)
+    salida = bytearray()
+    _empaquetar(documento, salida)
+    return bytes(salida)
+
+
+# --- Decodificador (para comprobar la ida y vuelta y para clientes Python) ---
+
+_ANCHOS = {0xcc: '>B', 0xcd: '>H', 0xce: '>I', 0xcf: '>Q',
+           0xd0: '>b', 0xd1: '>h', 0xd2: '>i', 0xd3: '>q', 0xca: '>f', 0xcb: '>d'}
+
+
+class _Lector:
+    def __init__(self, cuerpo, tabla=None):
+        self.cuerpo = cuerpo
+        self.pos = 0
+        self.tabla = tabla
+
+    def _leer(self, formato):
+        valor, = struct.unpack_from(formato, self.cuerpo, self.pos)
+        self.pos += struct.calcsize(formato)
+        return valor
+
+    def _texto(self, n):
+        texto = self.cuerpo[self.pos:self.pos + n].decode('utf-8')
+        self.pos += n
+        return texto
+
+    def _clave(self):
+        clave = self.valor()
+        return self.tabla[clave] if self.tabla is not None and isinstance(clave, int) else clave
+
+    def _extension(self, n):
+        tipo = self._leer('>b')
+        contenido = self.cuerpo[self.pos:self.pos + n]
+        self.pos += n
+        if tipo != EXT_TEXTO or self.tabla is None:
+            raise ValueError(f"Extensión MessagePack desconocida: {tipo}")
+        return self.tabla[int.from_bytes(contenido, 'big')]
+
+    def valor(self):
+        marca = self.cuerpo[self.pos]
+        self.pos += 1
+        if marca < 0x80:
+            return marca
+        if marca >= 0xe0:
+            return marca - 0x100
+        if 0x80 <= marca <= 0x8f:
+            return {self._clave(): self.valor() for _ in range(marca & 0x0f)}
+        if 0x90 <= marca <= 0x9f:
+            return [self.valor() for _ in range(marca & 0x0f)]
+        if 0xa0 <= marca <= 0xbf:
+            return self._texto(marca & 0x1f)
+        if marca == 0xc0:
+            return None
+        if marca in (0xc2, 0xc3):
+            return marca == 0xc3
+        if marca in _ANCHOS:
+            return self._leer(_ANCHOS[marca])
+        if marca in (0xd9, 0xda, 0xdb):
+            return self._texto(self._leer({0xd9: '>B', 0xda: '>H', 0xdb: '>I'}[marca]))
+        if marca in (0xdc, 0xdd):
+            return [self.valor() for _ in range(self._leer('>H' if marca == 0xdc else '>I'))]
+        if marca in (0xde, 0xdf):
+            return {self._clave(): self.valor() for _ in range(self._leer('>H' if marca == 0xde else '>I'))}
+        if marca in (0xd4, 0xd5, 0xd6, 0xd7, 0xd8):
+            return self._extension(1 << (marca - 0xd4))
+        raise ValueError(f"Marca MessagePack no admitida: {marca:#x}")
+
+
+def decodificar(cuerpo):
+    """Datos JSON a partir de los bytes producidos por codificar()"""
+    if cuerpo[:1] != b'\x93':
+        raise ValueError("No es un documento binario de Radio Micelio")
+    lector = _Lector(cuerpo)
+    lector.pos = 1
+    version = lector.valor()
+    if version != VERSION:
+        raise ValueError(f"Versión de formato binario no admitida: {version}")
+    lector.tabla = lector.valor()
+    return lector.valor()
+
+
+def hermano(ruta, mtime_ns):
+    """
+    Ruta del .msgpack de un JSON si existe y no es más antiguo que el
+    original (mtime_ns). Devuelve None en otro caso.
+    """
+    candidato = Path(str(ruta) + EXTENSION)
+    try:
+        if candidato.stat().st_mtime_ns >= mtime_ns:
+            return candidato
+    except FileNotFoundError:
+        pass
+    return None
+
+
+def prefiere_binario(accept):
+    """Indica si la cabecera Accept pide MessagePack antes que JSON"""
+    return compresion.prefiere_tipo(accept, TIPOS_ACEPTADOS)
+
+
+def codificar_procesados(artefactos=ARTEFACTOS):
+    """Escribe el hermano .msgpack de cada JSON procesado"""
+    total = tamano_json = tamano_binario = 0
+    for relativa in artefactos:
+        ruta = BASE_DIR / relativa
+        if not ruta.exists():
+            continue
+        cuerpo = ruta.read_bytes()
+        binario = codificar(codec_json.cargar(cuerpo))
+        escritura.escribir_atomico(Path(str(ruta) + EXTENSION), binario)
+        total += 1
+        tamano_json += len(cuerpo)
+        tamano_binario += len(binario)
+
+    ahorro = 100 - 100 * tamano_binario / tamano_json if tamano_json else 0
+    print(f"✓ {total} procesados en MessagePack ({tamano_binario / 1024:.0f} KB, "
+          f"{ahorro:.0f}% menos que el JSON)")
+
+
+if __name__ == '__main__':
+    codificar_procesados()
@@ -0,0 +1,244 @@
+#!/usr/bin/env python3
+"""
+Búsqueda de texto en los datos del universo.
+
+Índice invertido en memoria sobre los campos de texto de las colecciones
+(descripcion, letra, resumen, sinopsis...). El texto se normaliza para
+español: minúsculas, sin tildes ni diéresis (canción = cancion), sin
+palabras vacías y con un recorte simple de sufijos (cuánticos = cuántico,
+felinas = felino), de modo que las variantes de una palabra coinciden.
+
+Cada colección se indexa por separado y se reindexa solo cuando cambia el
+ETag de su archivo, así que un guardado solo cuesta reindexar el archivo
+guardado. Los resultados se ordenan con BM25, ponderando más los títulos
+y nombres, e incluyen el campo y un fragmento de texto donde aparece.
+"""
+
+import functools
+import math
+import re
+import unicodedata
+from collections import Counter
+
+# Colección -> archivo de data/ (introduccion es un único documento)
+COLECCIONES = {
+    'introduccion': 'introduccion.json',
+    'personajes': 'personajes.json',
+    'localizaciones': 'localizaciones.json',
+    'canciones': 'canciones.json',
+    'tramas': 'tramas.json',
+    'timeline': 'timeline.json',
+}
+
+# Campos de texto indexados y su peso en la puntuación
+CAMPOS = {
+    'nombre': 3.0,
+    'titulo': 3.0,
+    'logline': 1.5,
+    'descripcion': 1.0,
+    'resumen': 1.0,
+    'sinopsis': 1.0,
+    'fundamentacion': 1.0,
+    'storyline': 1.0,
+    'significado': 1.0,
+    'letra': 1.0,
+    'motivaciones': 0.5,
+    'habilidades': 0.5,
+}
+
+PALABRAS_VACIAS = frozenset("""
+    a al algo algunas algunos ante antes como con contra cual cuando de del
+    desde donde durante e el ella ellas ellos en entre era es esa esas ese eso
+    esos esta estas este esto estos fue ha hay hasta la las le les lo los mas
+    me mi mucho muy nada ni no nos o os otra otras otro otros para pero poco
+    por porque que quien se sea ser si sin sobre son su sus tambien tanto te
+    tiene todo todos tu un una uno unos y ya yo
+""".split())
+
+# Sufijos que se recortan (de más largo a más corto); el resto debe quedar
+# con al menos 3 letras para no confundir palabras cortas
+SUFIJOS = (
+    'amientos', 'imientos', 'amiento', 'imiento', 'aciones', 'uciones',
+    'idades', 'mente', 'acion', 'ucion', 'ancia', 'encia', 'istas', 'ismos',
+    'ables', 'ibles', 'idad', 'ista', 'ismo', 'able', 'ible', 'osos', 'osas',
+    'ivos', 'ivas', 'oso', 'osa', 'ivo', 'iva', 'es', 'os', 'as', 's', 'o', 'a', 'e',
+)
+
+_PALABRA = re.compile(r'\w+')
+_ETIQUETA_HTML = re.compile(r'<[^>]+>')
+
+# Parámetros de BM25
+K1 = 1.2
+B = 0.75
+
+MAX_FRAGMENTO = 160
+
+
+@functools.lru_cache(maxsize=None)
+def _plegar_caracter(c):
+    """Carácter sin marcas diacríticas (siempre un solo carácter)"""
+    base = unicodedata.normalize('NFD', c)[0]
+    return base.lower() if len(base.lower()) == 1 else c
+
+
+def plegar(texto):
+    """Minúsculas sin tildes; conserva la longitud para mapear posiciones"""
+    return ''.join(_plegar_caracter(c) for c in texto)
+
+
+@functools.lru_cache(maxsize=65536)
+def raiz(palabra):
+    """Recorte de sufijos para agrupar variantes de una palabra plegada"""
+    for sufijo in SUFIJOS:
+        if palabra.endswith(sufijo) and len(palabra) - len(sufijo) >= 3:
+            return palabra[:-len(sufijo)]
+    return palabra
+
+
+def terminos(texto):
+    """Raíces de las palabras significativas de un texto, con su posición"""
+    for m in _PALABRA.finditer(plegar(texto)):
+        palabra = m.group()
+        if palabra not in PALABRAS_VACIAS and not palabra.isdigit():
+            yield raiz(palabra), m.start(), m.end()
+
+
+def _texto(valor):
+    """Texto plano de un campo (las listas se unen por líneas)"""
+    if isinstance(valor, list):
+        valor = '\n'.join(v for v in valor if isinstance(v, str))
+    if not isinstance(valor, str):
+        return ''
+    return _ETIQUETA_HTML.sub('', valor)
+
+
+def _documentos(coleccion, datos):
+    """(id, título, registro) de cada documento de una colección"""
+    if isinstance(datos, dict):
+        yield coleccion, datos.get('titulo') or coleccion, datos
+        return
+    for registro in datos if isinstance(datos, list) else []:
+        if isinstance(registro, dict) and registro.get('id'):
+            yield registro['id'], registro.get('nombre') or registro.get('titulo') or registro['id'], registro
+
+
+class IndiceParcial:
+    """Postings de una versión de una colección: término -> {(id, campo): tf}"""
+
+    def __init__(self, coleccion, etag, datos, anterior=None):
+        self.etag = etag
+        self.postings = {}
+        self.longitudes = {}
+        self.textos = {}
+        self.titulos = {}
+        # Análisis por texto; al reindexar se reutiliza el de la versión
+        # anterior, así que solo se tokenizan los textos que cambiaron
+        self.analisis = {}
+        previo = anterior.analisis if anterior is not None else {}
+        for id_doc, titulo, registro in _documentos(coleccion, datos):
+            self.titulos[id_doc] = titulo
+            for campo in CAMPOS:
+                texto = _texto(registro.get(campo))
+                if not texto:
+                    continue
+                frecuencias = previo.get(texto)
+                if frecuencias is None:
+                    frecuencias = Counter(t for t, _, _ in terminos(texto))
+                self.analisis[texto] = frecuencias
+                clave = (id_doc, campo)
+                self.textos[clave] = texto
+                self.longitudes[clave] = sum(frecuencias.values())
+                for termino, tf in frecuencias.items():
+                    self.postings.setdefault(termino, {})[clave] = tf
+        self.suma_longitudes = sum(self.longitudes.values())
+
+
+def fragmento(texto, raices):
+    """Trozo del texto alrededor de la primera aparición de algún término"""
+    for termino, inicio, fin in terminos(texto):
+        if termino in raices:
+            break
+    else:
+        inicio = fin = 0
+    mitad = max(0, (MAX_FRAGMENTO - (fin - inicio)) // 2)
+    desde = max(0, inicio - mitad)
+    hasta = min(len(texto), fin + mitad)
+    trozo = ' '.join(texto[desde:hasta].split())
+    return ('…' if desde > 0 else '') + trozo + ('…' if hasta < len(texto) else '')
+
+
+class Buscador:
+    """Índice de búsqueda sobre todas las colecciones"""
+
+    def __init__(self):
+        self.parciales = {}
+
+    def actualizar(self, coleccion, entrada):
+        """Reindexa una colección si su archivo cambió (entrada de caché o None)"""
+        if entrada is None:
+            self.parciales.pop(coleccion, None)
+            return
+        parcial = self.parciales.get(coleccion)
+        if parcial is None or parcial.etag != entrada.etag:
+            self.parciales[coleccion] = IndiceParcial(coleccion, entrada.etag, entrada.datos, parcial)
+
+    def buscar(self, consulta, limite=20, colecciones=None):
+        """
+        Busca los términos de la consulta (todas las palabras deben aparecer
+        en el documento, en el mismo campo o en campos distintos).
+
+        Returns:
+            Lista de resultados ordenados por puntuación descendente
+        """
+        raices = {t for t, _, _ in terminos(consulta)}
+        if not raices:
+            return []
+        parciales = {
+            c: p for c, p in self.parciales.items()
+            if colecciones is None or c in colecciones
+        }
+
+        # Estadísticas globales para BM25
+        total_campos = sum(len(p.longitudes) for p in parciales.values()) or 1
+        longitud_media = sum(p.suma_longitudes for p in parciales.values()) / total_campos
+        idf = {}
+        for termino in raices:
+            df = sum(len(p.postings.get(termino, ())) for p in parciales.values())
+            idf[termino] = math.log(1 + (total_campos - df + 0.5) / (df + 0.5))
+
+        resultados = []
+        for coleccion, parcial in parciales.items():
+            puntuaciones = {}
+            encontrados = {}
+            mejor_campo = {}
+            for termino in raices:
+                for (id_doc, campo), tf in parcial.postings.get(termino, {}).items():
+                    longitud = parcial.longitudes[(id_doc, campo)]
+                    bm25 = idf[termino] * tf * (K1 + 1) / (
+                        tf + K1 * (1 - B + B * longitud / longitud_media)
+                    )
+                    puntos = CAMPOS[campo] * bm25
+                    puntuaciones[id_doc] = puntuaciones.get(id_doc, 0.0) + puntos
+                    encontrados.setdefault(id_doc, set()).add(termino)
+                    if puntos > mejor_campo.get(id_doc, (None, 0.0))[1]:
+                        mejor_campo[id_doc] = (campo, puntos)
+
+            for id_doc, puntuacion in puntuaciones.items():
+                if encontrados[id_doc] != raices:
+                    continue
+                campo = mejor_campo[id_doc][0]
+                resultados.append({
+                    'coleccion': coleccion,
+                    'id': id_doc,
+                    'titulo': parcial.titulos[id_doc],
+                    'campo': campo,
+                    'puntuacion': round(puntuacion, 4),
+                    '_texto': parcial.textos[(id_doc, campo)],
+                })
+
+        resultados.sort(key=lambda r: -r['puntuacion'])
+        resultados = resultados[:limite]
+        # Los fragmentos solo se calculan para los resultados devueltos
+        for r in resultados:
+            r['fragmento'] = fragmento(r.pop('_texto'), raices)
+        return resultados
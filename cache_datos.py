@@ -0,0 +1,161 @@
+#!/usr/bin/env python3
+"""
+Caché en memoria de los archivos servidos por server.py (JSON de /data y
+páginas HTML).
+
+Cada entrada guarda los bytes tal como están en disco, su ETag fuerte
+(hash del contenido) y, bajo demanda, el JSON parseado. Una entrada se
+considera válida mientras el archivo conserve su mtime y tamaño, así que
+las reescrituras hechas por otros procesos (preprocess_all.py) se detectan
+con un simple stat; los guardados del propio servidor la actualizan
+directamente con actualizar().
+
+Las versiones comprimidas (gzip/brotli) se toman de los hermanos .gz/.br
+generados en la construcción o, si no existen, se comprimen una sola vez
+por versión del archivo. Lo mismo con la versión MessagePack (binario.py):
+el hermano .msgpack de la construcción o, si falta, codificada una vez.
+"""
+
+import hashlib
+from pathlib import Path
+
+import binario
+import codec_json
+import compresion
+import metricas
+
+
+class EntradaCache:
+    """Contenido cacheado de un archivo (ruta None para contenido generado)"""
+
+    __slots__ = ('ruta', 'mtime_ns', 'tamano', 'cuerpo', 'etag', '_datos',
+                 '_codificados', '_codificaciones', '_binaria')
+
+    def __init__(self, ruta, cuerpo, mtime_ns, tamano, datos=None):
+        self.ruta = ruta
+        self.cuerpo = cuerpo
+        self.mtime_ns = mtime_ns
+        self.tamano = tamano
+        self.etag = calcular_etag(cuerpo)
+        self._datos = datos
+        self._codificados = {}
+        self._codificaciones = None
+        self._binaria = None
+
+    @property
+    def datos(self):
+        """JSON parseado; se calcula la primera vez que se pide"""
+        if self._datos is None:
+            self._datos = codec_json.cargar(self.cuerpo)
+        return self._datos
+
+    def codificaciones(self):
+        """Codificaciones que se pueden servir: las producibles y las precomprimidas"""
+        if self._codificaciones is None:
+            disponibles = compresion.codificaciones_disponibles()
+            if ('br' not in disponibles and self.ruta is not None
+                    and compresion.precomprimido(self.ruta, 'br', self.mtime_ns)):
+                disponibles = ('br',) + disponibles
+            self._codificaciones = disponibles
+        return self._codificaciones
+
+    def codificado(self, codificacion):
+        """Contenido en la codificación pedida; se obtiene una sola vez por versión"""
+        if codificacion not in self._codificados:
+            hermano = None
+            if self.ruta is not None:
+                hermano = compresion.precomprimido(self.ruta, codificacion, self.mtime_ns)
+            if hermano is not None:
+                cuerpo = hermano.read_bytes()
+            else:
+                cuerpo = compresion.comprimir(self.cuerpo, codificacion)
+            self._codificados[codificacion] = cuerpo
+        return self._codificados[codificacion]
+
+    def binaria(self):
+        """Entrada con la versión MessagePack del contenido (con su propio ETag)"""
+        if self._binaria is None:
+            hermano = None
+            if self.ruta is not None:
+                hermano = binario.hermano(self.ruta, self.mtime_ns)
+            cuerpo = hermano.read_bytes() if hermano is not None else binario.codificar(self.datos)
+            self._binaria = EntradaCache(None, cuerpo, self.mtime_ns, len(cuerpo))
+        return self._binaria
+
+
+def calcular_etag(cuerpo):
+    """ETag fuerte a partir del contenido"""
+    return '"' + hashlib.sha256(cuerpo).hexdigest()[:32] + '"'
+
+
+def etag_coincide(if_none_match, *etags):
+    """
+    Evalúa una cabecera If-None-Match o If-Match (lista, comodín y prefijo
+    W/) contra uno o varios ETags
+    """
+    if not if_none_match:
+        return False
+    for candidato in if_none_match.split(','):
+        candidato = candidato.strip()
+        if candidato == '*':
+            return True
+        if candidato.startswith('W/'):
+            candidato = candidato[2:]
+        if candidato in etags:
+            return True
+    return False
+
+
+class CacheDatos:
+    """Caché de archivos de un directorio, indexada por ruta relativa"""
+
+    def __init__(self, directorio, nombre=None):
+        self.directorio = Path(directorio).resolve()
+        self.nombre = nombre or self.directorio.name
+        self._entradas = {}
+
+    def resolver(self, relativa):
+        """Ruta absoluta dentro del directorio, o None si intenta salir de él"""
+        ruta = (self.directorio / relativa).resolve()
+        if ruta != self.directorio and self.directorio not in ruta.parents:
+            return None
+        return ruta
+
+    def obtener(self, relativa):
+        """
+        Devuelve la entrada de un archivo, releyéndolo solo si cambió.
+
+        Returns:
+            EntradaCache, o None si el archivo no existe o está fuera del directorio
+        """
+        ruta = self.resolver(relativa)
+        if ruta is None:
+            return None
+        try:
+            info = ruta.stat()
+        except (FileNotFoundError, NotADirectoryError):
+            self._entradas.pop(relativa, None)
+            return None
+
+        entrada = self._entradas.get(relativa)
+        if entrada is not None and entrada.mtime_ns == info.st_mtime_ns and entrada.tamano == info.st_size:
+            metricas.CACHE.inc(cache=self.nombre, resultado='acierto')
+            return entrada
+        metricas.CACHE.inc(cache=self.nombre, resultado='fallo')
+
+        cuerpo = ruta.read_bytes()
+        entrada = EntradaCache(ruta, cuerpo, info.st_mtime_ns, info.st_size)
+        self._entradas[relativa] = entrada
+        return entrada
+
+    def actualizar(self, relativa, cuerpo, datos=None):
+        """Registra el contenido recién escrito en disco sin volver a leerlo"""
+        ruta = self.resolver(relativa)
+        info = ruta.stat()
+        entrada = EntradaCache(ruta, cuerpo, info.st_mtime_ns, info.st_size, datos)
+        self._entradas[relativa] = entrada
+        return entrada
+
+    def invalidar(self, relativa):
+        """Descarta la entrada de un archivo"""
+        self._entradas.pop(relativa, None)
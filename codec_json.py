@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+"""
+Lectura y escritura de JSON para todo el proyecto.
+
+Usa orjson si está instalado (pip install orjson) y si no el módulo json
+de la biblioteca estándar. Hay dos formatos de salida: el legible con el
+que se guardan los archivos de data/ (sangría de 2 espacios, UTF-8 sin
+escapar) y uno compacto sin espacios para la red. Si orjson no puede con
+algún valor (enteros de más de 64 bits) o con la entrada (NaN, Infinity)
+se recurre a json.
+
+Los dos motores producen el mismo JSON pero no siempre los mismos bytes:
+los números en notación exponencial se escriben distinto (orjson 1e16, json
+1e+16) y orjson escribe NaN e infinitos como null.
+
+Los archivos se escriben con escritura.escribir_atomico: quien los lee a
+la vez que se reconstruyen (el servidor) nunca ve uno a medias.
+"""
+
+import json
+
+import escritura
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+MOTOR = 'orjson' if orjson is not None else 'json'
+
+
+def cargar(contenido):
+    """Parsea JSON desde bytes o texto"""
+    if orjson is not None:
+        try:
+            return orjson.loads(contenido)
+        except orjson.JSONDecodeError:
+            # json admite NaN/Infinity y da los mensajes de error habituales
+            pass
+    return json.loads(contenido)
+
+
+def leer(ruta):
+    """Parsea un archivo JSON"""
+    with open(ruta, 'rb') as f:
+        return cargar(f.read())
+
+
+def volcar(datos, compacto=False, ordenar=False, default=None):
+    """
+    Serializa a bytes UTF-8.
+
+    Args:
+        compacto: sin espacios ni saltos de línea (si no, sangría de 2)
+        ordenar: claves de los objetos en orden alfabético
+        default: conversión para los tipos que JSON no admite (como en json.dumps)
+    """
+    if orjson is not None:
+        opciones = orjson.OPT_PASSTHROUGH_DATETIME
+        if not compacto:
+            opciones |= orjson.OPT_INDENT_2
+        if ordenar:
+            opciones |= orjson.OPT_SORT_KEYS
+        try:
+            return orjson.dumps(datos, default=default, option=opciones)
+        except orjson.JSONEncodeError:
+            pass
+    if compacto:
+        texto = json.dumps(datos, ensure_ascii=False, separators=(',', ':'),
+                           sort_keys=ordenar, default=default)
+    else:
+        texto = json.dumps(datos, ensure_ascii=False, indent=2, sort_keys=ordenar, default=default)
+    return texto.encode('utf-8')
+
+
+def escribir(ruta, datos, compacto=False, ordenar=False, default=None):
+    """Serializa y escribe un archivo JSON de forma atómica"""
+    cuerpo = volcar(datos, compacto=compacto, ordenar=ordenar, default=default)
+    escritura.escribir_atomico(ruta, cuerpo)
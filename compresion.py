@@ -0,0 +1,186 @@
+#!/usr/bin/env python3
+"""
+Compresión de artefactos estáticos y procesados.
+
+Como script (y como etapa de preprocess_all.py) escribe junto a index.html,
+timeline_editor.html y cada JSON de data/processed/ sus versiones .gz y,
+si el paquete brotli está instalado, .br. El servidor las envía tal cual
+según Accept-Encoding; para lo que no esté precomprimido comprime al vuelo.
+"""
+
+import gzip
+import zlib
+from pathlib import Path
+
+import escritura
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+BASE_DIR = Path(__file__).parent
+
+# Extensión de los archivos precomprimidos por codificación
+EXTENSIONES = {'br': '.br', 'gzip': '.gz'}
+
+# Sufijo del ETag de cada codificación: cada representación lleva su propio
+# validador fuerte para que cachés e If-Range no mezclen cuerpos
+SUFIJOS_ETAG = {'br': '-br', 'gzip': '-gz'}
+
+# Tipos de contenido que merece la pena comprimir
+TIPOS_COMPRIMIBLES = (
+    'application/json', 'application/x-ndjson', 'application/javascript',
+    'text/', 'image/svg+xml',
+)
+
+# Artefactos que se precomprimen en la etapa de construcción
+ARTEFACTOS = [
+    'index.html',
+    'timeline_editor.html',
+    'data/processed/index.html',
+    'data/processed/personajes_processed.json',
+    'data/processed/localizaciones_processed.json',
+    'data/processed/canciones_processed.json',
+    'data/processed/tramas_processed.json',
+    'data/processed/introduccion_processed.json',
+    'data/processed/timeline_processed.json',
+    'data/processed/network_data.json',
+    'data/processed/timeline_visual_data.json',
+]
+
+
+def codificaciones_disponibles():
+    """Codificaciones que este proceso puede producir, en orden de preferencia"""
+    return ('br', 'gzip') if brotli is not None else ('gzip',)
+
+
+def calidades(cabecera):
+    """
+    Valores q de una cabecera Accept o Accept-Encoding: {nombre: calidad}.
+    Los nombres van en minúsculas; sin q la calidad es 1.
+    """
+    aceptadas = {}
+    for parte in (cabecera or '').split(','):
+        nombre, _, parametros = parte.strip().partition(';')
+        calidad = 1.0
+        for parametro in parametros.split(';'):
+            parametro = parametro.strip()
+            if parametro.startswith('q='):
+                try:
+                    calidad = float(parametro[2:])
+                except ValueError:
+                    calidad = 0.0
+        aceptadas[nombre.strip().lower()] = calidad
+    return aceptadas
+
+
+def elegir_codificacion(accept_encoding, disponibles):
+    """
+    Elige la codificación a usar según la cabecera Accept-Encoding.
+
+    Respeta los valores q (q=0 excluye) y, a igualdad, el orden de
+    disponibles. Devuelve None si la respuesta debe ir sin comprimir.
+    """
+    if not accept_encoding:
+        return None
+    aceptadas = calidades(accept_encoding)
+
+    mejor, mejor_calidad = None, 0.0
+    for codificacion in disponibles:
+        calidad = aceptadas.get(codificacion, aceptadas.get('*', 0.0))
+        if calidad > mejor_calidad:
+            mejor, mejor_calidad = codificacion, calidad
+    return mejor
+
+
+def prefiere_tipo(accept, tipos):
+    """
+    Indica si la cabecera Accept pide alguno de tipos antes que JSON. Hace
+    falta nombrarlo explícitamente: */* o la ausencia de Accept dan JSON.
+    """
+    if not accept:
+        return False
+    aceptados = calidades(accept)
+    pedido = max((aceptados.get(t, 0.0) for t in tipos), default=0.0)
+    json = aceptados.get('application/json', aceptados.get('application/*', aceptados.get('*/*', 0.0)))
+    return pedido > 0 and pedido >= json
+
+
+def etag_codificado(etag, codificacion):
+    """ETag de la representación comprimida con codificacion (None: el mismo)"""
+    if codificacion is None or not etag.endswith('"'):
+        return etag
+    return etag[:-1] + SUFIJOS_ETAG[codificacion] + '"'
+
+
+def variantes_etag(etag):
+    """ETag sin comprimir y los de todas sus codificaciones (para If-None-Match/If-Match)"""
+    return (etag, *(etag_codificado(etag, c) for c in SUFIJOS_ETAG))
+
+
+def es_comprimible(tipo_contenido):
+    """Indica si un Content-Type se beneficia de compresión"""
+    return tipo_contenido.startswith(TIPOS_COMPRIMIBLES)
+
+
+def comprimir(cuerpo, codificacion, maxima=False):
+    """Comprime bytes con gzip o brotli; maxima usa el nivel más alto (para precompresión)"""
+    if codificacion == 'br':
+        return brotli.compress(cuerpo, quality=11 if maxima else 5)
+    # mtime=0 para que el mismo contenido produzca siempre los mismos bytes
+    return gzip.compress(cuerpo, compresslevel=9 if maxima else 6, mtime=0)
+
+
+async def comprimir_flujo(trozos):
+    """
+    Comprime con gzip un flujo asíncrono de trozos. Cada trozo sale en
+    cuanto se comprime (vaciado con Z_SYNC_FLUSH), así que el cliente puede
+    ir procesándolo sin esperar al final.
+    """
+    compresor = zlib.compressobj(6, zlib.DEFLATED, 31)
+    async for trozo in trozos:
+        salida = compresor.compress(trozo) + compresor.flush(zlib.Z_SYNC_FLUSH)
+        if salida:
+            yield salida
+    yield compresor.flush()
+
+
+def precomprimido(ruta, codificacion, mtime_ns):
+    """
+    Ruta de la versión precomprimida de un archivo si existe y no es más
+    antigua que el original (mtime_ns). Devuelve None en otro caso.
+    """
+    hermano = Path(str(ruta) + EXTENSIONES[codificacion])
+    try:
+        if hermano.stat().st_mtime_ns >= mtime_ns:
+            return hermano
+    except FileNotFoundError:
+        pass
+    return None
+
+
+def salidas(artefactos=ARTEFACTOS):
+    """Hermanos precomprimidos que produce comprimir_estaticos en este entorno"""
+    return [a + EXTENSIONES[c] for a in artefactos for c in codificaciones_disponibles()]
+
+
+def comprimir_estaticos(artefactos=ARTEFACTOS):
+    """Escribe los hermanos .gz (y .br si hay brotli) de cada artefacto"""
+    total = 0
+    for relativa in artefactos:
+        ruta = BASE_DIR / relativa
+        if not ruta.exists():
+            continue
+        cuerpo = ruta.read_bytes()
+        for codificacion in codificaciones_disponibles():
+            comprimido = comprimir(cuerpo, codificacion, maxima=True)
+            # Atómico: el servidor usa el hermano en cuanto su mtime es reciente
+            escritura.escribir_atomico(Path(str(ruta) + EXTENSIONES[codificacion]), comprimido)
+        total += 1
+
+    formatos = ' y '.join(EXTENSIONES[c] for c in codificaciones_disponibles())
+    print(f"✓ {total} artefactos precomprimidos ({formatos})")
+
+if __name__ == '__main__':
+    comprimir_estaticos()
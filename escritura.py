@@ -0,0 +1,227 @@
+#!/usr/bin/env python3
+"""
+Escritura de archivos de datos fuera del bucle de eventos.
+
+La serialización y la E/S de disco de los guardados se ejecutan en un pool
+de hilos acotado, cada archivo se escribe en un temporal con fsync y se
+reemplaza con un rename atómico, y un candado asyncio por archivo ordena los
+guardados concurrentes sobre el mismo archivo. Mientras tanto el bucle de
+eventos sigue atendiendo lecturas. escribir_lote aplica lo mismo a varios
+archivos que deben cambiar juntos.
+
+Con varios procesos de servidor (modo producción) el candado de cada
+archivo es además un flock sobre data/.candados/<archivo>.lock, de modo que
+los guardados de distintos workers tampoco se solapan. En sistemas sin
+fcntl solo se ordenan los guardados dentro del proceso.
+"""
+
+import asyncio
+import functools
+import os
+import stat
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from pathlib import Path
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+# Pool acotado para serialización y E/S de guardados
+MAX_HILOS = 4
+POOL = ThreadPoolExecutor(max_workers=MAX_HILOS, thread_name_prefix='guardado')
+
+# Archivos de bloqueo compartidos entre procesos
+DIRECTORIO_CANDADOS = Path(__file__).parent / 'data' / '.candados'
+
+# Espera máxima entre intentos de tomar un flock ocupado (segundos)
+MAX_ESPERA_CANDADO = 0.05
+
+# Permisos de un archivo nuevo según la umask del proceso (se lee al
+# importar porque os.umask solo se puede consultar cambiándola)
+_UMASK = os.umask(0)
+os.umask(_UMASK)
+PERMISOS_NUEVOS = 0o666 & ~_UMASK
+
+_candados = {}
+
+
+def _abrir_candado(nombre):
+    DIRECTORIO_CANDADOS.mkdir(parents=True, exist_ok=True)
+    return os.open(DIRECTORIO_CANDADOS / f'{nombre}.lock', os.O_RDWR | os.O_CREAT, 0o644)
+
+
+class CandadoArchivo:
+    """
+    Candado asyncio del proceso más flock entre procesos.
+
+    Primero se ordenan las corrutinas del propio proceso y después se toma
+    el flock sin bloquear el bucle de eventos (intentos no bloqueantes con
+    espera creciente).
+    """
+
+    def __init__(self, nombre):
+        self.nombre = nombre
+        self._local = asyncio.Lock()
+        self._fd = None
+
+    async def __aenter__(self):
+        await self._local.acquire()
+        try:
+            await self._bloquear()
+        except BaseException:
+            self._local.release()
+            raise
+        return self
+
+    async def __aexit__(self, *exc):
+        if self._fd is not None:
+            fcntl.flock(self._fd, fcntl.LOCK_UN)
+        self._local.release()
+
+    async def _bloquear(self):
+        if fcntl is None:
+            return
+        if self._fd is None:
+            self._fd = _abrir_candado(self.nombre)
+        espera = 0.001
+        while True:
+            try:
+                fcntl.flock(self._fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                return
+            except BlockingIOError:
+                await asyncio.sleep(espera)
+                espera = min(espera * 2, MAX_ESPERA_CANDADO)
+
+
+def candado(nombre_archivo):
+    """Candado de un archivo, compartido entre procesos (se crea la primera vez)"""
+    if nombre_archivo not in _candados:
+        _candados[nombre_archivo] = CandadoArchivo(nombre_archivo)
+    return _candados[nombre_archivo]
+
+
+@contextmanager
+def bloqueo_entre_procesos(nombre):
+    """flock bloqueante para código síncrono (se ejecuta en un hilo)"""
+    if fcntl is None:
+        yield
+        return
+    fd = _abrir_candado(nombre)
+    try:
+        fcntl.flock(fd, fcntl.LOCK_EX)
+        yield
+    finally:
+        os.close(fd)
+
+
+async def en_hilo(funcion, *args, **kwargs):
+    """Ejecuta una función bloqueante en el pool de guardado"""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(POOL, functools.partial(funcion, *args, **kwargs))
+
+
+def preparar_temporal(ruta, cuerpo):
+    """
+    Escribe bytes en un temporal oculto (.nombre.xxxx.tmp) junto a ruta y
+    hace fsync. Devuelve la ruta del temporal, listo para renombrarlo.
+
+    mkstemp crea el temporal con permisos 0600; se le dan los del archivo
+    que va a reemplazar (o los de un archivo nuevo según la umask) para
+    que el rename no los cambie.
+    """
+    ruta = Path(ruta)
+    fd, temporal = tempfile.mkstemp(dir=ruta.parent, prefix=f'.{ruta.name}.', suffix='.tmp')
+    try:
+        if hasattr(os, 'fchmod'):
+            try:
+                permisos = stat.S_IMODE(os.stat(ruta).st_mode)
+            except FileNotFoundError:
+                permisos = PERMISOS_NUEVOS
+            os.fchmod(fd, permisos)
+        with os.fdopen(fd, 'wb') as f:
+            f.write(cuerpo)
+            f.flush()
+            os.fsync(f.fileno())
+    except BaseException:
+        _borrar(temporal)
+        raise
+    return temporal
+
+
+def _borrar(ruta):
+    try:
+        os.unlink(ruta)
+    except FileNotFoundError:
+        pass
+
+
+def escribir_atomico(ruta, cuerpo):
+    """
+    Escribe bytes en ruta de forma atómica.
+
+    Se escribe un temporal en el mismo directorio, se hace fsync y se
+    renombra sobre el destino; los lectores ven siempre el archivo antiguo
+    o el nuevo completo, nunca uno a medias.
+    """
+    ruta = Path(ruta)
+    temporal = preparar_temporal(ruta, cuerpo)
+    try:
+        os.replace(temporal, ruta)
+    except BaseException:
+        _borrar(temporal)
+        raise
+    sincronizar_directorio(ruta.parent)
+
+
+def escribir_lote(escrituras):
+    """
+    Escribe varios archivos como una unidad.
+
+    Primero se preparan todos los temporales; si alguno falla no se toca
+    ningún destino. Después se renombran uno tras otro y, si un rename
+    falla, los ya renombrados vuelven a su contenido anterior.
+
+    Args:
+        escrituras: lista de (ruta, cuerpo nuevo, cuerpo anterior o None si
+                    el archivo no existía)
+    """
+    temporales = []
+    try:
+        for ruta, cuerpo, _ in escrituras:
+            temporales.append(preparar_temporal(ruta, cuerpo))
+    except BaseException:
+        for temporal in temporales:
+            _borrar(temporal)
+        raise
+
+    hechas = []
+    try:
+        for (ruta, _, anterior), temporal in zip(escrituras, temporales):
+            os.replace(temporal, ruta)
+            hechas.append((ruta, anterior))
+    except BaseException:
+        for ruta, anterior in reversed(hechas):
+            if anterior is None:
+                _borrar(ruta)
+            else:
+                escribir_atomico(ruta, anterior)
+        for temporal in temporales[len(hechas):]:
+            _borrar(temporal)
+        raise
+
+    for directorio in {Path(ruta).parent for ruta, _, _ in escrituras}:
+        sincronizar_directorio(directorio)
+
+
+def sincronizar_directorio(directorio):
+    """fsync del directorio para que el rename sobreviva a un corte (POSIX)"""
+    if os.name != 'posix':
+        return
+    fd = os.open(directorio, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
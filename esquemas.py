@@ -0,0 +1,134 @@
+#!/usr/bin/env python3
+"""
+Esquemas de los archivos fuente de data/ para los guardados en crudo.
+
+PUT /api/data/<archivo> recibe el contenido del archivo tal cual, sin pasar
+por pydantic. Aquí se comprueba en una sola pasada sobre los registros que
+tiene la forma que espera el resto del proyecto: el tipo raíz, que cada
+registro de una colección sea un objeto con un 'id' de texto no repetido y
+que los campos conocidos tengan su tipo (o null). Los campos que no figuran
+en el esquema se aceptan sin comprobar.
+"""
+
+import codec_json
+
+# Archivo -> (tipo raíz, {campo: tipo})
+ESQUEMAS = {
+    'introduccion.json': (dict, {
+        'logline': str,
+        'sinopsis': str,
+        'fundamentacion': str,
+        'storyline': list,
+    }),
+    'personajes.json': (list, {
+        'id': str,
+        'nombre': str,
+        'rol': str,
+        'origen': str,
+        'descripcion': str,
+        'motivaciones': list,
+        'habilidades': list,
+        'relaciones': list,
+        'aparicion': str,
+        'etiquetas': list,
+    }),
+    'localizaciones.json': (list, {
+        'id': str,
+        'nombre': str,
+        'descripcion': str,
+        'tipo': str,
+        'elementos_clave': list,
+        'tramas_relacionadas': list,
+        'personajes_relacionados': list,
+    }),
+    'canciones.json': (list, {
+        'id': str,
+        'titulo': str,
+        'letra': list,
+        'descripcion': str,
+        'significado': str,
+        'personajes_relacionados': list,
+        'tramas_relacionadas': list,
+        'etapa': str,
+        'instrumental': bool,
+    }),
+    'tramas.json': (list, {
+        'id': str,
+        'titulo': str,
+        'resumen': str,
+        'personajes_implicados': list,
+        'localizaciones': list,
+    }),
+    'timeline.json': (list, {
+        'id': str,
+        'titulo': str,
+        'descripcion': str,
+        'personajes_implicados': list,
+        'localizacion': str,
+        'etapa': str,
+        'simultaneo_con': list,
+    }),
+}
+
+_NOMBRES_TIPO = {dict: 'un objeto', list: 'una lista', str: 'texto', bool: 'un booleano'}
+
+
+class ErrorEsquema(ValueError):
+    """El contenido no tiene la forma esperada para el archivo"""
+
+
+def _comprobar_campos(registro, campos, donde):
+    for campo, tipo in campos.items():
+        valor = registro.get(campo)
+        if valor is not None and not isinstance(valor, tipo):
+            raise ErrorEsquema(f"{donde}.{campo} debe ser {_NOMBRES_TIPO[tipo]}")
+
+
+def validar(nombre_archivo, datos):
+    """Comprueba datos contra el esquema del archivo (ErrorEsquema si no encaja)"""
+    tipo, campos = ESQUEMAS[nombre_archivo]
+    if not isinstance(datos, tipo):
+        raise ErrorEsquema(f"{nombre_archivo} debe ser {_NOMBRES_TIPO[tipo]}")
+    if tipo is dict:
+        _comprobar_campos(datos, campos, nombre_archivo)
+        return
+
+    vistos = set()
+    for posicion, registro in enumerate(datos):
+        donde = f"[{posicion}]"
+        if not isinstance(registro, dict):
+            raise ErrorEsquema(f"{donde} debe ser un objeto")
+        id_registro = registro.get('id')
+        if not isinstance(id_registro, str) or not id_registro:
+            raise ErrorEsquema(f"{donde}.id debe ser un texto no vacío")
+        if id_registro in vistos:
+            raise ErrorEsquema(f"{donde}.id repetido: {id_registro}")
+        vistos.add(id_registro)
+        _comprobar_campos(registro, campos, donde)
+
+
+def validar_cuerpo(nombre_archivo, cuerpo):
+    """
+    Parsea y valida los bytes de un archivo.
+
+    Returns:
+        Los datos parseados
+    """
+    try:
+        datos = codec_json.cargar(cuerpo)
+    except (ValueError, UnicodeDecodeError) as e:
+        raise ErrorEsquema(f"El cuerpo no es JSON válido: {e}")
+    validar(nombre_archivo, datos)
+    return datos
+
+
+def cuerpo_canonico(cuerpo, datos):
+    """
+    Bytes con los que se guardan los datos: el cuerpo recibido solo si ya
+    es exactamente la serialización de codec_json.volcar (la de
+    JSON.stringify(datos, null, 2)); si no, esa serialización. Así un
+    cuerpo con otros espacios, claves repetidas, escapes \\u o saltos CRLF
+    no llega al disco tal cual.
+    """
+    canonico = codec_json.volcar(datos)
+    return cuerpo if cuerpo == canonico else canonico
@@ -0,0 +1,134 @@
+#!/usr/bin/env python3
+"""
+Canal de notificaciones de cambios para server.py (Server-Sent Events).
+
+Cada vez que se escribe un archivo fuente o procesado se publica un evento
+pequeño (archivo, ids de las entidades cambiadas y nuevo ETag) que reciben
+todos los clientes conectados a /api/events. Así pueden volver a pedir solo
+el archivo cambiado en lugar de recargarlo todo periódicamente.
+
+Los ids de evento son "<época>-<n>": la época es aleatoria por proceso, de
+modo que un Last-Event-ID de antes de un reinicio o de otro worker no se
+confunde con los ids de este. Si el cliente reconecta con un id que no se
+puede continuar (otra época o eventos que ya salieron del historial) recibe
+un evento 'resincronizar' y debe volver a comprobar todos sus archivos.
+"""
+
+import asyncio
+import secrets
+from collections import deque
+
+import codec_json
+
+# Eventos recientes que se reenvían a un cliente que reconecta con Last-Event-ID
+HISTORIAL = 100
+
+# Eventos pendientes por cliente; a un cliente que no lee se le desconecta
+MAX_PENDIENTES = 256
+
+# Segundos entre comentarios keep-alive
+LATIDO = 15
+
+
+def ids_cambiados(anterior, nuevo):
+    """
+    Ids de los registros añadidos, eliminados o modificados entre dos
+    versiones de una colección. Devuelve None si no son colecciones con id.
+    Los registros sin id de texto se ignoran.
+    """
+    if not isinstance(anterior, list) or not isinstance(nuevo, list):
+        return None
+    antes = {r['id']: r for r in anterior if isinstance(r, dict) and isinstance(r.get('id'), str)}
+    despues = {r['id']: r for r in nuevo if isinstance(r, dict) and isinstance(r.get('id'), str)}
+    cambiados = antes.keys() ^ despues.keys()
+    cambiados.update(
+        i for i in antes.keys() & despues.keys()
+        if antes[i] is not despues[i] and antes[i] != despues[i]
+    )
+    return sorted(cambiados)
+
+
+def formatear(evento_id, tipo, datos):
+    """Mensaje SSE listo para enviar"""
+    cuerpo = codec_json.volcar(datos, compacto=True).decode('utf-8')
+    return f"id: {evento_id}\nevent: {tipo}\ndata: {cuerpo}\n\n".encode('utf-8')
+
+
+class CanalEventos:
+    """Difusión de eventos a todos los suscriptores conectados"""
+
+    def __init__(self):
+        self._suscriptores = set()
+        self._historial = deque(maxlen=HISTORIAL)
+        self._siguiente = 1
+        self.epoca = secrets.token_hex(4)
+
+    def _id(self, numero):
+        return f"{self.epoca}-{numero}"
+
+    def publicar(self, tipo, datos):
+        """Envía un evento a todos los suscriptores (no bloquea)"""
+        mensaje = formatear(self._id(self._siguiente), tipo, datos)
+        self._historial.append((self._siguiente, mensaje))
+        self._siguiente += 1
+        for cola in list(self._suscriptores):
+            try:
+                cola.put_nowait(mensaje)
+            except asyncio.QueueFull:
+                # Cliente demasiado lento: se le desconecta y reconectará
+                self._suscriptores.discard(cola)
+                while not cola.empty():
+                    cola.get_nowait()
+                cola.put_nowait(None)
+
+    def pendientes(self, ultimo_id):
+        """
+        Mensajes que se perdió un cliente que reconecta con Last-Event-ID, o
+        None si no se pueden reconstruir (otra época, id mal formado o
+        eventos que ya no están en el historial).
+        """
+        epoca, _, numero = ultimo_id.rpartition('-')
+        if epoca != self.epoca or not numero.isdigit():
+            return None
+        numero = int(numero)
+        if numero >= self._siguiente:
+            return None
+        primero = self._historial[0][0] if self._historial else self._siguiente
+        if numero + 1 < primero:
+            return None
+        return [mensaje for evento_id, mensaje in self._historial if evento_id > numero]
+
+    def cambio(self, archivo, etag, ids=None):
+        """Publica el cambio de un archivo de data/"""
+        self.publicar('cambio', {'archivo': archivo, 'etag': etag, 'ids': ids})
+
+    async def suscribir(self, ultimo_id=None):
+        """
+        Generador de mensajes SSE para un cliente. Si se indica ultimo_id
+        (cabecera Last-Event-ID) se reenvían antes los eventos posteriores o,
+        si no se puede, un evento 'resincronizar'.
+        """
+        cola = asyncio.Queue(maxsize=MAX_PENDIENTES)
+        self._suscriptores.add(cola)
+        try:
+            yield b": conectado\n\n"
+            if ultimo_id is not None:
+                pendientes = self.pendientes(ultimo_id)
+                if pendientes is None:
+                    # Con el id del último evento para que la próxima
+                    # reconexión ya pueda continuar desde aquí
+                    yield formatear(self._id(self._siguiente - 1), 'resincronizar', {'epoca': self.epoca})
+                else:
+                    for mensaje in pendientes:
+                        yield mensaje
+            while True:
+                try:
+                    mensaje = await asyncio.wait_for(cola.get(), LATIDO)
+                except asyncio.TimeoutError:
+                    yield b": latido\n\n"
+                    continue
+                if mensaje is None:
+                    return
+                yield mensaje
+        finally:
+            self._suscriptores.discard(cola)
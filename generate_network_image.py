@@ -3,23 +3,46 @@
 Script para generar una imagen estática de alta calidad del grafo de relaciones.
 """
 
-import json
-import matplotlib.pyplot as plt
-import matplotlib.patches as mpatches
-from matplotlib.patches import FancyBboxPatch
-import networkx as nx
+import argparse
+import os
 from pathlib import Path
-import numpy as np
 
-def generar_grafo_imagen():
-    """Genera una imagen del grafo de relaciones"""
+import codec_json
+
+# Backend sin ventana elegido antes de cualquier importación de matplotlib
+os.environ.setdefault('MPLBACKEND', 'Agg')
+
+# matplotlib y networkx se importan solo cuando hay que dibujar
+plt = None
+mpatches = None
+nx = None
+
+def importar_graficos():
+    """Importa matplotlib y networkx la primera vez que se necesitan"""
+    global plt, mpatches, nx
+    if plt is None:
+        import matplotlib
+        matplotlib.use('Agg')
+        import matplotlib.pyplot as _plt
+        import matplotlib.patches as _mpatches
+        import networkx as _nx
+        plt, mpatches, nx = _plt, _mpatches, _nx
+
+def generar_grafo_imagen(personajes=None):
+    """
+    Genera una imagen del grafo de relaciones.
+
+    Si se recibe la lista de personajes ya parseada no se lee el archivo.
+    """
     data_dir = Path('data')
     output_dir = Path('data/processed')
     output_dir.mkdir(exist_ok=True)
     
     # Cargar personajes
-    with open(data_dir / 'personajes.json', 'r', encoding='utf-8') as f:
-        personajes = json.load(f)
+    if personajes is None:
+        personajes = codec_json.leer(data_dir / 'personajes.json')
+    
+    importar_graficos()
     
     # Crear grafo dirigido
     G = nx.DiGraph()
@@ -199,4 +222,8 @@ def generar_grafo_imagen():
     plt.close()
 
 if __name__ == '__main__':
+    parser = argparse.ArgumentParser(
+        description='Genera data/processed/network_graph.png y network_graph_web.png'
+    )
+    parser.parse_args()
     generar_grafo_imagen()
@@ -3,26 +3,47 @@
 Script para generar una imagen estática de alta calidad del timeline.
 """
 
-import json
-import matplotlib.pyplot as plt
-import matplotlib.patches as mpatches
-from matplotlib.patches import Rectangle, FancyBboxPatch
-from datetime import datetime, timedelta
+import argparse
+import os
+from datetime import datetime
 from pathlib import Path
-import numpy as np
 import textwrap
 
-def generar_timeline_imagen():
-    """Genera una imagen del timeline visual"""
+import codec_json
+
+# Backend sin ventana elegido antes de cualquier importación de matplotlib
+os.environ.setdefault('MPLBACKEND', 'Agg')
+
+# matplotlib se importa solo cuando hay que dibujar
+plt = None
+Rectangle = None
+
+def importar_graficos():
+    """Importa matplotlib la primera vez que se necesita"""
+    global plt, Rectangle
+    if plt is None:
+        import matplotlib
+        matplotlib.use('Agg')
+        import matplotlib.pyplot as _plt
+        from matplotlib.patches import Rectangle as _Rectangle
+        plt, Rectangle = _plt, _Rectangle
+
+def generar_timeline_imagen(timeline_visual_data=None):
+    """
+    Genera una imagen del timeline visual.
+
+    Si se reciben los datos visuales ya calculados por procesar_timeline
+    no se lee timeline_visual_data.json.
+    """
     data_dir = Path('data')
     output_dir = Path('data/processed')
     output_dir.mkdir(exist_ok=True)
     
     # Cargar datos preprocesados que ya tienen las fechas correctas con simultaneidad
     processed_file = output_dir / 'timeline_visual_data.json'
-    if processed_file.exists():
-        with open(processed_file, 'r', encoding='utf-8') as f:
-            timeline_visual_data = json.load(f)
+    if timeline_visual_data is None and processed_file.exists():
+        timeline_visual_data = codec_json.leer(processed_file)
+    if timeline_visual_data is not None:
         items = timeline_visual_data['items']
         etapas_config = timeline_visual_data['etapas_config']
         fecha_base = datetime.fromisoformat(timeline_visual_data['fecha_base'])
@@ -51,8 +72,7 @@ def generar_timeline_imagen():
             })
     else:
         # Fallback: cargar timeline original si no hay datos preprocesados
-        with open(data_dir / 'timeline.json', 'r', encoding='utf-8') as f:
-            timeline_data = json.load(f)
+        timeline_data = codec_json.leer(data_dir / 'timeline.json')
         eventos_con_porcentajes = None
     
     # Definir etapas y sus propiedades
@@ -120,6 +140,8 @@ def generar_timeline_imagen():
                 eventos_por_etapa[etapa] = []
             eventos_por_etapa[etapa].append(evento_info)
     
+    importar_graficos()
+    
     # Crear figura con alta resolución
     fig = plt.figure(figsize=(28, 14), facecolor='#1a1a1a', dpi=100)
     ax = fig.add_subplot(111, facecolor='#1a1a1a')
@@ -456,5 +478,9 @@ def generar_timeline_imagen():
     plt.close()
 
 if __name__ == '__main__':
+    parser = argparse.ArgumentParser(
+        description='Genera data/processed/timeline_graph.png y timeline_graph_web.png'
+    )
+    parser.parse_args()
     generar_timeline_imagen()
 
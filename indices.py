@@ -0,0 +1,166 @@
+#!/usr/bin/env python3
+"""
+Índices secundarios en memoria sobre las colecciones de data/.
+
+Para cada colección (lista de registros con 'id') se construye, a partir
+de la entrada de caché del archivo, un índice invertido por cada campo de
+CAMPOS_INDEXADOS: valor -> posiciones de los registros que lo contienen
+(los campos lista, como etiquetas o personajes_implicados, indexan cada
+elemento). El índice se reconstruye solo cuando cambia el ETag del
+archivo, así que un guardado lo invalida sin trabajo extra.
+
+consultar() combina los filtros (AND entre campos, OR entre valores del
+mismo campo), aplica la proyección de campos y pagina con un cursor opaco.
+"""
+
+import base64
+import bisect
+
+import codec_json
+
+# Colección -> archivo de data/
+COLECCIONES = {
+    'personajes': 'personajes.json',
+    'localizaciones': 'localizaciones.json',
+    'canciones': 'canciones.json',
+    'tramas': 'tramas.json',
+    'timeline': 'timeline.json',
+}
+
+CAMPOS_INDEXADOS = ('id', 'etiquetas', 'etapa', 'personajes_implicados', 'localizacion')
+
+LIMITE_POR_DEFECTO = 50
+LIMITE_MAXIMO = 500
+
+
+class ErrorConsulta(ValueError):
+    """Parámetros de consulta inválidos"""
+
+
+def _valores(valor):
+    """Valores indexables de un campo (cada elemento si es una lista)"""
+    elementos = valor if isinstance(valor, list) else [valor]
+    return [
+        codec_json.volcar(e).decode('ascii') if isinstance(e, bool) else str(e)
+        for e in elementos if isinstance(e, (str, int, float, bool))
+    ]
+
+
+class IndiceColeccion:
+    """Índices invertidos de una versión concreta de una colección"""
+
+    def __init__(self, etag, registros):
+        self.etag = etag
+        self.registros = registros
+        self.campos = {campo: {} for campo in CAMPOS_INDEXADOS}
+        for posicion, registro in enumerate(registros):
+            if not isinstance(registro, dict):
+                continue
+            for campo, indice in self.campos.items():
+                if campo in registro:
+                    for valor in _valores(registro[campo]):
+                        indice.setdefault(valor, []).append(posicion)
+
+    def posicion_de(self, id_registro):
+        posiciones = self.campos['id'].get(id_registro)
+        return posiciones[0] if posiciones else None
+
+    def filtrar(self, filtros):
+        """Posiciones (ordenadas) de los registros que cumplen todos los filtros"""
+        candidatas = None
+        sin_indice = {}
+        for campo, valores in filtros.items():
+            if campo not in self.campos:
+                sin_indice[campo] = set(valores)
+                continue
+            posiciones = set()
+            for valor in valores:
+                posiciones.update(self.campos[campo].get(valor, ()))
+            candidatas = posiciones if candidatas is None else candidatas & posiciones
+
+        if candidatas is None:
+            candidatas = range(len(self.registros))
+        resultado = sorted(candidatas)
+
+        # Campos sin índice: recorrido solo sobre las candidatas
+        for campo, valores in sin_indice.items():
+            resultado = [
+                p for p in resultado
+                if isinstance(self.registros[p], dict)
+                and valores.intersection(_valores(self.registros[p].get(campo, [])))
+            ]
+        return resultado
+
+
+_indices = {}
+
+
+def indice_de(coleccion, entrada):
+    """Índice de la versión actual de una colección (se reconstruye si cambió)"""
+    indice = _indices.get(coleccion)
+    if indice is None or indice.etag != entrada.etag:
+        if not isinstance(entrada.datos, list):
+            raise ErrorConsulta(f"{coleccion} no es una colección")
+        indice = IndiceColeccion(entrada.etag, entrada.datos)
+        _indices[coleccion] = indice
+    return indice
+
+
+def codificar_cursor(posicion, id_registro):
+    crudo = codec_json.volcar([posicion, id_registro], compacto=True)
+    return base64.urlsafe_b64encode(crudo).decode('ascii')
+
+
+def decodificar_cursor(cursor):
+    try:
+        posicion, id_registro = codec_json.cargar(base64.urlsafe_b64decode(cursor.encode('ascii')))
+        posicion = int(posicion)
+    except (ValueError, TypeError, OverflowError):
+        raise ErrorConsulta("Cursor inválido")
+    # El id sirve para buscar el registro en el índice: solo texto (o None)
+    if id_registro is not None and not isinstance(id_registro, str):
+        raise ErrorConsulta("Cursor inválido")
+    return posicion, id_registro
+
+
+def consultar(indice, filtros, campos=None, limite=LIMITE_POR_DEFECTO, cursor=None):
+    """
+    Ejecuta una consulta sobre el índice.
+
+    El cursor guarda la posición y el id del último registro devuelto; si el
+    registro se ha movido por una edición se continúa desde su nueva
+    posición y, si se ha borrado, desde la posición guardada.
+
+    Returns:
+        Diccionario con total, resultados y el cursor siguiente (o None)
+    """
+    if not 1 <= limite <= LIMITE_MAXIMO:
+        raise ErrorConsulta(f"limite debe estar entre 1 y {LIMITE_MAXIMO}")
+
+    # Un filtro vacío (?etapa=) no filtra
+    filtros = {campo: [v for v in valores if v != ''] for campo, valores in filtros.items()}
+    filtros = {campo: valores for campo, valores in filtros.items() if valores}
+
+    posiciones = indice.filtrar(filtros)
+    inicio = 0
+    if cursor:
+        posicion, id_registro = decodificar_cursor(cursor)
+        actual = indice.posicion_de(id_registro)
+        posicion = actual if actual is not None else posicion
+        # Primera posición posterior al último registro devuelto
+        inicio = bisect.bisect_right(posiciones, posicion)
+
+    pagina = posiciones[inicio:inicio + limite]
+    resultados = []
+    for p in pagina:
+        registro = indice.registros[p]
+        if campos and isinstance(registro, dict):
+            registro = {c: registro[c] for c in campos if c in registro}
+        resultados.append(registro)
+
+    siguiente = None
+    if inicio + limite < len(posiciones):
+        ultimo = indice.registros[pagina[-1]]
+        siguiente = codificar_cursor(pagina[-1], ultimo.get('id') if isinstance(ultimo, dict) else None)
+
+    return {'total': len(posiciones), 'resultados': resultados, 'siguiente': siguiente}
@@ -0,0 +1,136 @@
+#!/usr/bin/env python3
+"""
+Métricas por etapa del preprocesamiento.
+
+Cada etapa registra tiempo de reloj, tiempo de CPU, pico de memoria (RSS),
+tamaño en bytes y número de elementos de sus entradas y salidas. El informe
+se escribe en data/processed/build_report.json; con --profile se guarda
+además un volcado de cProfile por etapa en data/processed/profiles/.
+"""
+
+import cProfile
+import io
+import platform
+import pstats
+import sys
+import time
+from datetime import datetime
+from pathlib import Path
+
+import codec_json
+
+RUTA_INFORME = 'data/processed/build_report.json'
+DIRECTORIO_PERFILES = 'data/processed/profiles'
+
+
+def contar_elementos(ruta):
+    """
+    Cuenta los elementos de un JSON: registros si es una lista, claves de
+    primer nivel si es un objeto. Devuelve None para archivos no JSON.
+    """
+    if ruta.suffix != '.json':
+        return None
+    try:
+        datos = codec_json.leer(ruta)
+    except (OSError, ValueError):
+        return None
+    return len(datos) if isinstance(datos, (list, dict)) else 1
+
+
+def medir_archivos(base, rutas):
+    """Devuelve {ruta: {'bytes', 'elementos'}} de los archivos existentes"""
+    medidas = {}
+    for relativa in rutas:
+        ruta = Path(base) / relativa
+        if ruta.is_file():
+            medidas[relativa] = {
+                'bytes': ruta.stat().st_size,
+                'elementos': contar_elementos(ruta),
+            }
+    return medidas
+
+
+def completar_metricas(base, etapa, metricas):
+    """Añade a las métricas de una etapa las medidas de sus entradas y salidas"""
+    if 'perfil' in metricas:
+        metricas['perfil'] = Path(metricas['perfil']).relative_to(base).as_posix()
+    entradas = medir_archivos(base, etapa['entradas'])
+    salidas = medir_archivos(base, etapa['salidas'])
+    metricas.update({
+        'entradas': entradas,
+        'salidas': salidas,
+        'bytes_entrada': sum(m['bytes'] for m in entradas.values()),
+        'bytes_salida': sum(m['bytes'] for m in salidas.values()),
+    })
+    return metricas
+
+
+def resumen_perfil(ruta_prof, limite=30):
+    """Escribe junto al .prof un resumen de texto ordenado por tiempo acumulado"""
+    salida = io.StringIO()
+    stats = pstats.Stats(str(ruta_prof), stream=salida)
+    stats.sort_stats('cumulative').print_stats(limite)
+    Path(ruta_prof).with_suffix('.txt').write_text(salida.getvalue(), encoding='utf-8')
+
+
+class Medicion:
+    """
+    Mide una etapa ejecutada en el proceso actual.
+
+    El pico de RSS es el del proceso completo (getrusage no permite
+    reiniciarlo), así que en modo --in-process crece de forma monótona.
+    """
+
+    def __init__(self, ruta_perfil=None):
+        self.ruta_perfil = ruta_perfil
+        self.metricas = {}
+        self._perfil = None
+
+    def __enter__(self):
+        if self.ruta_perfil:
+            self._perfil = cProfile.Profile()
+        self._inicio = time.perf_counter()
+        self._cpu = time.process_time()
+        if self._perfil:
+            self._perfil.enable()
+        return self
+
+    def __exit__(self, *exc):
+        if self._perfil:
+            self._perfil.disable()
+        self.metricas['tiempo_s'] = round(time.perf_counter() - self._inicio, 4)
+        self.metricas['cpu_s'] = round(time.process_time() - self._cpu, 4)
+        self.metricas['rss_pico_kb'] = rss_pico_kb()
+        if self._perfil:
+            Path(self.ruta_perfil).parent.mkdir(parents=True, exist_ok=True)
+            self._perfil.dump_stats(str(self.ruta_perfil))
+            resumen_perfil(self.ruta_perfil)
+            self.metricas['perfil'] = str(self.ruta_perfil)
+        return False
+
+
+def rss_pico_kb(uso=None):
+    """Pico de RSS en KB a partir de un struct rusage (del proceso actual por defecto)"""
+    try:
+        import resource
+    except ImportError:
+        return None
+    if uso is None:
+        uso = resource.getrusage(resource.RUSAGE_SELF)
+    # macOS informa ru_maxrss en bytes, Linux en KB
+    return uso.ru_maxrss // 1024 if sys.platform == 'darwin' else uso.ru_maxrss
+
+
+def escribir_informe(base, etapas, modo, duracion):
+    """Escribe build_report.json con las métricas de cada etapa"""
+    informe = {
+        'generado': datetime.now().isoformat(timespec='seconds'),
+        'modo': modo,
+        'python': platform.python_version(),
+        'duracion_total_s': round(duracion, 4),
+        'etapas': etapas,
+    }
+    ruta = Path(base) / RUTA_INFORME
+    ruta.parent.mkdir(exist_ok=True)
+    codec_json.escribir(ruta, informe)
+    return ruta
@@ -0,0 +1,211 @@
+#!/usr/bin/env python3
+"""
+Actualizaciones parciales de documentos JSON.
+
+Implementa JSON Patch (RFC 6902) sobre punteros JSON (RFC 6901) y un modo
+más simple de upserts por 'id' para las colecciones (listas de registros).
+Ninguna de las dos funciones modifica el documento recibido, que puede ser
+el objeto compartido de la caché: solo se copian (superficialmente) los
+contenedores que hay en el camino hacia cada cambio, de modo que el coste
+depende del registro tocado y no del tamaño del documento.
+"""
+
+import copy
+
+
+class ErrorPatch(ValueError):
+    """Operación mal formada o imposible de aplicar"""
+
+
+class PruebaFallida(ErrorPatch):
+    """Una operación 'test' no se cumplió"""
+
+
+def parsear_puntero(puntero):
+    """Convierte un puntero JSON ('/a/0/b') en su lista de tokens"""
+    if puntero == '':
+        return []
+    if not isinstance(puntero, str) or not puntero.startswith('/'):
+        raise ErrorPatch(f"Puntero JSON inválido: {puntero!r}")
+    return [t.replace('~1', '/').replace('~0', '~') for t in puntero[1:].split('/')]
+
+
+def _indice(lista, token, para_insertar=False):
+    """Índice de lista a partir de un token ('-' solo al insertar)"""
+    if para_insertar and token == '-':
+        return len(lista)
+    if not token.isdigit() or (token != '0' and token.startswith('0')):
+        raise ErrorPatch(f"Índice de lista inválido: {token!r}")
+    indice = int(token)
+    limite = len(lista) if para_insertar else len(lista) - 1
+    if indice > limite:
+        raise ErrorPatch(f"Índice fuera de rango: {indice}")
+    return indice
+
+
+def _hijo(contenedor, token):
+    if isinstance(contenedor, list):
+        return contenedor[_indice(contenedor, token)]
+    if isinstance(contenedor, dict):
+        if token not in contenedor:
+            raise ErrorPatch(f"No existe la clave {token!r}")
+        return contenedor[token]
+    raise ErrorPatch(f"No se puede entrar en un valor escalar con {token!r}")
+
+
+def obtener(documento, tokens):
+    """Valor en la ruta indicada por los tokens"""
+    actual = documento
+    for token in tokens:
+        actual = _hijo(actual, token)
+    return actual
+
+
+class _Documento:
+    """Documento en edición con copia-en-escritura de los contenedores tocados"""
+
+    def __init__(self, raiz):
+        self.raiz = raiz
+        self._copias = set()
+
+    def _copia(self, contenedor):
+        copia = list(contenedor) if isinstance(contenedor, list) else dict(contenedor)
+        self._copias.add(id(copia))
+        return copia
+
+    def padre(self, tokens):
+        """Contenedor (ya copiado y modificable) que aloja el último token"""
+        if id(self.raiz) not in self._copias:
+            if not isinstance(self.raiz, (list, dict)):
+                raise ErrorPatch("El documento no es un contenedor")
+            self.raiz = self._copia(self.raiz)
+        actual = self.raiz
+        for token in tokens[:-1]:
+            clave = _indice(actual, token) if isinstance(actual, list) else token
+            hijo = _hijo(actual, token)
+            if not isinstance(hijo, (list, dict)):
+                raise ErrorPatch(f"No se puede entrar en un valor escalar con {token!r}")
+            if id(hijo) not in self._copias:
+                hijo = self._copia(hijo)
+                actual[clave] = hijo
+            actual = hijo
+        return actual
+
+    def agregar(self, tokens, valor):
+        if not tokens:
+            self.raiz = valor
+            return
+        padre = self.padre(tokens)
+        if isinstance(padre, list):
+            padre.insert(_indice(padre, tokens[-1], para_insertar=True), valor)
+        else:
+            padre[tokens[-1]] = valor
+
+    def quitar(self, tokens):
+        if not tokens:
+            raise ErrorPatch("No se puede eliminar la raíz del documento")
+        padre = self.padre(tokens)
+        if isinstance(padre, list):
+            return padre.pop(_indice(padre, tokens[-1]))
+        if tokens[-1] not in padre:
+            raise ErrorPatch(f"No existe la clave {tokens[-1]!r}")
+        return padre.pop(tokens[-1])
+
+    def reemplazar(self, tokens, valor):
+        if not tokens:
+            self.raiz = valor
+            return
+        padre = self.padre(tokens)
+        if isinstance(padre, list):
+            padre[_indice(padre, tokens[-1])] = valor
+        else:
+            if tokens[-1] not in padre:
+                raise ErrorPatch(f"No existe la clave {tokens[-1]!r}")
+            padre[tokens[-1]] = valor
+
+
+def aplicar_patch(documento, operaciones):
+    """
+    Aplica una lista de operaciones JSON Patch y devuelve el nuevo documento.
+
+    La operación es atómica: si alguna falla se lanza ErrorPatch (o
+    PruebaFallida) y el documento original queda intacto.
+    """
+    if not isinstance(operaciones, list):
+        raise ErrorPatch("Un JSON Patch debe ser una lista de operaciones")
+
+    doc = _Documento(documento)
+    for operacion in operaciones:
+        if not isinstance(operacion, dict) or 'op' not in operacion or 'path' not in operacion:
+            raise ErrorPatch(f"Operación mal formada: {operacion!r}")
+        op = operacion['op']
+        tokens = parsear_puntero(operacion['path'])
+
+        if op in ('add', 'replace', 'test') and 'value' not in operacion:
+            raise ErrorPatch(f"La operación {op!r} requiere 'value'")
+
+        if op == 'add':
+            doc.agregar(tokens, operacion['value'])
+        elif op == 'remove':
+            doc.quitar(tokens)
+        elif op == 'replace':
+            doc.reemplazar(tokens, operacion['value'])
+        elif op in ('move', 'copy'):
+            if 'from' not in operacion:
+                raise ErrorPatch(f"La operación {op!r} requiere 'from'")
+            origen = parsear_puntero(operacion['from'])
+            if op == 'move':
+                if tokens[:len(origen)] == origen and len(tokens) > len(origen):
+                    raise ErrorPatch("No se puede mover un valor dentro de sí mismo")
+                valor = doc.quitar(origen)
+            else:
+                valor = copy.deepcopy(obtener(doc.raiz, origen))
+            doc.agregar(tokens, valor)
+        elif op == 'test':
+            if obtener(doc.raiz, tokens) != operacion['value']:
+                raise PruebaFallida(f"La prueba sobre {operacion['path']!r} no se cumple")
+        else:
+            raise ErrorPatch(f"Operación desconocida: {op!r}")
+
+    return doc.raiz
+
+
+def aplicar_upserts(coleccion, upserts=(), eliminar=()):
+    """
+    Inserta o reemplaza registros por 'id' y elimina los ids indicados.
+
+    Devuelve una lista nueva que comparte los registros no tocados con la
+    original. Los registros nuevos se añaden al final.
+    """
+    if not isinstance(coleccion, list):
+        raise ErrorPatch("Los upserts solo se aplican a colecciones (listas de registros)")
+    if not isinstance(upserts, (list, tuple)) or not isinstance(eliminar, (list, tuple)):
+        raise ErrorPatch("'upsert' y 'eliminar' deben ser listas")
+    for registro in upserts:
+        if not isinstance(registro, dict) or not isinstance(registro.get('id'), str):
+            raise ErrorPatch("Cada upsert debe ser un objeto con 'id' de tipo texto")
+    for id_registro in eliminar:
+        if isinstance(id_registro, bool) or not isinstance(id_registro, (str, int)):
+            raise ErrorPatch("Cada id de 'eliminar' debe ser texto o un entero")
+
+    nueva = list(coleccion)
+    posiciones = {
+        registro.get('id'): i for i, registro in enumerate(nueva)
+        if isinstance(registro, dict)
+    }
+
+    for registro in upserts:
+        if registro['id'] in posiciones:
+            nueva[posiciones[registro['id']]] = registro
+        else:
+            posiciones[registro['id']] = len(nueva)
+            nueva.append(registro)
+
+    if eliminar:
+        ids = set(eliminar)
+        faltan = ids - set(posiciones)
+        if faltan:
+            raise ErrorPatch(f"No existen los ids: {sorted(faltan, key=str)}")
+        nueva = [r for r in nueva if not (isinstance(r, dict) and r.get('id') in ids)]
+
+    return nueva
@@ -4,29 +4,10 @@ Script para limpiar código JavaScript corrupto de archivos procesados.
 """
 
 import json
-import re
 from pathlib import Path
 
-def limpiar_codigo_corrupto(texto):
-    """Limpia código JavaScript corrupto de un string"""
-    if not texto or not isinstance(texto, str):
-        return texto
-    
-    # Limpiar código corrupto específico que aparece comúnmente
-    # Patrón 1: "'); return false;">" que aparece fuera de tags
-    # Buscar este patrón específico que aparece después de cierres de tags
-    texto = re.sub(r"</a>\s*'\s*;\s*return\s+false\s*[^>]*>", '</a>', texto, flags=re.IGNORECASE)
-    texto = re.sub(r"'\s*;\s*return\s+false\s*[^>]*>\s*<a", '<a', texto, flags=re.IGNORECASE)
-    # Limpiar cualquier instancia suelta de este patrón
-    texto = re.sub(r"'\s*;\s*return\s+false\s*[^>]*>", '', texto, flags=re.IGNORECASE)
-    
-    # Patrón 2: "{ .; }, 300);" que aparece fuera de tags
-    texto = re.sub(r'\{\s*\.\s*;\s*\}\s*,\s*\d+\s*\)\s*;', '', texto)
-    
-    # Normalizar espacios múltiples
-    texto = re.sub(r'\s+', ' ', texto).strip()
-    
-    return texto
+import codec_json
+from limpieza import limpiar_codigo_corrupto
 
 def limpiar_objeto(obj):
     """Recursivamente limpia textos en un objeto JSON"""
@@ -49,21 +30,18 @@ def limpiar_archivo(ruta_archivo):
     
     try:
         # Leer archivo
-        with open(ruta, 'r', encoding='utf-8') as f:
-            datos = json.load(f)
+        datos = codec_json.leer(ruta)
         
         # Crear backup
         backup_ruta = ruta.with_suffix(ruta.suffix + '.bak3')
-        with open(backup_ruta, 'w', encoding='utf-8') as f:
-            json.dump(datos, f, ensure_ascii=False, indent=2)
+        codec_json.escribir(backup_ruta, datos)
         print(f"📦 Backup creado: {backup_ruta}")
         
         # Limpiar datos
         datos_limpios = limpiar_objeto(datos)
         
         # Guardar archivo limpio
-        with open(ruta, 'w', encoding='utf-8') as f:
-            json.dump(datos_limpios, f, ensure_ascii=False, indent=2)
+        codec_json.escribir(ruta, datos_limpios)
         
         print(f"✅ Archivo limpiado: {ruta}")
         return True
@@ -3,26 +3,10 @@
 Script para limpiar HTML de los archivos JSON y dejar solo texto plano.
 """
 
-import json
-import re
 from pathlib import Path
-from html import unescape
 
-def limpiar_html(texto):
-    """Elimina tags HTML y decodifica entidades HTML."""
-    if not texto:
-        return texto
-    
-    # Decodificar entidades HTML (&amp; -> &, etc.)
-    texto = unescape(texto)
-    
-    # Eliminar tags HTML y sus atributos
-    texto = re.sub(r'<[^>]+>', '', texto)
-    
-    # Limpiar espacios múltiples
-    texto = re.sub(r'\s+', ' ', texto)
-    
-    return texto.strip()
+import codec_json
+from limpieza import limpiar_html
 
 def limpiar_archivo(ruta):
     """Limpia HTML de un archivo JSON."""
@@ -31,8 +15,7 @@ def limpiar_archivo(ruta):
         print(f"⚠ Archivo no encontrado: {ruta}")
         return
     
-    with open(archivo, 'r', encoding='utf-8') as f:
-        datos = json.load(f)
+    datos = codec_json.leer(archivo)
     
     cambios = False
     
@@ -63,8 +46,7 @@ def limpiar_archivo(ruta):
         print(f"  📦 Backup creado: {backup.name}")
         
         # Guardar archivo limpio
-        with open(archivo, 'w', encoding='utf-8') as f:
-            json.dump(datos, f, ensure_ascii=False, indent=2)
+        codec_json.escribir(archivo, datos)
         print(f"✅ Archivo limpiado: {ruta}")
     else:
         print(f"ℹ Sin cambios: {ruta}")
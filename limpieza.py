@@ -0,0 +1,125 @@
+#!/usr/bin/env python3
+"""
+Limpieza de textos con restos de HTML y JavaScript.
+
+Los textos de data/ arrastran código de versiones antiguas de la página
+(onclick, verFicha(...), scrollIntoView, setTimeout, el resto
+"{ .; }, 300);", etiquetas...). Cada limpiador reúne sus patrones en una
+sola expresión regular alternada, compilada una vez al importar, que
+recorre cada texto en una pasada (extraer_texto_plano hace dos: las
+etiquetas y luego los restos de código, como hacía el script original).
+Después solo se decodifican las entidades HTML (si hay algún '&') y se
+normalizan los espacios.
+
+Lo usan limpiar_archivos_procesados.py, limpiar_textos_corruptos.py,
+limpiar_html.py y preprocess_references.py.
+"""
+
+import re
+from html import unescape
+
+# "'); return false;">" suelto
+RETURN_FALSE = r"'\s*;\s*return\s+false\s*[^>]*>"
+
+# Resto "{ .; }, 300);" de un setTimeout partido
+TEMPORIZADOR_PARTIDO = r'\{\s*\.\s*;\s*\}\s*,\s*\d+\s*\)\s*;'
+
+# Cualquier etiqueta HTML (las de <a> se quitan dejando su texto)
+ETIQUETA = r'<[^>]+>'
+
+# Restos de manejadores de eventos y atributos de los enlaces antiguos
+CODIGO_ENLACES = [
+    r'return\s+false[^>]*>',
+    r'onclick="[^"]*"',
+    r'document\.getElementById\([^)]*\)',
+    r'scrollIntoView\([^)]*\)',
+    r'verFicha\([^)]*\)',
+    r'event\.preventDefault\(\)',
+    r'window\.[^;]*',
+    r'setTimeout\([^)]*\)',
+    r'cerrarModalSiAbierto\(\)',
+    r'mostrarIndicadorSeccion\([^)]*\)',
+    r'href="[^"]*"',
+    r'class="[^"]*"',
+    r'data-[^=]*="[^"]*"',
+    r"behavior:\s*'[^']*'",
+    r"block:\s*'[^']*'",
+]
+
+
+class Limpiador:
+    """
+    Reglas (patrón, reemplazo) compiladas en una sola alternancia sin
+    distinguir mayúsculas; en una posición gana la primera regla que case.
+    Si todas las reglas tienen el mismo reemplazo se sustituye sin pasar
+    por Python en cada coincidencia.
+    """
+
+    def __init__(self, reglas):
+        self._reemplazos = {}
+        alternativas = []
+        for i, (patron, reemplazo) in enumerate(reglas):
+            nombre = f'r{i}'
+            alternativas.append(f'(?P<{nombre}>{patron})')
+            self._reemplazos[nombre] = reemplazo
+        self._patron = re.compile('|'.join(alternativas), re.IGNORECASE)
+        distintos = set(self._reemplazos.values())
+        if len(distintos) == 1:
+            self._sustitucion = distintos.pop().replace('\\', '\\\\')
+        else:
+            self._sustitucion = lambda m: self._reemplazos[m.lastgroup]
+
+    def __call__(self, texto):
+        """Aplica todas las reglas en una pasada"""
+        return self._patron.sub(self._sustitucion, texto)
+
+
+def normalizar_espacios(texto):
+    """Cada secuencia de blancos pasa a un espacio, sin blancos en los extremos"""
+    return ' '.join(texto.split())
+
+
+# Tras un </a> o antes de un <a se conserva la etiqueta para no romper el enlace
+_codigo_corrupto = Limpiador([
+    (r'</a>\s*' + RETURN_FALSE, '</a>'),
+    (RETURN_FALSE + r'\s*<a', '<a'),
+    (RETURN_FALSE, ''),
+    (TEMPORIZADOR_PARTIDO, ''),
+])
+
+# La anticipación con las iniciales de los patrones evita probar toda la
+# alternancia en cada posición del texto
+_codigo_enlaces = Limpiador([
+    ('(?=[' + ''.join(sorted({p[0] for p in CODIGO_ENLACES})) + '])(?:' + '|'.join(CODIGO_ENLACES) + ')', ''),
+])
+
+_etiquetas = Limpiador([(ETIQUETA, '')])
+
+
+def limpiar_codigo_corrupto(texto):
+    """Quita los restos de JavaScript de un texto conservando sus enlaces"""
+    if not texto or not isinstance(texto, str):
+        return texto
+    return normalizar_espacios(_codigo_corrupto(texto))
+
+
+def extraer_texto_plano(texto):
+    """Deja solo el texto plano de un string que puede contener HTML/JavaScript"""
+    if not texto or not isinstance(texto, str):
+        return texto
+
+    # Sin HTML no puede haber restos de enlaces
+    if '<' not in texto and '>' not in texto:
+        return texto.strip()
+
+    # Primero las etiquetas y después los restos de código: al quitar las
+    # etiquetas quedan juntos trozos que antes estaban separados
+    return normalizar_espacios(unescape(_codigo_enlaces(_etiquetas(texto))))
+
+
+def limpiar_html(texto):
+    """Decodifica las entidades HTML y elimina las etiquetas"""
+    if not texto:
+        return texto
+    # Las entidades van antes para que &lt;b&gt; también se elimine
+    return normalizar_espacios(_etiquetas(unescape(texto)))
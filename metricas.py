@@ -0,0 +1,229 @@
+#!/usr/bin/env python3
+"""
+Métricas del servidor en formato de texto de Prometheus.
+
+Implementación mínima en el propio proceso (contadores e histogramas con
+etiquetas, protegidos con un candado porque los guardados se miden desde
+el pool de hilos) y un middleware ASGI que mide cada petición por ruta:
+latencia, bytes recibidos y enviados y código de estado. server.py las
+expone en /metrics.
+"""
+
+import threading
+import time
+from contextlib import contextmanager
+
+# Límites de los histogramas de duración (segundos)
+CUBETAS_SEGUNDOS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+REGISTRO = []
+
+
+def _escapar(valor):
+    return str(valor).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _etiquetas(nombres, valores):
+    if not nombres:
+        return ''
+    return '{' + ','.join(f'{n}="{_escapar(v)}"' for n, v in zip(nombres, valores)) + '}'
+
+
+def _numero(valor):
+    return repr(float(valor)) if valor != int(valor) else str(int(valor))
+
+
+class Contador:
+    """Contador monótono con etiquetas"""
+
+    tipo = 'counter'
+
+    def __init__(self, nombre, ayuda, etiquetas=()):
+        self.nombre = nombre
+        self.ayuda = ayuda
+        self.etiquetas = tuple(etiquetas)
+        self._valores = {}
+        self._candado = threading.Lock()
+        REGISTRO.append(self)
+
+    def inc(self, valor=1, **etiquetas):
+        clave = tuple(etiquetas[n] for n in self.etiquetas)
+        with self._candado:
+            self._valores[clave] = self._valores.get(clave, 0) + valor
+
+    def muestras(self):
+        with self._candado:
+            valores = dict(self._valores)
+        for clave, valor in sorted(valores.items()):
+            yield f'{self.nombre}{_etiquetas(self.etiquetas, clave)} {_numero(valor)}'
+
+
+class Histograma:
+    """Histograma acumulativo con etiquetas"""
+
+    tipo = 'histogram'
+
+    def __init__(self, nombre, ayuda, etiquetas=(), cubetas=CUBETAS_SEGUNDOS):
+        self.nombre = nombre
+        self.ayuda = ayuda
+        self.etiquetas = tuple(etiquetas)
+        self.cubetas = tuple(cubetas)
+        self._series = {}
+        self._candado = threading.Lock()
+        REGISTRO.append(self)
+
+    def observar(self, valor, **etiquetas):
+        clave = tuple(etiquetas[n] for n in self.etiquetas)
+        with self._candado:
+            serie = self._series.get(clave)
+            if serie is None:
+                serie = self._series[clave] = [[0] * len(self.cubetas), 0.0, 0]
+            for i, limite in enumerate(self.cubetas):
+                if valor <= limite:
+                    serie[0][i] += 1
+                    break
+            serie[1] += valor
+            serie[2] += 1
+
+    @contextmanager
+    def medir(self, **etiquetas):
+        """Observa la duración del bloque"""
+        inicio = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observar(time.perf_counter() - inicio, **etiquetas)
+
+    def muestras(self):
+        with self._candado:
+            series = {k: ([*v[0]], v[1], v[2]) for k, v in self._series.items()}
+        nombres = self.etiquetas + ('le',)
+        for clave, (cuentas, suma, total) in sorted(series.items()):
+            acumulado = 0
+            for limite, cuenta in zip(self.cubetas, cuentas):
+                acumulado += cuenta
+                yield f'{self.nombre}_bucket{_etiquetas(nombres, clave + (_numero(limite),))} {acumulado}'
+            yield f'{self.nombre}_bucket{_etiquetas(nombres, clave + ("+Inf",))} {total}'
+            yield f'{self.nombre}_sum{_etiquetas(self.etiquetas, clave)} {_numero(round(suma, 6))}'
+            yield f'{self.nombre}_count{_etiquetas(self.etiquetas, clave)} {total}'
+
+
+class Medidor:
+    """Valor instantáneo calculado al exponer (función -> {etiquetas: valor})"""
+
+    tipo = 'gauge'
+
+    def __init__(self, nombre, ayuda, etiquetas, funcion):
+        self.nombre = nombre
+        self.ayuda = ayuda
+        self.etiquetas = tuple(etiquetas)
+        self.funcion = funcion
+        REGISTRO.append(self)
+
+    def muestras(self):
+        for clave, valor in sorted(self.funcion().items()):
+            yield f'{self.nombre}{_etiquetas(self.etiquetas, clave)} {_numero(valor)}'
+
+
+def exponer():
+    """Todas las métricas registradas en formato de texto de Prometheus"""
+    lineas = []
+    for metrica in REGISTRO:
+        lineas.append(f'# HELP {metrica.nombre} {metrica.ayuda}')
+        lineas.append(f'# TYPE {metrica.nombre} {metrica.tipo}')
+        lineas.extend(metrica.muestras())
+    return '\n'.join(lineas) + '\n'
+
+
+# --- Métricas del servidor ---
+
+PETICIONES = Contador(
+    'http_peticiones_total', 'Peticiones HTTP atendidas', ('metodo', 'ruta', 'estado'))
+DURACION = Histograma(
+    'http_duracion_segundos', 'Latencia de las peticiones HTTP por ruta', ('metodo', 'ruta'))
+BYTES_PETICION = Contador(
+    'http_bytes_peticion_total', 'Bytes recibidos en el cuerpo de las peticiones', ('ruta',))
+BYTES_RESPUESTA = Contador(
+    'http_bytes_respuesta_total', 'Bytes enviados en el cuerpo de las respuestas', ('ruta',))
+GUARDADOS = Histograma(
+    'guardado_duracion_segundos', 'Duración de la serialización y escritura de cada guardado', ('archivo',))
+BACKUPS = Histograma(
+    'backup_duracion_segundos', 'Duración del registro de la versión anterior en el historial', ('archivo',))
+CACHE = Contador(
+    'cache_consultas_total', 'Consultas a las cachés de archivos', ('cache', 'resultado'))
+
+
+def _ratios_cache():
+    with CACHE._candado:
+        valores = dict(CACHE._valores)
+    ratios = {}
+    for cache in {c for c, _ in valores}:
+        aciertos = valores.get((cache, 'acierto'), 0)
+        total = aciertos + valores.get((cache, 'fallo'), 0)
+        ratios[(cache,)] = aciertos / total if total else 0
+    return ratios
+
+
+RATIO_CACHE = Medidor(
+    'cache_ratio_aciertos', 'Fracción de consultas servidas desde memoria', ('cache',), _ratios_cache)
+
+
+def plantilla_ruta(scope, raiz=""):
+    """
+    Etiqueta de ruta de una petición ya atendida: la plantilla de la ruta
+    (/api/{coleccion}, no la URL, para no crear una serie por recurso),
+    "<montaje>/{path}" para lo servido por un montaje (/static, /data) y
+    "sin_ruta" si no coincidió nada. raiz es el root_path antes de enrutar.
+    """
+    ruta = scope.get("route")
+    # Los montajes se distinguen por tener rutas propias (Mount.routes)
+    if ruta is not None and not hasattr(ruta, "routes"):
+        return ruta.path
+    # Según la versión de Starlette el montaje queda en scope["route"] o
+    # solo se nota en que amplía root_path
+    montaje = getattr(ruta, "path", None) or scope.get("root_path", raiz)[len(raiz):]
+    return f"{montaje}/{{path}}" if montaje else "sin_ruta"
+
+
+class MiddlewareMetricas:
+    """Mide latencia, bytes y estado de cada petición, etiquetadas por plantilla de ruta"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        raiz = scope.get("root_path", "")
+        inicio = time.perf_counter()
+        recibidos = 0
+        enviados = 0
+        estado = 500
+
+        async def recibir():
+            nonlocal recibidos
+            mensaje = await receive()
+            if mensaje["type"] == "http.request":
+                recibidos += len(mensaje.get("body", b""))
+            return mensaje
+
+        async def enviar(mensaje):
+            nonlocal enviados, estado
+            if mensaje["type"] == "http.response.start":
+                estado = mensaje["status"]
+            elif mensaje["type"] == "http.response.body":
+                enviados += len(mensaje.get("body", b""))
+            await send(mensaje)
+
+        try:
+            await self.app(scope, recibir, enviar)
+        finally:
+            # El enrutador deja la ruta elegida en el scope
+            ruta = plantilla_ruta(scope, raiz)
+            metodo = scope["method"]
+            DURACION.observar(time.perf_counter() - inicio, metodo=metodo, ruta=ruta)
+            PETICIONES.inc(metodo=metodo, ruta=ruta, estado=str(estado))
+            BYTES_PETICION.inc(recibidos, ruta=ruta)
+            BYTES_RESPUESTA.inc(enviados, ruta=ruta)
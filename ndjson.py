@@ -0,0 +1,43 @@
+#!/usr/bin/env python3
+"""
+Respuestas NDJSON (un registro JSON por línea) para las colecciones grandes.
+
+Con Accept: application/x-ndjson, GET /data/<archivo>.json envía cada
+registro de la lista en su propia línea a medida que se serializa, en lugar
+de un único array. Los registros salen de los datos ya parseados de la caché
+(compartidos entre peticiones), así que cada petición solo tiene en memoria
+el trozo que está enviando y el cliente puede ir pintando según llegan.
+Un archivo cuya raíz es un objeto sale como una sola línea.
+"""
+
+import codec_json
+import compresion
+
+TIPO = 'application/x-ndjson'
+
+# Bytes que se acumulan antes de enviar un trozo
+TAMANO_TROZO = 16 * 1024
+
+
+def prefiere_ndjson(accept):
+    """Indica si la cabecera Accept pide NDJSON antes que JSON"""
+    return compresion.prefiere_tipo(accept, (TIPO,))
+
+
+def etag(entrada):
+    """ETag de la versión NDJSON de una entrada (distinto del de su JSON)"""
+    return entrada.etag[:-1] + '-ndjson"'
+
+
+async def lineas(datos, tamano_trozo=TAMANO_TROZO):
+    """Genera los registros de datos en NDJSON, en trozos de unos tamano_trozo bytes"""
+    registros = datos if isinstance(datos, list) else [datos]
+    trozo = bytearray()
+    for registro in registros:
+        trozo += codec_json.volcar(registro, compacto=True)
+        trozo += b'\n'
+        if len(trozo) >= tamano_trozo:
+            yield bytes(trozo)
+            trozo.clear()
+    if trozo:
+        yield bytes(trozo)
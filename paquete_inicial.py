@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+"""
+Paquete de arranque para index.html (/api/bootstrap).
+
+Reúne en un solo JSON los archivos fuente y los procesados que la página
+necesita para el primer render, de modo que basta una petición en lugar de
+una por archivo. El paquete se compone empalmando los bytes que ya están
+en la caché (no se vuelve a serializar nada) y se reconstruye solo cuando
+cambia el ETag de alguno de sus archivos; su propio ETag cubre el conjunto.
+"""
+
+import hashlib
+
+import codec_json
+from cache_datos import EntradaCache
+
+# Partes del paquete: nombre -> {clave: archivo relativo a data/}
+PARTES = {
+    'fuentes': {
+        'introduccion': 'introduccion.json',
+        'personajes': 'personajes.json',
+        'tramas': 'tramas.json',
+        'localizaciones': 'localizaciones.json',
+        'canciones': 'canciones.json',
+        'timeline': 'timeline.json',
+    },
+    'procesados': {
+        'introduccion': 'processed/introduccion_processed.json',
+        'personajes': 'processed/personajes_processed.json',
+        'tramas': 'processed/tramas_processed.json',
+        'localizaciones': 'processed/localizaciones_processed.json',
+        'canciones': 'processed/canciones_processed.json',
+        'timeline': 'processed/timeline_processed.json',
+        'network_data': 'processed/network_data.json',
+        'timeline_visual_data': 'processed/timeline_visual_data.json',
+    },
+}
+
+
+def _clave(texto):
+    return codec_json.volcar(texto, compacto=True)
+
+
+class PaqueteInicial:
+    """Paquetes de arranque construidos a partir de una CacheDatos"""
+
+    def __init__(self, cache):
+        self.cache = cache
+        self._paquetes = {}
+
+    def obtener(self, partes):
+        """
+        Entrada de caché con el paquete de las partes indicadas.
+
+        El JSON resultante es {"version", "etags", <parte>: {clave: datos}},
+        con null en los archivos que no existen.
+        """
+        partes = tuple(sorted(partes))
+        entradas = {
+            parte: {clave: self.cache.obtener(archivo) for clave, archivo in PARTES[parte].items()}
+            for parte in partes
+        }
+        firma = hashlib.sha256(' '.join(
+            entrada.etag if entrada is not None else '-'
+            for parte in partes for entrada in entradas[parte].values()
+        ).encode('ascii')).hexdigest()[:32]
+
+        paquete = self._paquetes.get(partes)
+        if paquete is not None and paquete[0] == firma:
+            return paquete[1]
+
+        etags = {
+            f"data/{PARTES[parte][clave]}": entrada.etag
+            for parte in partes for clave, entrada in entradas[parte].items()
+            if entrada is not None
+        }
+        trozos = [b'{"version":', _clave(firma), b',"etags":', _clave(etags)]
+        for parte in partes:
+            trozos += [b',', _clave(parte), b':{']
+            for i, (clave, entrada) in enumerate(entradas[parte].items()):
+                trozos += [b',' if i else b'', _clave(clave), b':',
+                           entrada.cuerpo if entrada is not None else b'null']
+            trozos.append(b'}')
+        trozos.append(b'}')
+        cuerpo = b''.join(trozos)
+
+        entrada = EntradaCache(None, cuerpo, 0, len(cuerpo))
+        self._paquetes[partes] = (firma, entrada)
+        return entrada
@@ -1,87 +1,549 @@
 #!/usr/bin/env python3
 """
 Script maestro que ejecuta todos los preprocesadores.
+
+Las etapas se declaran como un grafo: cada una indica sus entradas y salidas,
+las que no dependen entre sí se ejecutan en paralelo y solo se ejecutan las
+que tienen salidas desactualizadas respecto a sus entradas.
+
+Con --in-process las etapas se importan y ejecutan en este mismo proceso,
+compartiendo los JSON fuente parseados una sola vez. Con --watch se quedan
+vigilando data/*.json y data/imagenes y reconstruyen solo lo afectado;
+añadiendo --warm, las imágenes se generan en trabajadores que mantienen
+matplotlib cargado entre reconstrucciones.
+
+Cada ejecución deja métricas por etapa en data/processed/build_report.json.
 """
 
+import argparse
+import importlib
+import importlib.util
+import os
 import subprocess
 import sys
+import time
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
 from pathlib import Path
 
-def ejecutar_script(nombre_script, usar_conda=False):
-    """Ejecuta un script de Python"""
-    script_path = Path(nombre_script)
+import activos
+import binario
+import codec_json
+import compresion
+import informe_build
+import renderizador
+import vigilancia
+
+BASE_DIR = Path(__file__).parent
+
+# Directorios vigilados en modo --watch: data/ solo en su primer nivel
+DIRECTORIOS_VIGILADOS = ['data']
+ARBOLES_VIGILADOS = ['data/imagenes']
+
+# Archivos fuente editables desde la UI
+FUENTES = [
+    'data/personajes.json',
+    'data/localizaciones.json',
+    'data/canciones.json',
+    'data/tramas.json',
+    'data/introduccion.json',
+    'data/timeline.json',
+]
+
+# Grafo de etapas: las dependencias se deducen de entradas y salidas
+ETAPAS = [
+    {
+        'nombre': 'referencias',
+        'script': 'preprocess_references.py',
+        'funcion': 'preprocess_references:procesar_datos',
+        'argumentos': {Path(f).stem: f for f in FUENTES},
+        'resultado': None,
+        'entradas': FUENTES,
+        'salidas': [
+            'data/processed/personajes_processed.json',
+            'data/processed/localizaciones_processed.json',
+            'data/processed/canciones_processed.json',
+            'data/processed/tramas_processed.json',
+            'data/processed/introduccion_processed.json',
+            'data/processed/timeline_processed.json',
+        ],
+        'graficos': False,
+    },
+    {
+        'nombre': 'red',
+        'script': 'preprocess_network.py',
+        'funcion': 'preprocess_network:procesar_grafo',
+        'argumentos': {'personajes': 'data/personajes.json'},
+        'resultado': 'data/processed/network_data.json',
+        'entradas': ['data/personajes.json'],
+        'salidas': ['data/processed/network_data.json'],
+        'graficos': False,
+    },
+    {
+        'nombre': 'timeline',
+        'script': 'preprocess_timeline.py',
+        'funcion': 'preprocess_timeline:procesar_timeline',
+        'argumentos': {'timeline_data': 'data/timeline.json'},
+        'resultado': 'data/processed/timeline_visual_data.json',
+        'entradas': ['data/timeline.json'],
+        'salidas': ['data/processed/timeline_visual_data.json'],
+        'graficos': False,
+    },
+    {
+        'nombre': 'imagen_red',
+        'script': 'generate_network_image.py',
+        'funcion': 'generate_network_image:generar_grafo_imagen',
+        'argumentos': {'personajes': 'data/personajes.json'},
+        'resultado': None,
+        'entradas': ['data/personajes.json'],
+        'salidas': [
+            'data/processed/network_graph.png',
+            'data/processed/network_graph_web.png',
+        ],
+        'graficos': True,
+    },
+    {
+        'nombre': 'imagen_timeline',
+        'script': 'generate_timeline_image.py',
+        'funcion': 'generate_timeline_image:generar_timeline_imagen',
+        'argumentos': {'timeline_visual_data': 'data/processed/timeline_visual_data.json'},
+        'resultado': None,
+        'entradas': ['data/processed/timeline_visual_data.json'],
+        'salidas': [
+            'data/processed/timeline_graph.png',
+            'data/processed/timeline_graph_web.png',
+        ],
+        'graficos': True,
+    },
+    {
+        'nombre': 'compresion',
+        'script': 'compresion.py',
+        'funcion': 'compresion:comprimir_estaticos',
+        'argumentos': {},
+        'resultado': None,
+        'entradas': compresion.ARTEFACTOS,
+        'salidas': compresion.salidas(),
+        'graficos': False,
+    },
+    {
+        'nombre': 'binario',
+        'script': 'binario.py',
+        'funcion': 'binario:codificar_procesados',
+        'argumentos': {},
+        'resultado': None,
+        'entradas': binario.ARTEFACTOS,
+        'salidas': [a + binario.EXTENSION for a in binario.ARTEFACTOS],
+        'graficos': False,
+    },
+    {
+        'nombre': 'activos',
+        'script': 'activos.py',
+        'funcion': 'activos:generar_activos',
+        'argumentos': {},
+        'resultado': None,
+        'entradas': activos.entradas(),
+        'salidas': [activos.MANIFIESTO, activos.PAGINA_REESCRITA],
+        'graficos': False,
+    },
+]
+
+
+def dependencias(etapa, etapas=ETAPAS):
+    """Devuelve los nombres de las etapas que producen alguna entrada de la etapa"""
+    entradas = set(etapa['entradas'])
+    return {
+        otra['nombre'] for otra in etapas
+        if otra is not etapa and entradas.intersection(otra['salidas'])
+    }
+
+
+def afecta(entrada, cambio):
+    """Indica si un archivo cambiado corresponde a una entrada (archivo o directorio)"""
+    entrada = entrada.rstrip('/')
+    if cambio.endswith('/'):
+        # Directorio completo cambiado (p. ej. desbordamiento de inotify)
+        return entrada == cambio.rstrip('/') or entrada.startswith(cambio)
+    return cambio == entrada or cambio.startswith(entrada + '/')
+
+
+def etapas_afectadas(cambios, etapas=ETAPAS):
+    """Devuelve las etapas que leen algún archivo cambiado y todas las que dependen de ellas"""
+    afectadas = {
+        e['nombre'] for e in etapas
+        if any(afecta(entrada, c) for entrada in e['entradas'] for c in cambios)
+    }
+    creciendo = True
+    while creciendo:
+        creciendo = False
+        for etapa in etapas:
+            if etapa['nombre'] not in afectadas and dependencias(etapa, etapas) & afectadas:
+                afectadas.add(etapa['nombre'])
+                creciendo = True
+    return [e for e in etapas if e['nombre'] in afectadas]
+
+
+def esta_desactualizada(etapa):
+    """Indica si alguna salida falta o es más antigua que sus entradas o su script"""
+    try:
+        mtime_salida = min((BASE_DIR / s).stat().st_mtime_ns for s in etapa['salidas'])
+    except FileNotFoundError:
+        return True
+
+    for entrada in list(etapa['entradas']) + [etapa['script']]:
+        ruta = BASE_DIR / entrada
+        if ruta.exists() and ruta.stat().st_mtime_ns > mtime_salida:
+            return True
+    return False
+
+
+def hay_graficos_locales():
+    """Comprueba si el intérprete actual tiene matplotlib y networkx"""
+    return all(importlib.util.find_spec(m) is not None for m in ('matplotlib', 'networkx'))
+
+
+def ruta_perfil(etapa):
+    """Ruta del volcado de cProfile de una etapa"""
+    return BASE_DIR / informe_build.DIRECTORIO_PERFILES / f"{etapa['nombre']}.prof"
+
+
+def ejecutar_script(nombre_script, usar_conda=False, perfil=None):
+    """
+    Ejecuta un script de Python en un subproceso.
+
+    El tiempo de CPU y el pico de RSS se obtienen de os.wait4, que los da
+    por hijo aunque haya varias etapas en paralelo. Con perfil se ejecuta
+    bajo cProfile y se vuelca en esa ruta.
+
+    Returns:
+        (éxito, salida capturada, métricas)
+    """
+    script_path = BASE_DIR / nombre_script
     if not script_path.exists():
-        print(f"✗ Error: No se encuentra {nombre_script}")
-        return False
-    
-    print(f"\n{'='*60}")
-    print(f"Ejecutando: {nombre_script}")
-    print('='*60)
-    
+        return False, f"✗ Error: No se encuentra {nombre_script}\n", {}
+
+    if usar_conda:
+        # Usar conda run para ejecutar en el entorno radio
+        cmd = ['conda', 'run', '-n', 'radio', 'python']
+    else:
+        cmd = [sys.executable]
+    if perfil:
+        perfil.parent.mkdir(parents=True, exist_ok=True)
+        cmd += ['-m', 'cProfile', '-o', str(perfil)]
+    cmd.append(str(script_path))
+
+    metricas = {}
+    inicio = time.perf_counter()
     try:
-        if usar_conda:
-            # Usar conda run para ejecutar en el entorno radio
-            cmd = ['conda', 'run', '-n', 'radio', 'python', str(script_path)]
-        else:
-            cmd = [sys.executable, str(script_path)]
-        
-        result = subprocess.run(
+        proc = subprocess.Popen(
             cmd,
-            check=True,
-            capture_output=True,
-            text=True
+            stdout=subprocess.PIPE,
+            stderr=subprocess.STDOUT,
+            text=True,
+            cwd=BASE_DIR
         )
-        print(result.stdout)
-        if result.stderr:
-            print(result.stderr)
-        return True
-    except subprocess.CalledProcessError as e:
-        print(f"✗ Error ejecutando {nombre_script}:")
-        print(e.stdout)
-        print(e.stderr)
-        return False
-
-def main():
-    """Ejecuta todos los scripts de preprocesamiento"""
-    # Scripts que no requieren conda (solo biblioteca estándar)
-    scripts_normales = [
-        'preprocess_references.py',
-        'preprocess_network.py',
-        'preprocess_timeline.py'
-    ]
-    
-    # Scripts que requieren conda (matplotlib, networkx)
-    scripts_conda = [
-        'generate_network_image.py',
-        'generate_timeline_image.py'
-    ]
-    
+    except OSError as e:
+        return False, f"✗ Error ejecutando {nombre_script}:\n{e}\n", {}
+
+    salida = proc.stdout.read()
+    proc.stdout.close()
+    if hasattr(os, 'wait4'):
+        _, estado, uso = os.wait4(proc.pid, 0)
+        proc.returncode = os.waitstatus_to_exitcode(estado)
+        metricas['cpu_s'] = round(uso.ru_utime + uso.ru_stime, 4)
+        metricas['rss_pico_kb'] = informe_build.rss_pico_kb(uso)
+    else:
+        proc.wait()
+    metricas['tiempo_s'] = round(time.perf_counter() - inicio, 4)
+
+    if proc.returncode != 0:
+        return False, f"✗ Error ejecutando {nombre_script}:\n{salida}", metricas
+    if perfil:
+        informe_build.resumen_perfil(perfil)
+        metricas['perfil'] = str(perfil)
+    return True, salida, metricas
+
+
+def orden_topologico(etapas=ETAPAS):
+    """Ordena las etapas de forma que cada una vaya después de sus dependencias"""
+    pendientes = {e['nombre']: dependencias(e, etapas) for e in etapas}
+    ordenadas = []
+    while pendientes:
+        listas = [e for e in etapas
+                  if e['nombre'] in pendientes and not pendientes[e['nombre']]]
+        if not listas:
+            raise ValueError(f"Dependencias circulares entre etapas: {sorted(pendientes)}")
+        for etapa in listas:
+            ordenadas.append(etapa)
+            del pendientes[etapa['nombre']]
+        for deps in pendientes.values():
+            deps.difference_update(e['nombre'] for e in listas)
+    return ordenadas
+
+
+def cargar_compartido(ruta, datos):
+    """Devuelve el JSON de la ruta, parseándolo solo la primera vez"""
+    if ruta not in datos:
+        datos[ruta] = codec_json.leer(BASE_DIR / ruta)
+    return datos[ruta]
+
+
+def ejecutar_en_proceso(etapas=ETAPAS, forzar=False, datos=None, informe=None, perfilar=False):
+    """
+    Ejecuta las etapas en este proceso, importando sus funciones.
+
+    Cada JSON fuente se parsea una sola vez y el mismo objeto (de solo
+    lectura) se entrega a todas las etapas que lo usan. Lo que devuelve una
+    etapa se registra como su 'resultado' para que las siguientes no vuelvan
+    a leerlo del disco. Las funciones de etapa usan rutas relativas a data/,
+    por lo que el directorio de trabajo debe ser BASE_DIR.
+
+    Las métricas de cada etapa se añaden a informe si se pasa un diccionario.
+
+    Returns:
+        Diccionario nombre -> 'ok', 'omitida' o 'error'
+    """
+    datos = {} if datos is None else datos
+    informe = {} if informe is None else informe
+    resultados = {}
+
+    for etapa in orden_topologico(etapas):
+        nombre = etapa['nombre']
+        if any(resultados.get(d) == 'error' for d in dependencias(etapa, etapas)):
+            print(f"\n⚠️  {etapa['script']} no se ejecuta: falló una dependencia")
+            resultados[nombre] = 'error'
+            continue
+        if not forzar and not esta_desactualizada(etapa):
+            print(f"• {etapa['script']}: al día, se omite")
+            resultados[nombre] = 'omitida'
+            continue
+
+        print(f"\n{'='*60}")
+        print(f"Ejecutando: {etapa['funcion']}")
+        print('='*60)
+        medicion = informe_build.Medicion(ruta_perfil(etapa) if perfilar else None)
+        try:
+            with medicion:
+                modulo, funcion = etapa['funcion'].split(':')
+                funcion = getattr(importlib.import_module(modulo), funcion)
+                kwargs = {
+                    arg: cargar_compartido(ruta, datos)
+                    for arg, ruta in etapa['argumentos'].items()
+                }
+                valor = funcion(**kwargs)
+        except Exception as e:
+            print(f"✗ Error ejecutando {etapa['funcion']}: {e}")
+            resultados[nombre] = 'error'
+            informe[nombre] = dict(medicion.metricas, estado='error')
+            continue
+
+        if etapa['resultado']:
+            datos[etapa['resultado']] = valor
+        resultados[nombre] = 'ok'
+        informe[nombre] = informe_build.completar_metricas(
+            BASE_DIR, etapa, dict(medicion.metricas, estado='ok')
+        )
+
+    for nombre, resultado in resultados.items():
+        informe.setdefault(nombre, {'estado': resultado})
+    return resultados
+
+
+def ejecutar_etapas(etapas=ETAPAS, forzar=False, trabajos=None, informe=None, perfilar=False,
+                    renderizadores=None):
+    """
+    Ejecuta las etapas respetando sus dependencias.
+
+    Las etapas listas se lanzan en paralelo, cada una en su propio proceso.
+    Una etapa se evalúa como desactualizada justo antes de lanzarla, cuando
+    sus dependencias ya han terminado. Las métricas de cada etapa se añaden
+    a informe si se pasa un diccionario. Las etapas con un renderizador
+    caliente en renderizadores se envían a él en lugar de a un subproceso nuevo.
+
+    Returns:
+        Diccionario nombre -> 'ok', 'omitida' o 'error'
+    """
+    informe = {} if informe is None else informe
+    deps = {e['nombre']: dependencias(e, etapas) for e in etapas}
+    por_nombre = {e['nombre']: e for e in etapas}
+    usar_conda = not hay_graficos_locales()
+    resultados = {}
+    en_curso = {}
+
+    with ThreadPoolExecutor(max_workers=trabajos or os.cpu_count()) as pool:
+        while len(resultados) < len(etapas):
+            for nombre, etapa in por_nombre.items():
+                if nombre in resultados or nombre in en_curso.values():
+                    continue
+                if not deps[nombre].issubset(resultados):
+                    continue
+
+                if any(resultados[d] == 'error' for d in deps[nombre]):
+                    print(f"\n⚠️  {etapa['script']} no se ejecuta: falló una dependencia")
+                    resultados[nombre] = 'error'
+                elif not forzar and not esta_desactualizada(etapa):
+                    print(f"• {etapa['script']}: al día, se omite")
+                    resultados[nombre] = 'omitida'
+                elif renderizadores and nombre in renderizadores:
+                    futuro = pool.submit(
+                        renderizadores[nombre].ejecutar,
+                        perfil=ruta_perfil(etapa) if perfilar else None
+                    )
+                    en_curso[futuro] = nombre
+                else:
+                    futuro = pool.submit(
+                        ejecutar_script,
+                        etapa['script'],
+                        usar_conda=etapa['graficos'] and usar_conda,
+                        perfil=ruta_perfil(etapa) if perfilar else None
+                    )
+                    en_curso[futuro] = nombre
+
+            if not en_curso:
+                continue
+
+            terminados, _ = wait(en_curso, return_when=FIRST_COMPLETED)
+            for futuro in terminados:
+                nombre = en_curso.pop(futuro)
+                etapa = por_nombre[nombre]
+                exito, salida, metricas = futuro.result()
+
+                print(f"\n{'='*60}")
+                print(f"Ejecutado: {etapa['script']}")
+                print('='*60)
+                print(salida)
+
+                if exito:
+                    resultados[nombre] = 'ok'
+                    informe[nombre] = informe_build.completar_metricas(
+                        BASE_DIR, etapa, dict(metricas, estado='ok')
+                    )
+                else:
+                    resultados[nombre] = 'error'
+                    informe[nombre] = dict(metricas, estado='error')
+                    print(f"\n⚠️  Advertencia: {etapa['script']} falló")
+                    if etapa['graficos']:
+                        print("   💡 Asegúrate de tener el entorno conda 'radio' activado")
+                        print("   💡 O ejecuta: conda activate radio")
+
+    for nombre, resultado in resultados.items():
+        informe.setdefault(nombre, {'estado': resultado})
+    return resultados
+
+
+def construir(etapas=ETAPAS, forzar=False, en_proceso=False, trabajos=None, perfilar=False,
+              renderizadores=None):
+    """Ejecuta las etapas y escribe build_report.json con sus métricas"""
+    informe = {}
+    inicio = time.perf_counter()
+    if en_proceso:
+        resultados = ejecutar_en_proceso(etapas, forzar=forzar, informe=informe, perfilar=perfilar)
+    else:
+        resultados = ejecutar_etapas(etapas, forzar=forzar, trabajos=trabajos,
+                                     informe=informe, perfilar=perfilar,
+                                     renderizadores=renderizadores)
+    informe_build.escribir_informe(
+        BASE_DIR,
+        {e['nombre']: informe[e['nombre']] for e in etapas if e['nombre'] in informe},
+        'en_proceso' if en_proceso else 'subprocesos',
+        time.perf_counter() - inicio
+    )
+    return resultados
+
+
+def crear_renderizadores(etapas=ETAPAS):
+    """Crea un renderizador caliente por cada etapa gráfica"""
+    usar_conda = not hay_graficos_locales()
+    return {
+        e['nombre']: renderizador.RenderizadorCaliente(e['funcion'], usar_conda=usar_conda)
+        for e in etapas if e['graficos']
+    }
+
+
+def vigilar(en_proceso=False, trabajos=None, debounce=0.3, sondeo=False, perfilar=False,
+            caliente=False):
+    """
+    Reconstruye las etapas afectadas cada vez que cambian los datos fuente.
+
+    Las ráfagas de guardados (por ejemplo varias llamadas a /api/save
+    seguidas) se agrupan en una sola reconstrucción: se espera a que pasen
+    debounce segundos sin cambios antes de lanzarla. Con caliente, las
+    etapas gráficas se ejecutan en renderizadores que sobreviven entre
+    reconstrucciones (en modo en_proceso ya lo hacen por estar importadas).
+    """
+    renderizadores = crear_renderizadores() if caliente and not en_proceso else None
+    vigilante = vigilancia.crear_vigilante(
+        BASE_DIR, DIRECTORIOS_VIGILADOS, ARBOLES_VIGILADOS, sondeo=sondeo
+    )
+    tipo = 'inotify' if isinstance(vigilante, vigilancia.VigilanteInotify) else 'sondeo'
+    print(f"\n👀 Vigilando {', '.join(DIRECTORIOS_VIGILADOS + ARBOLES_VIGILADOS)} ({tipo}). Ctrl+C para salir.")
+
+    try:
+        while True:
+            cambios = vigilancia.esperar_rafaga(vigilante, debounce)
+            etapas = etapas_afectadas(cambios)
+            if not etapas:
+                continue
+
+            print(f"\n🔄 Cambios: {', '.join(sorted(cambios))}")
+            print(f"   Etapas afectadas: {', '.join(e['nombre'] for e in etapas)}")
+            resultados = construir(etapas, en_proceso=en_proceso, trabajos=trabajos,
+                                   perfilar=perfilar, renderizadores=renderizadores)
+            errores = sum(1 for r in resultados.values() if r == 'error')
+            print(f"{'✅' if errores == 0 else '⚠️ '} Reconstrucción terminada "
+                  f"({errores} con error)")
+    except KeyboardInterrupt:
+        print("\n👋 Vigilancia detenida")
+    finally:
+        vigilante.cerrar()
+        for r in (renderizadores or {}).values():
+            r.cerrar()
+    return 0
+
+
+def main(argv=None):
+    """Ejecuta los scripts de preprocesamiento desactualizados"""
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--force', action='store_true',
+                        help='Ejecutar todas las etapas aunque estén al día')
+    parser.add_argument('-j', '--jobs', type=int, default=None,
+                        help='Número máximo de etapas en paralelo')
+    parser.add_argument('--in-process', action='store_true',
+                        help='Ejecutar las etapas en este proceso compartiendo los datos parseados')
+    parser.add_argument('--watch', action='store_true',
+                        help='Tras la primera pasada, vigilar los datos y reconstruir lo afectado')
+    parser.add_argument('--debounce', type=float, default=0.3,
+                        help='Segundos sin cambios antes de reconstruir en modo --watch')
+    parser.add_argument('--poll', action='store_true',
+                        help='Usar sondeo en lugar de inotify en modo --watch')
+    parser.add_argument('--warm', action='store_true',
+                        help='En modo --watch, mantener vivos trabajadores con matplotlib precargado')
+    parser.add_argument('--profile', action='store_true',
+                        help='Guardar un perfil de cProfile por etapa en data/processed/profiles/')
+    parser.add_argument('--changed', action='append', default=None, metavar='RUTA',
+                        help='Construir solo las etapas afectadas por este archivo (repetible)')
+    args = parser.parse_args(argv)
+
     print("🚀 Iniciando preprocesamiento de datos...")
-    
-    exitos = 0
-    total = len(scripts_normales) + len(scripts_conda)
-    
-    # Ejecutar scripts normales
-    for script in scripts_normales:
-        if ejecutar_script(script, usar_conda=False):
-            exitos += 1
-        else:
-            print(f"\n⚠️  Advertencia: {script} falló")
-    
-    # Ejecutar scripts que requieren conda
-    for script in scripts_conda:
-        if ejecutar_script(script, usar_conda=True):
-            exitos += 1
-        else:
-            print(f"\n⚠️  Advertencia: {script} falló")
-            print("   💡 Asegúrate de tener el entorno conda 'radio' activado")
-            print("   💡 O ejecuta: conda activate radio")
-    
+
+    etapas = etapas_afectadas(args.changed) if args.changed else ETAPAS
+    if args.in_process:
+        os.chdir(BASE_DIR)
+    resultados = construir(etapas, forzar=args.force, en_proceso=args.in_process,
+                           trabajos=args.jobs, perfilar=args.profile)
+    exitos = sum(1 for r in resultados.values() if r == 'ok')
+    omitidas = sum(1 for r in resultados.values() if r == 'omitida')
+    errores = sum(1 for r in resultados.values() if r == 'error')
+
     print(f"\n{'='*60}")
-    print(f"✅ Preprocesamiento completado: {exitos}/{total} scripts exitosos")
+    print(f"✅ Preprocesamiento completado: {exitos} ejecutadas, "
+          f"{omitidas} al día, {errores} con error ({len(resultados)} etapas)")
     print('='*60)
-    
-    if exitos == total:
+
+    if args.watch:
+        return vigilar(en_proceso=args.in_process, trabajos=args.jobs,
+                       debounce=args.debounce, sondeo=args.poll, perfilar=args.profile,
+                       caliente=args.warm)
+
+    if errores == 0:
         print("\n✓ Todos los datos han sido preprocesados correctamente.")
         print("  Los archivos procesados están en: data/processed/")
         return 0
@@ -91,5 +553,3 @@ def main():
 
 if __name__ == '__main__':
     sys.exit(main())
-
-
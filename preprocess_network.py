@@ -4,16 +4,21 @@ Script para preprocesar datos del grafo de relaciones.
 Genera nodos y aristas ya procesados para la visualización de red.
 """
 
-import json
 from pathlib import Path
 
-def procesar_grafo():
-    """Procesa personajes y genera datos del grafo preprocesados"""
+import codec_json
+
+def procesar_grafo(personajes=None):
+    """
+    Procesa personajes y genera datos del grafo preprocesados.
+
+    Si se recibe la lista de personajes ya parseada no se lee el archivo.
+    """
     data_dir = Path('data')
     
     # Cargar personajes
-    with open(data_dir / 'personajes.json', 'r', encoding='utf-8') as f:
-        personajes = json.load(f)
+    if personajes is None:
+        personajes = codec_json.leer(data_dir / 'personajes.json')
     
     nodes = []
     edges = []
@@ -78,10 +83,11 @@ def procesar_grafo():
     output_dir = Path('data/processed')
     output_dir.mkdir(exist_ok=True)
     
-    with open(output_dir / 'network_data.json', 'w', encoding='utf-8') as f:
-        json.dump(network_data, f, ensure_ascii=False, indent=2)
+    codec_json.escribir(output_dir / 'network_data.json', network_data)
     
     print(f"✓ Grafo preprocesado: {len(nodes)} nodos, {len(edges)} aristas")
+    
+    return network_data
 
 if __name__ == '__main__':
     procesar_grafo()
@@ -4,11 +4,13 @@ Script para preprocesar referencias en texto.
 Convierte nombres de personajes, localizaciones, canciones y tramas a enlaces HTML.
 """
 
-import json
 import re
 import os
 from pathlib import Path
 
+import codec_json
+from limpieza import limpiar_codigo_corrupto
+
 def escape_regex(text):
     """Escapa caracteres especiales para regex"""
     return re.escape(text)
@@ -45,21 +47,6 @@ def crear_enlace_trama(id_trama, texto, tramas):
     nombre = texto or trama['titulo']
     return f'<a href="#tramas" class="referencia-link" data-tipo="trama" data-id="{id_trama}">{nombre}</a>'
 
-def limpiar_codigo_corrupto(texto):
-    """Limpia código JavaScript corrupto de un string antes de procesar"""
-    if not texto:
-        return texto
-    
-    # Limpiar código corrupto específico que aparece comúnmente
-    # Patrón 1: "'); return false;">" que aparece fuera de tags
-    texto = re.sub(r"'\s*;\s*return\s+false\s*[^>]*>", '', texto, flags=re.IGNORECASE)
-    # Patrón 2: "{ .; }, 300);" que aparece fuera de tags
-    texto = re.sub(r'\{\s*\.\s*;\s*\}\s*,\s*\d+\s*\)\s*;', '', texto)
-    # Normalizar espacios
-    texto = re.sub(r'\s+', ' ', texto).strip()
-    
-    return texto
-
 def procesar_referencias_en_texto(texto, personajes, localizaciones, canciones, tramas):
     """Procesa referencias en texto y las convierte a enlaces HTML"""
     if not texto:
@@ -224,28 +211,44 @@ def procesar_array_texto(obj, campo, personajes, localizaciones, canciones, tram
             for item in obj[campo]
         ]
 
-def procesar_datos():
-    """Procesa todos los datos y genera versiones con referencias preprocesadas"""
+def cargar_json(ruta):
+    """Carga un archivo JSON"""
+    return codec_json.leer(ruta)
+
+def procesar_datos(personajes=None, localizaciones=None, canciones=None,
+                   tramas=None, introduccion=None, timeline=None):
+    """
+    Procesa todos los datos y genera versiones con referencias preprocesadas.
+
+    Los datos ya parseados pueden pasarse como argumentos; se tratan como de
+    solo lectura (se copian los registros antes de reescribir sus campos).
+    Los que no se pasen se cargan desde data/.
+    """
     data_dir = Path('data')
     
-    # Cargar datos originales
-    with open(data_dir / 'personajes.json', 'r', encoding='utf-8') as f:
-        personajes = json.load(f)
-    
-    with open(data_dir / 'localizaciones.json', 'r', encoding='utf-8') as f:
-        localizaciones = json.load(f)
-    
-    with open(data_dir / 'canciones.json', 'r', encoding='utf-8') as f:
-        canciones = json.load(f)
-    
-    with open(data_dir / 'tramas.json', 'r', encoding='utf-8') as f:
-        tramas = json.load(f)
+    # Cargar datos originales que no se hayan recibido ya parseados
+    if personajes is None:
+        personajes = cargar_json(data_dir / 'personajes.json')
+    if localizaciones is None:
+        localizaciones = cargar_json(data_dir / 'localizaciones.json')
+    if canciones is None:
+        canciones = cargar_json(data_dir / 'canciones.json')
+    if tramas is None:
+        tramas = cargar_json(data_dir / 'tramas.json')
+    if introduccion is None:
+        introduccion = cargar_json(data_dir / 'introduccion.json')
+    if timeline is None:
+        timeline = cargar_json(data_dir / 'timeline.json')
     
-    with open(data_dir / 'introduccion.json', 'r', encoding='utf-8') as f:
-        introduccion = json.load(f)
-    
-    with open(data_dir / 'timeline.json', 'r', encoding='utf-8') as f:
-        timeline = json.load(f)
+    # Copias superficiales: solo se reemplazan campos de primer nivel
+    personajes = [dict(p) for p in personajes]
+    localizaciones = [dict(l) for l in localizaciones]
+    canciones = [dict(c) for c in canciones]
+    tramas = [dict(t) for t in tramas]
+    timeline = [dict(e) for e in timeline]
+    introduccion = dict(introduccion)
+    if 'storyline' in introduccion:
+        introduccion['storyline'] = [dict(item) for item in introduccion['storyline']]
     
     # Procesar personajes
     for personaje in personajes:
@@ -285,25 +288,28 @@ def procesar_datos():
     output_dir = Path('data/processed')
     output_dir.mkdir(exist_ok=True)
     
-    with open(output_dir / 'personajes_processed.json', 'w', encoding='utf-8') as f:
-        json.dump(personajes, f, ensure_ascii=False, indent=2)
+    codec_json.escribir(output_dir / 'personajes_processed.json', personajes)
     
-    with open(output_dir / 'localizaciones_processed.json', 'w', encoding='utf-8') as f:
-        json.dump(localizaciones, f, ensure_ascii=False, indent=2)
+    codec_json.escribir(output_dir / 'localizaciones_processed.json', localizaciones)
     
-    with open(output_dir / 'canciones_processed.json', 'w', encoding='utf-8') as f:
-        json.dump(canciones, f, ensure_ascii=False, indent=2)
+    codec_json.escribir(output_dir / 'canciones_processed.json', canciones)
     
-    with open(output_dir / 'tramas_processed.json', 'w', encoding='utf-8') as f:
-        json.dump(tramas, f, ensure_ascii=False, indent=2)
+    codec_json.escribir(output_dir / 'tramas_processed.json', tramas)
     
-    with open(output_dir / 'introduccion_processed.json', 'w', encoding='utf-8') as f:
-        json.dump(introduccion, f, ensure_ascii=False, indent=2)
+    codec_json.escribir(output_dir / 'introduccion_processed.json', introduccion)
     
-    with open(output_dir / 'timeline_processed.json', 'w', encoding='utf-8') as f:
-        json.dump(timeline, f, ensure_ascii=False, indent=2)
+    codec_json.escribir(output_dir / 'timeline_processed.json', timeline)
     
     print("✓ Referencias preprocesadas guardadas en data/processed/")
+    
+    return {
+        'personajes': personajes,
+        'localizaciones': localizaciones,
+        'canciones': canciones,
+        'tramas': tramas,
+        'introduccion': introduccion,
+        'timeline': timeline,
+    }
 
 if __name__ == '__main__':
     procesar_datos()
@@ -4,17 +4,22 @@ Script para preprocesar datos del timeline visual.
 Genera items y groups ya procesados para la visualización de timeline.
 """
 
-import json
 from pathlib import Path
 from datetime import datetime, timedelta
 
-def procesar_timeline():
-    """Procesa eventos del timeline y genera datos visuales preprocesados"""
+import codec_json
+
+def procesar_timeline(timeline_data=None):
+    """
+    Procesa eventos del timeline y genera datos visuales preprocesados.
+
+    Si se recibe la lista de eventos ya parseada no se lee el archivo.
+    """
     data_dir = Path('data')
     
     # Cargar timeline
-    with open(data_dir / 'timeline.json', 'r', encoding='utf-8') as f:
-        timeline_data = json.load(f)
+    if timeline_data is None:
+        timeline_data = codec_json.leer(data_dir / 'timeline.json')
     
     items = []
     groups = []
@@ -223,10 +228,11 @@ def procesar_timeline():
     output_dir = Path('data/processed')
     output_dir.mkdir(exist_ok=True)
     
-    with open(output_dir / 'timeline_visual_data.json', 'w', encoding='utf-8') as f:
-        json.dump(timeline_visual_data, f, ensure_ascii=False, indent=2, default=str)
+    codec_json.escribir(output_dir / 'timeline_visual_data.json', timeline_visual_data, default=str)
     
     print(f"✓ Timeline preprocesado: {len(items)} items, {len(groups)} grupos")
+    
+    return timeline_visual_data
 
 if __name__ == '__main__':
     procesar_timeline()
@@ -0,0 +1,501 @@
+#!/usr/bin/env python3
+"""
+Pruebas de carga de server.py.
+
+Lanza el servidor (uvicorn server:app) sobre una copia temporal del
+proyecto con datos sintéticos del tamaño indicado y ejecuta escenarios con
+clientes concurrentes (asyncio + httpx):
+
+  arranque   primer render: /, /api/bootstrap y /data/*.json, en frío y
+             revalidando con If-None-Match
+  guardados  /api/save, PUT /api/data/<archivo> y /api/timeline/save
+             concurrentes
+  mixto      tráfico del editor: lecturas con ETag, consultas por índice,
+             búsquedas, PATCH y guardados
+
+Para cada escenario y operación informa de latencias p50/p95/p99,
+peticiones por segundo y errores. Si existe el archivo de referencia
+(se crea con --guardar-referencia) la ejecución termina con código 1
+cuando algún escenario empeora más allá de la tolerancia.
+
+Uso:
+    python prueba_carga.py                         # todos los escenarios
+    python prueba_carga.py arranque -c 32 -d 20
+    python prueba_carga.py --escala 10 --guardar-referencia
+    python prueba_carga.py --url http://localhost:8000 arranque   # servidor ya lanzado
+"""
+
+import argparse
+import asyncio
+import math
+import os
+import random
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import httpx
+
+import codec_json
+
+BASE_DIR = Path(__file__).parent
+REFERENCIA = BASE_DIR / 'referencia_carga.json'
+
+# Empeoramiento admitido respecto a la referencia (0.25 = un 25 %)
+TOLERANCIA = 0.25
+
+FUENTES = ['introduccion', 'personajes', 'localizaciones', 'canciones', 'tramas', 'timeline']
+PROCESADOS = [f'processed/{f}_processed.json' for f in FUENTES] + [
+    'processed/network_data.json', 'processed/timeline_visual_data.json'
+]
+ETAPAS = ['origen', 'despertar', 'conflicto', 'convergencia', 'desenlace']
+ETIQUETAS = ['cuántico', 'micelio', 'música', 'ecología', 'cósmico', 'industria', 'memoria', 'ritual']
+
+PALABRAS = """
+    nebulosa micelio cuántico energía canción ritmo bosque río Orinoco diamante
+    hielo glaciar felino dimensión periodista bruja radio frecuencia señal eco
+    sombra luz aurora tormenta raíz semilla espora red memoria ciudad desierto
+    montaña océano estrella cuásar viaje despertar conciencia música industria
+    tóxica ecología profunda destino Tierra fuerza vínculo ritual canto grieta
+    portal tiempo futuro pasado silencio ruido latido corazón espíritu máquina
+""".split()
+
+
+# --- Datos sintéticos ---
+
+def _texto(rnd, palabras):
+    return ' '.join(rnd.choice(PALABRAS) for _ in range(palabras)).capitalize() + '.'
+
+
+def _algunos(rnd, ids, maximo):
+    return rnd.sample(ids, min(len(ids), rnd.randint(1, maximo))) if ids else []
+
+
+def generar_datos(escala=1, semilla=0):
+    """Conjunto de datos sintético con la forma de data/*.json"""
+    rnd = random.Random(semilla)
+    n = max(1, int(10 * escala))
+    personajes_ids = [f'personaje-{i}' for i in range(n)]
+    localizaciones_ids = [f'lugar-{i}' for i in range(n)]
+    tramas_ids = [f'trama-{i}' for i in range(n * 2)]
+
+    personajes = [{
+        'id': pid,
+        'nombre': f'Personaje {i} {rnd.choice(PALABRAS).capitalize()}',
+        'rol': _texto(rnd, 3),
+        'origen': _texto(rnd, 60),
+        'descripcion': _texto(rnd, 80),
+        'motivaciones': [_texto(rnd, 8) for _ in range(3)],
+        'habilidades': [_texto(rnd, 6) for _ in range(3)],
+        'relaciones': [{'con': otro, 'tipo': _texto(rnd, 2)} for otro in _algunos(rnd, personajes_ids, 4)],
+        'aparicion': rnd.choice(ETAPAS),
+        'etiquetas': _algunos(rnd, ETIQUETAS, 3),
+    } for i, pid in enumerate(personajes_ids)]
+
+    localizaciones = [{
+        'id': lid,
+        'nombre': f'Lugar {i} {rnd.choice(PALABRAS).capitalize()}',
+        'descripcion': _texto(rnd, 50),
+        'tipo': rnd.choice(['natural', 'urbano', 'cósmico']),
+        'elementos_clave': [_texto(rnd, 3) for _ in range(3)],
+        'tramas_relacionadas': _algunos(rnd, tramas_ids, 3),
+        'personajes_relacionados': _algunos(rnd, personajes_ids, 3),
+    } for i, lid in enumerate(localizaciones_ids)]
+
+    canciones = [{
+        'id': f'cancion-{i}',
+        'titulo': f'Canción {i} {rnd.choice(PALABRAS)}',
+        'letra': [_texto(rnd, 6) if rnd.random() > 0.2 else '' for _ in range(30)],
+        'descripcion': _texto(rnd, 40),
+        'significado': _texto(rnd, 40),
+        'personajes_relacionados': _algunos(rnd, personajes_ids, 3),
+        'tramas_relacionadas': _algunos(rnd, tramas_ids, 2),
+        'etapa': rnd.choice(ETAPAS),
+        'instrumental': rnd.random() < 0.2,
+    } for i in range(n)]
+
+    tramas = [{
+        'id': tid,
+        'titulo': f'Trama {i} {rnd.choice(PALABRAS)}',
+        'resumen': _texto(rnd, 70),
+        'personajes_implicados': _algunos(rnd, personajes_ids, 4),
+        'localizaciones': _algunos(rnd, localizaciones_ids, 2),
+    } for i, tid in enumerate(tramas_ids)]
+
+    timeline = [{
+        'id': f'evento-{i}',
+        'titulo': f'Evento {i} {rnd.choice(PALABRAS)}',
+        'descripcion': _texto(rnd, 40),
+        'personajes_implicados': _algunos(rnd, personajes_ids, 3),
+        'localizacion': rnd.choice(localizaciones_ids),
+        'etapa': ETAPAS[i * len(ETAPAS) // (n * 2)],
+        'simultaneo_con': [],
+    } for i in range(n * 2)]
+
+    introduccion = {campo: _texto(rnd, 120) for campo in ('logline', 'sinopsis', 'fundamentacion')}
+    introduccion['storyline'] = [
+        {'titulo': f'Parte {i + 1} — {rnd.choice(PALABRAS).capitalize()}', 'resumen': _texto(rnd, 80)}
+        for i in range(4)
+    ]
+
+    return {
+        'introduccion': introduccion,
+        'personajes': personajes,
+        'localizaciones': localizaciones,
+        'canciones': canciones,
+        'tramas': tramas,
+        'timeline': timeline,
+    }
+
+
+def preparar_proyecto(destino, datos):
+    """Copia el código del proyecto a destino y escribe los datos sintéticos en data/"""
+    destino = Path(destino)
+    for ruta in BASE_DIR.iterdir():
+        if ruta.is_file() and ruta.suffix in ('.py', '.html'):
+            shutil.copy2(ruta, destino / ruta.name)
+    (destino / 'data' / 'processed').mkdir(parents=True)
+    for nombre, contenido in datos.items():
+        codec_json.escribir(destino / 'data' / f'{nombre}.json', contenido)
+
+
+# --- Servidor ---
+
+def puerto_libre():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def lanzar_servidor(directorio, puerto, workers=1):
+    """Lanza uvicorn server:app en segundo plano desde directorio"""
+    entorno = dict(os.environ, RADIO_MICELIO_WORKERS=str(workers))
+    cmd = [sys.executable, '-m', 'uvicorn', 'server:app', '--host', '127.0.0.1',
+           '--port', str(puerto), '--log-level', 'warning', '--no-access-log']
+    if workers > 1:
+        cmd += ['--workers', str(workers)]
+    return subprocess.Popen(cmd, cwd=directorio, env=entorno)
+
+
+async def esperar_servidor(url, proceso=None, espera_maxima=30):
+    limite = time.monotonic() + espera_maxima
+    async with httpx.AsyncClient() as cliente:
+        while time.monotonic() < limite:
+            if proceso is not None and proceso.poll() is not None:
+                raise RuntimeError(f"El servidor terminó con código {proceso.returncode}")
+            try:
+                if (await cliente.get(f'{url}/api/files')).status_code == 200:
+                    return
+            except httpx.TransportError:
+                pass
+            await asyncio.sleep(0.2)
+    raise RuntimeError(f"El servidor no responde en {url}")
+
+
+# --- Operaciones ---
+
+class Sesion:
+    """Estado de un cliente simulado: ETags conocidos y copia de los datos"""
+
+    def __init__(self, cliente, datos, rnd):
+        self.cliente = cliente
+        self.datos = datos
+        self.rnd = rnd
+        self.etags = {}
+        self.contador = 0
+
+    async def leer(self, url, revalidar):
+        cabeceras = {'Accept-Encoding': 'gzip, br'}
+        if revalidar and url in self.etags:
+            cabeceras['If-None-Match'] = self.etags[url]
+        respuesta = await self.cliente.get(url, headers=cabeceras)
+        if 'etag' in respuesta.headers:
+            self.etags[url] = respuesta.headers['etag']
+        return respuesta
+
+    def modificado(self, nombre):
+        """Datos de un archivo fuente con un cambio pequeño en un registro"""
+        self.contador += 1
+        datos = self.datos[nombre]
+        marca = f' [{id(self) % 10000}-{self.contador}]'
+        if isinstance(datos, dict):
+            return dict(datos, logline=datos['logline'] + marca)
+        datos = list(datos)
+        i = self.rnd.randrange(len(datos))
+        campo = 'titulo' if 'titulo' in datos[i] else 'nombre'
+        datos[i] = dict(datos[i], **{campo: datos[i][campo].split(' [')[0] + marca})
+        return datos
+
+
+async def op_pagina(s):
+    return await s.leer('/', revalidar=False)
+
+
+async def op_bootstrap(s):
+    return await s.leer('/api/bootstrap', revalidar=False)
+
+
+async def op_bootstrap_304(s):
+    return await s.leer('/api/bootstrap', revalidar=True)
+
+
+async def op_json(s):
+    archivo = s.rnd.choice([f'{f}.json' for f in FUENTES] + PROCESADOS)
+    return await s.leer(f'/data/{archivo}', revalidar=False)
+
+
+async def op_json_304(s):
+    archivo = s.rnd.choice([f'{f}.json' for f in FUENTES] + PROCESADOS)
+    return await s.leer(f'/data/{archivo}', revalidar=True)
+
+
+async def op_consulta(s):
+    params = {s.rnd.choice(['etiquetas', 'aparicion']): s.rnd.choice(ETIQUETAS + ETAPAS),
+              'campos': 'id,nombre', 'limite': '20'}
+    return await s.cliente.get('/api/personajes', params=params)
+
+
+async def op_busqueda(s):
+    consulta = ' '.join(s.rnd.sample(PALABRAS, s.rnd.randint(1, 2)))
+    return await s.cliente.get('/api/search', params={'q': consulta, 'limite': '10'})
+
+
+async def op_patch(s):
+    nombre = s.rnd.choice(['personajes', 'tramas', 'canciones'])
+    registro = dict(s.rnd.choice(s.datos[nombre]))
+    registro['descripcion'] = _texto(s.rnd, 30)
+    return await s.cliente.patch(f'/api/data/{nombre}.json', json={'upsert': [registro]})
+
+
+async def op_guardar(s):
+    nombre = s.rnd.choice([f for f in FUENTES if f != 'timeline'])
+    return await s.cliente.post('/api/save', json={'ruta': f'data/{nombre}.json',
+                                                    'datos': s.modificado(nombre)})
+
+
+async def op_guardar_crudo(s):
+    nombre = s.rnd.choice(FUENTES)
+    cuerpo = codec_json.volcar(s.modificado(nombre))
+    return await s.cliente.put(f'/api/data/{nombre}.json', content=cuerpo,
+                               headers={'Content-Type': 'application/json'})
+
+
+async def op_guardar_timeline(s):
+    return await s.cliente.post('/api/timeline/save', json={'ruta': 'data/timeline.json',
+                                                             'datos': s.modificado('timeline')})
+
+
+# Escenario -> [(operación, peso, escribe)]
+ESCENARIOS = {
+    'arranque': [
+        (op_pagina, 1, False),
+        (op_bootstrap, 2, False),
+        (op_bootstrap_304, 4, False),
+        (op_json, 2, False),
+    ],
+    'guardados': [
+        (op_guardar, 3, True),
+        (op_guardar_crudo, 3, True),
+        (op_guardar_timeline, 1, True),
+    ],
+    'mixto': [
+        (op_json_304, 40, False),
+        (op_bootstrap_304, 5, False),
+        (op_consulta, 15, False),
+        (op_busqueda, 10, False),
+        (op_patch, 10, True),
+        (op_guardar_crudo, 4, True),
+        (op_guardar_timeline, 1, True),
+    ],
+}
+
+
+# --- Ejecución y medida ---
+
+def percentil(ordenadas, p):
+    """Percentil por rango más cercano sobre una lista ordenada"""
+    if not ordenadas:
+        return 0.0
+    return ordenadas[max(0, math.ceil(p / 100 * len(ordenadas)) - 1)]
+
+
+def resumir(muestras, duracion):
+    """Estadísticas de una lista de (latencia_s, correcta)"""
+    latencias = sorted(latencia for latencia, _ in muestras)
+    return {
+        'peticiones': len(muestras),
+        'errores': sum(1 for _, correcta in muestras if not correcta),
+        'rps': round(len(muestras) / duracion, 1),
+        'p50_ms': round(percentil(latencias, 50) * 1000, 2),
+        'p95_ms': round(percentil(latencias, 95) * 1000, 2),
+        'p99_ms': round(percentil(latencias, 99) * 1000, 2),
+    }
+
+
+async def ejecutar_escenario(url, nombre, datos, concurrencia, duracion, calentamiento, semilla):
+    operaciones = ESCENARIOS[nombre]
+    muestras = {op.__name__[3:]: [] for op, _, _ in operaciones}
+    limites = httpx.Limits(max_connections=concurrencia, max_keepalive_connections=concurrencia)
+    async with httpx.AsyncClient(base_url=url, limits=limites, timeout=60) as cliente:
+        inicio = time.perf_counter()
+        desde = inicio + calentamiento
+        hasta = desde + duracion
+
+        async def usuario(numero):
+            rnd = random.Random(semilla * 1000 + numero)
+            sesion = Sesion(cliente, datos, rnd)
+            funciones = [op for op, _, _ in operaciones]
+            pesos = [peso for _, peso, _ in operaciones]
+            while (antes := time.perf_counter()) < hasta:
+                op = rnd.choices(funciones, pesos)[0]
+                try:
+                    respuesta = await op(sesion)
+                    correcta = respuesta.status_code < 400
+                except httpx.HTTPError:
+                    correcta = False
+                if antes >= desde:
+                    muestras[op.__name__[3:]].append((time.perf_counter() - antes, correcta))
+
+        await asyncio.gather(*(usuario(i) for i in range(concurrencia)))
+
+    todas = [m for lista in muestras.values() for m in lista]
+    return {
+        'total': resumir(todas, duracion),
+        'operaciones': {op: resumir(lista, duracion) for op, lista in muestras.items() if lista},
+    }
+
+
+async def descargar_datos(url):
+    """Datos actuales de un servidor ya lanzado"""
+    async with httpx.AsyncClient(base_url=url) as cliente:
+        return {f: (await cliente.get(f'/data/{f}.json')).json() for f in FUENTES}
+
+
+def imprimir(nombre, resultado):
+    print(f"\n▶ {nombre}")
+    print(f"  {'operación':<18}{'peticiones':>11}{'errores':>9}{'rps':>9}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}")
+    filas = list(resultado['operaciones'].items()) + [('TOTAL', resultado['total'])]
+    for op, r in filas:
+        print(f"  {op:<18}{r['peticiones']:>11}{r['errores']:>9}{r['rps']:>9}"
+              f"{r['p50_ms']:>9}{r['p95_ms']:>9}{r['p99_ms']:>9}")
+
+
+def comparar(resultados, referencia, tolerancia=TOLERANCIA):
+    """Lista de empeoramientos de cada escenario respecto a la referencia"""
+    empeoramientos = []
+    for nombre, resultado in resultados.items():
+        ref = referencia.get(nombre)
+        if ref is None:
+            continue
+        actual, ref = resultado['total'], ref['total']
+        for medida in ('p50_ms', 'p95_ms', 'p99_ms'):
+            if ref[medida] and actual[medida] > ref[medida] * (1 + tolerancia):
+                empeoramientos.append(f"{nombre}: {medida} {actual[medida]} > {ref[medida]} (referencia)")
+        if ref['rps'] and actual['rps'] < ref['rps'] * (1 - tolerancia):
+            empeoramientos.append(f"{nombre}: rps {actual['rps']} < {ref['rps']} (referencia)")
+        if actual['errores'] > ref['errores']:
+            empeoramientos.append(f"{nombre}: errores {actual['errores']} > {ref['errores']} (referencia)")
+    return empeoramientos
+
+
+async def ejecutar(args):
+    proceso = None
+    temporal = None
+    try:
+        if args.url:
+            url = args.url.rstrip('/')
+            await esperar_servidor(url)
+            datos = await descargar_datos(url)
+        else:
+            temporal = tempfile.mkdtemp(prefix='prueba_carga_')
+            datos = generar_datos(args.escala, args.semilla)
+            preparar_proyecto(temporal, datos)
+            if not args.sin_procesar:
+                print("⚙️  Construyendo data/processed/ de los datos sintéticos...")
+                subprocess.run([sys.executable, 'preprocess_all.py'], cwd=temporal,
+                               stdout=subprocess.DEVNULL, stderr=subprocess.STDOUT)
+            puerto = puerto_libre()
+            url = f'http://127.0.0.1:{puerto}'
+            proceso = lanzar_servidor(temporal, puerto, args.workers)
+            await esperar_servidor(url, proceso)
+
+        print(f"🌐 {url}  concurrencia={args.concurrencia}  duración={args.duracion}s  "
+              f"escala={args.escala if not args.url else '-'}  workers={args.workers}")
+        resultados = {}
+        for nombre in args.escenarios:
+            if args.url and not args.escribir and any(e for _, _, e in ESCENARIOS[nombre]):
+                print(f"\n• {nombre}: se omite (modifica datos; usa --escribir contra un servidor real)")
+                continue
+            resultados[nombre] = await ejecutar_escenario(
+                url, nombre, datos, args.concurrencia, args.duracion, args.calentamiento, args.semilla
+            )
+            imprimir(nombre, resultados[nombre])
+        return resultados
+    finally:
+        if proceso is not None:
+            proceso.terminate()
+            proceso.wait()
+        if temporal is not None:
+            shutil.rmtree(temporal, ignore_errors=True)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('escenarios', nargs='*', metavar='escenario',
+                        help=f"Escenarios a ejecutar: {', '.join(ESCENARIOS)} (todos por defecto)")
+    parser.add_argument('-c', '--concurrencia', type=int, default=16, help='Clientes simultáneos')
+    parser.add_argument('-d', '--duracion', type=float, default=10, help='Segundos medidos por escenario')
+    parser.add_argument('--calentamiento', type=float, default=1, help='Segundos iniciales sin medir')
+    parser.add_argument('--escala', type=float, default=1, help='Tamaño de los datos sintéticos (1 ≈ 10 personajes)')
+    parser.add_argument('--semilla', type=int, default=0)
+    parser.add_argument('--workers', type=int, default=1, help='Procesos del servidor lanzado')
+    parser.add_argument('--sin-procesar', action='store_true',
+                        help='No construir data/processed/ antes de lanzar el servidor')
+    parser.add_argument('--url', help='Usar un servidor ya lanzado en lugar de uno con datos sintéticos')
+    parser.add_argument('--escribir', action='store_true',
+                        help='Con --url, ejecutar también los escenarios que guardan')
+    parser.add_argument('--referencia', type=Path, default=REFERENCIA, help='Archivo de referencia')
+    parser.add_argument('--guardar-referencia', action='store_true',
+                        help='Guardar estos resultados como nueva referencia')
+    parser.add_argument('--tolerancia', type=float, default=TOLERANCIA,
+                        help='Empeoramiento admitido respecto a la referencia (0.25 = 25 %%)')
+    parser.add_argument('--salida', type=Path, help='Escribir los resultados en JSON')
+    args = parser.parse_args(argv)
+    desconocidos = [e for e in args.escenarios if e not in ESCENARIOS]
+    if desconocidos:
+        parser.error(f"escenarios desconocidos: {', '.join(desconocidos)}")
+    args.escenarios = args.escenarios or list(ESCENARIOS)
+
+    resultados = asyncio.run(ejecutar(args))
+
+    if args.salida:
+        codec_json.escribir(args.salida, resultados)
+    if args.guardar_referencia:
+        referencia = {}
+        if args.referencia.exists():
+            referencia = codec_json.leer(args.referencia)
+        referencia.update(resultados)
+        codec_json.escribir(args.referencia, referencia)
+        print(f"\n✓ Referencia guardada en {args.referencia}")
+        return 0
+
+    if not args.referencia.exists():
+        print(f"\n• Sin referencia ({args.referencia.name}); usa --guardar-referencia para crearla")
+        return 0
+    empeoramientos = comparar(resultados, codec_json.leer(args.referencia),
+                              args.tolerancia)
+    if empeoramientos:
+        print(f"\n✗ Empeoramientos respecto a la referencia (tolerancia {args.tolerancia:.0%}):")
+        for linea in empeoramientos:
+            print(f"  - {linea}")
+        return 1
+    print(f"\n✓ Sin empeoramientos respecto a la referencia (tolerancia {args.tolerancia:.0%})")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
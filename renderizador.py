@@ -0,0 +1,143 @@
+#!/usr/bin/env python3
+"""
+Trabajador "caliente" para los generadores de imágenes.
+
+Ejecutado como script, precarga matplotlib y networkx una sola vez y
+atiende peticiones por stdin (una línea JSON por petición) ejecutando las
+funciones de etapa indicadas. preprocess_all.py --watch --warm mantiene uno
+vivo por etapa gráfica, de modo que las reconstrucciones incrementales de
+las imágenes no vuelven a pagar el arranque del intérprete ni las
+importaciones. Si el código del módulo cambia en disco se recarga.
+"""
+
+import contextlib
+import importlib
+import io
+import os
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+os.environ.setdefault('MPLBACKEND', 'Agg')
+
+import codec_json
+import informe_build
+
+BASE_DIR = Path(__file__).parent
+
+
+def _cargar_funcion(referencia, modulos):
+    """Importa (o recarga si cambió en disco) la función 'modulo:funcion'"""
+    nombre_modulo, nombre_funcion = referencia.split(':')
+    modulo = importlib.import_module(nombre_modulo)
+    mtime = os.stat(modulo.__file__).st_mtime_ns
+    if modulos.setdefault(nombre_modulo, mtime) != mtime:
+        modulo = importlib.reload(modulo)
+        modulos[nombre_modulo] = mtime
+    if hasattr(modulo, 'importar_graficos'):
+        modulo.importar_graficos()
+    return getattr(modulo, nombre_funcion)
+
+
+def servir(precargar=()):
+    """Bucle del trabajador: lee peticiones de stdin y responde por stdout"""
+    os.chdir(BASE_DIR)
+    canal = sys.stdout
+    # Cualquier print suelto fuera de una petición no debe romper el protocolo
+    sys.stdout = sys.stderr
+    modulos = {}
+
+    for referencia in precargar:
+        _cargar_funcion(referencia, modulos)
+    canal.write(codec_json.volcar({'listo': True}, compacto=True).decode('utf-8') + '\n')
+    canal.flush()
+
+    for linea in sys.stdin:
+        if not linea.strip():
+            continue
+        peticion = codec_json.cargar(linea)
+        salida = io.StringIO()
+        respuesta = {'ok': True}
+        medicion = informe_build.Medicion(peticion.get('perfil'))
+        try:
+            with contextlib.redirect_stdout(salida), contextlib.redirect_stderr(salida):
+                funcion = _cargar_funcion(peticion['funcion'], modulos)
+                with medicion:
+                    funcion()
+        except Exception as e:
+            respuesta = {'ok': False}
+            salida.write(f"✗ Error ejecutando {peticion['funcion']}: {e}\n")
+        respuesta['salida'] = salida.getvalue()
+        respuesta['metricas'] = medicion.metricas
+        canal.write(codec_json.volcar(respuesta, compacto=True).decode('utf-8') + '\n')
+        canal.flush()
+
+
+class RenderizadorCaliente:
+    """Cliente de un trabajador renderizador que vive entre reconstrucciones"""
+
+    def __init__(self, funcion, usar_conda=False):
+        self.funcion = funcion
+        self.usar_conda = usar_conda
+        self._proc = None
+
+    def _arrancar(self):
+        if self.usar_conda:
+            cmd = ['conda', 'run', '--no-capture-output', '-n', 'radio', 'python']
+        else:
+            cmd = [sys.executable]
+        cmd += [str(BASE_DIR / 'renderizador.py'), self.funcion]
+        self._proc = subprocess.Popen(
+            cmd,
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            text=True,
+            cwd=BASE_DIR
+        )
+        # Esperar a que termine la precarga
+        if not self._proc.stdout.readline():
+            raise RuntimeError("El renderizador terminó durante la precarga")
+
+    def ejecutar(self, perfil=None):
+        """
+        Ejecuta la función en el trabajador, arrancándolo si hace falta.
+
+        Returns:
+            (éxito, salida capturada, métricas), como ejecutar_script
+        """
+        inicio = time.perf_counter()
+        for intento in range(2):
+            try:
+                if self._proc is None or self._proc.poll() is not None:
+                    self._arrancar()
+                peticion = {'funcion': self.funcion, 'perfil': str(perfil) if perfil else None}
+                self._proc.stdin.write(codec_json.volcar(peticion, compacto=True).decode('utf-8') + '\n')
+                self._proc.stdin.flush()
+                linea = self._proc.stdout.readline()
+                if not linea:
+                    raise BrokenPipeError("El renderizador terminó inesperadamente")
+                break
+            except (OSError, RuntimeError) as e:
+                self.cerrar()
+                if intento:
+                    return False, f"✗ Error en el renderizador de {self.funcion}: {e}\n", {}
+
+        respuesta = codec_json.cargar(linea)
+        metricas = respuesta['metricas']
+        metricas['tiempo_total_s'] = round(time.perf_counter() - inicio, 4)
+        return respuesta['ok'], respuesta['salida'], metricas
+
+    def cerrar(self):
+        if self._proc is not None:
+            with contextlib.suppress(OSError):
+                self._proc.stdin.close()
+            with contextlib.suppress(subprocess.TimeoutExpired):
+                self._proc.wait(timeout=5)
+            if self._proc.poll() is None:
+                self._proc.kill()
+            self._proc = None
+
+
+if __name__ == '__main__':
+    servir(sys.argv[1:])
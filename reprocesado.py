@@ -0,0 +1,159 @@
+#!/usr/bin/env python3
+"""
+Cola de reprocesado en segundo plano para server.py.
+
+Tras cada guardado el servidor encola el archivo fuente escrito. Un único
+trabajador asyncio espera a que pase un intervalo sin guardados nuevos,
+agrupa todos los archivos pendientes y lanza preprocess_all.py --changed
+con ellos, de modo que solo se reconstruyen las etapas afectadas. Los
+guardados que llegan durante una construcción se agrupan en la siguiente.
+El estado (etapas previstas, completadas y resultado de la última
+construcción) se consulta con estado(); al_empezar y al_terminar, si se
+indican, reciben la lista de etapas antes y después de cada construcción.
+Con varios workers cada uno tiene su cola; un candado entre procesos evita
+que dos construcciones escriban data/processed/ a la vez.
+"""
+
+import asyncio
+import sys
+import time
+from pathlib import Path
+
+import codec_json
+import escritura
+import informe_build
+import preprocess_all
+
+BASE_DIR = Path(__file__).parent
+
+
+class ColaReprocesado:
+    """Reconstrucciones incrementales agrupadas, una a la vez"""
+
+    def __init__(self, debounce=0.5, en_proceso=False, al_empezar=None, al_terminar=None):
+        self.debounce = debounce
+        self.en_proceso = en_proceso
+        self.al_empezar = al_empezar
+        self.al_terminar = al_terminar
+        self.pendientes = set()
+        self.construcciones = 0
+        self.en_curso = None
+        self.ultima = None
+        self._evento = None
+        self._tarea = None
+        self._ultimo_encolado = 0.0
+
+    def encolar(self, *rutas):
+        """Añade archivos cambiados (rutas relativas a la raíz, p. ej. 'data/tramas.json')"""
+        self.pendientes.update(rutas)
+        self._ultimo_encolado = time.monotonic()
+        if self._tarea is None or self._tarea.done():
+            self._evento = asyncio.Event()
+            self._tarea = asyncio.create_task(self._trabajar())
+        self._evento.set()
+
+    def estado(self):
+        """Estado de la cola para el endpoint de progreso"""
+        if self.en_curso is not None:
+            estado = 'construyendo'
+        elif self.pendientes:
+            estado = 'pendiente'
+        else:
+            estado = 'inactivo'
+        return {
+            'estado': estado,
+            'pendientes': sorted(self.pendientes),
+            'en_curso': self.en_curso,
+            'ultima': self.ultima,
+            'construcciones': self.construcciones,
+        }
+
+    async def _trabajar(self):
+        while True:
+            await self._evento.wait()
+            self._evento.clear()
+            # Esperar a que la ráfaga de guardados termine
+            while (espera := self._ultimo_encolado + self.debounce - time.monotonic()) > 0:
+                await asyncio.sleep(espera)
+            cambios, self.pendientes = self.pendientes, set()
+            if not cambios:
+                continue
+            try:
+                await self._construir(cambios)
+            except Exception as e:
+                # Un fallo en una construcción no puede parar la cola
+                print(f"✗ Error en el reprocesado de {', '.join(sorted(cambios))}: {e}")
+                self.en_curso = None
+
+    async def _construir(self, cambios):
+        async with escritura.candado('reprocesado'):
+            await self._construir_sin_candado(cambios)
+
+    async def _construir_sin_candado(self, cambios):
+        etapas = preprocess_all.etapas_afectadas(cambios)
+        if not etapas:
+            return
+        por_script = {e['script']: e['nombre'] for e in etapas}
+        self.en_curso = {
+            'cambios': sorted(cambios),
+            'etapas': [e['nombre'] for e in etapas],
+            'completadas': [],
+            'inicio': time.time(),
+        }
+        self._avisar(self.al_empezar, etapas)
+
+        cmd = [sys.executable, str(BASE_DIR / 'preprocess_all.py')]
+        if self.en_proceso:
+            cmd.append('--in-process')
+        for cambio in sorted(cambios):
+            cmd += ['--changed', cambio]
+
+        inicio = time.perf_counter()
+        try:
+            proc = await asyncio.create_subprocess_exec(
+                *cmd,
+                cwd=BASE_DIR,
+                stdout=asyncio.subprocess.PIPE,
+                stderr=asyncio.subprocess.STDOUT
+            )
+            # El progreso se sigue por las líneas que imprime cada etapa al terminar
+            async for linea in proc.stdout:
+                texto = linea.decode('utf-8', 'replace').strip()
+                for prefijo in ('Ejecutado: ', '• '):
+                    if texto.startswith(prefijo):
+                        script = texto[len(prefijo):].split(':')[0]
+                        if script in por_script:
+                            self.en_curso['completadas'].append(por_script[script])
+            codigo = await proc.wait()
+        except OSError as e:
+            print(f"✗ No se pudo lanzar el reprocesado: {e}")
+            codigo = None
+
+        self.ultima = dict(
+            self.en_curso,
+            fin=time.time(),
+            duracion_s=round(time.perf_counter() - inicio, 3),
+            exito=codigo == 0,
+            resultados=self._resultados()
+        )
+        self.en_curso = None
+        self.construcciones += 1
+        self._avisar(self.al_terminar, etapas)
+
+    @staticmethod
+    def _avisar(funcion, etapas):
+        """Llama a al_empezar/al_terminar; sus errores se informan y no se propagan"""
+        if funcion is None:
+            return
+        try:
+            funcion(etapas)
+        except Exception as e:
+            print(f"✗ Error en {funcion.__name__} del reprocesado: {e}")
+
+    def _resultados(self):
+        """Estado por etapa según el build_report.json de la última construcción"""
+        try:
+            informe = codec_json.leer(BASE_DIR / informe_build.RUTA_INFORME)
+        except (OSError, ValueError):
+            return {}
+        return {nombre: m.get('estado') for nombre, m in informe.get('etapas', {}).items()}
@@ -3,17 +3,64 @@
 Servidor FastAPI para guardar archivos JSON desde la UI.
 """
 
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Request
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse, FileResponse, HTMLResponse
+from fastapi.responses import JSONResponse, FileResponse, HTMLResponse, Response, StreamingResponse
 from fastapi.staticfiles import StaticFiles
 from pydantic import BaseModel
+from starlette.convertors import Convertor, register_url_convertor
+from starlette.datastructures import MutableHeaders
 from typing import Dict, Any, List
-import json
+import asyncio
+import contextlib
 import os
 from pathlib import Path
 
-app = FastAPI(title="Radio Micelio API", version="1.0.0")
+import activos
+import backups
+import binario
+import codec_json
+import busqueda
+import compresion
+import escritura
+import esquemas
+import eventos
+import indices
+import json_patch
+import metricas
+import ndjson
+import paquete_inicial
+import preprocess_all
+from cache_datos import CacheDatos, EntradaCache, etag_coincide
+from reprocesado import ColaReprocesado
+
+# Número de procesos del servidor; lo fija el modo producción (--workers)
+WORKERS = int(os.environ.get("RADIO_MICELIO_WORKERS", "1"))
+
+# Cada cuánto busca cada worker cambios escritos por los demás (segundos)
+INTERVALO_COHERENCIA = 1.0
+
+
+@contextlib.asynccontextmanager
+async def ciclo_de_vida(app):
+    """Con varios workers, vigila los archivos que escriben los demás"""
+    tarea = None
+    if WORKERS > 1:
+        tarea = asyncio.create_task(vigilar_otros_workers())
+    yield
+    if tarea is not None:
+        tarea.cancel()
+
+
+class RespuestaJSON(JSONResponse):
+    """Respuestas JSON de la API serializadas con codec_json (orjson si está)"""
+
+    def render(self, content):
+        return codec_json.volcar(content, compacto=True)
+
+
+app = FastAPI(title="Radio Micelio API", version="1.0.0", lifespan=ciclo_de_vida,
+              default_response_class=RespuestaJSON)
 
 # Configurar CORS para permitir requests desde el frontend
 app.add_middleware(
@@ -24,15 +71,154 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+
+class MiddlewareCompresion:
+    """
+    Comprime al vuelo (br o gzip) las respuestas de texto que no vengan ya
+    comprimidas. Solo actúa sobre respuestas de un único bloque, así que las
+    respuestas en streaming pasan intactas.
+    """
+
+    def __init__(self, app, minimo=1024):
+        self.app = app
+        self.minimo = minimo
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        
+        cabeceras_peticion = dict(scope["headers"])
+        codificacion = compresion.elegir_codificacion(
+            cabeceras_peticion.get(b"accept-encoding", b"").decode("latin-1"),
+            compresion.codificaciones_disponibles()
+        )
+        if codificacion is None:
+            await self.app(scope, receive, send)
+            return
+        
+        inicio = None
+        
+        async def enviar(mensaje):
+            nonlocal inicio
+            if mensaje["type"] == "http.response.start":
+                inicio = mensaje
+                return
+            if mensaje["type"] != "http.response.body" or inicio is None:
+                await send(mensaje)
+                return
+            
+            cabeceras = MutableHeaders(raw=inicio["headers"])
+            cuerpo = mensaje.get("body", b"")
+            if (mensaje.get("more_body", False)
+                    or "content-encoding" in cabeceras
+                    or len(cuerpo) < self.minimo
+                    or not compresion.es_comprimible(cabeceras.get("content-type", ""))):
+                await send(inicio)
+                inicio = None
+                await send(mensaje)
+                return
+            
+            cuerpo = compresion.comprimir(cuerpo, codificacion)
+            cabeceras["Content-Encoding"] = codificacion
+            if "etag" in cabeceras:
+                cabeceras["ETag"] = compresion.etag_codificado(cabeceras["etag"], codificacion)
+            cabeceras["Content-Length"] = str(len(cuerpo))
+            cabeceras.add_vary_header("Accept-Encoding")
+            await send(inicio)
+            inicio = None
+            await send({"type": "http.response.body", "body": cuerpo})
+        
+        await self.app(scope, receive, enviar)
+
+
+app.add_middleware(MiddlewareCompresion)
+
+# Métricas por ruta (/metrics); va por fuera para medir los bytes ya comprimidos
+app.add_middleware(metricas.MiddlewareMetricas)
+
 # Directorio base donde están los archivos JSON
 BASE_DIR = Path(__file__).parent
 DATA_DIR = BASE_DIR / "data"
 
-# Montar directorio de datos como estático (para servir los JSON procesados si es necesario)
-app.mount("/data", StaticFiles(directory=str(DATA_DIR)), name="data")
+# Caché en memoria de los JSON servidos bajo /data (originales y procesados)
+cache = CacheDatos(DATA_DIR, "datos")
 
-# Montar directorio raíz para servir archivos HTML como timeline_editor.html
-app.mount("/static", StaticFiles(directory=str(BASE_DIR)), name="static")
+# Caché de las páginas HTML de la raíz (index.html, timeline_editor.html)
+cache_paginas = CacheDatos(BASE_DIR, "paginas")
+
+# Notificaciones de cambios para los clientes conectados a /api/events
+canal_eventos = eventos.CanalEventos()
+
+# Última versión notificada de cada archivo (fuente o procesado)
+notificados = {}
+
+
+def salidas_json(etapas):
+    """Rutas relativas a data/ de los JSON que producen las etapas"""
+    return [
+        salida[len("data/"):] for etapa in etapas for salida in etapa["salidas"]
+        if salida.startswith("data/") and salida.endswith(".json")
+    ]
+
+
+def recordar_procesados(etapas):
+    """Antes de reconstruir, fija la versión de referencia de cada salida"""
+    for relativa in salidas_json(etapas):
+        if relativa not in notificados:
+            entrada = cache.obtener(relativa)
+            if entrada is not None:
+                notificados[relativa] = entrada
+
+
+def notificar_cambios(relativas):
+    """Publica los archivos que cambiaron desde la última versión notificada"""
+    for relativa in relativas:
+        entrada = cache.obtener(relativa)
+        anterior = notificados.get(relativa)
+        if entrada is None or (anterior is not None and anterior.etag == entrada.etag):
+            continue
+        ids = eventos.ids_cambiados(anterior.datos, entrada.datos) if anterior else None
+        notificados[relativa] = entrada
+        canal_eventos.cambio(f"data/{relativa}", entrada.etag, ids)
+
+
+def notificar_procesados(etapas):
+    """Tras reconstruir, publica los archivos procesados que cambiaron"""
+    notificar_cambios(salidas_json(etapas))
+
+
+async def vigilar_otros_workers():
+    """
+    Detecta con un stat periódico los archivos escritos por otros workers
+    (guardados y reconstrucciones) y los notifica a los clientes conectados
+    a este. Las cachés ya se revalidan solas por mtime y tamaño.
+    """
+    relativas = list(dict.fromkeys(sorted(ALLOWED_FILES) + salidas_json(preprocess_all.ETAPAS)))
+    for relativa in relativas:
+        entrada = cache.obtener(relativa)
+        if entrada is not None:
+            notificados.setdefault(relativa, entrada)
+    while True:
+        await asyncio.sleep(INTERVALO_COHERENCIA)
+        notificar_cambios(relativas)
+
+
+# Reconstrucción en segundo plano de data/processed/ tras cada guardado
+cola_reprocesado = ColaReprocesado(al_empezar=recordar_procesados,
+                                   al_terminar=notificar_procesados)
+
+# Páginas con las rutas de los recursos reescritas: nombre -> (firma, entrada)
+paginas_con_activos = {}
+
+# Los recursos con huella no cambian nunca de contenido
+CACHE_INMUTABLE = "public, max-age=31536000, immutable"
+
+# Paquete de arranque de index.html (/api/bootstrap)
+paquetes = paquete_inicial.PaqueteInicial(cache)
+
+# Índice de búsqueda; cada colección se reindexa cuando cambia su archivo
+buscador = busqueda.Buscador()
 
 # Archivos permitidos para guardar (seguridad)
 ALLOWED_FILES = {
@@ -45,17 +231,229 @@ ALLOWED_FILES = {
 }
 
 
+def responder_entrada(entrada, request, media_type, vary="Accept-Encoding"):
+    """
+    Respuesta para una entrada de caché: 304 si el ETag coincide y, si no,
+    el cuerpo en la mejor codificación aceptada por el cliente. Cada
+    codificación tiene su ETag (compresion.etag_codificado); en
+    If-None-Match vale cualquiera de ellos.
+    """
+    codificacion = compresion.elegir_codificacion(
+        request.headers.get("accept-encoding"), entrada.codificaciones()
+    )
+    cabeceras = {"ETag": compresion.etag_codificado(entrada.etag, codificacion),
+                 "Cache-Control": "no-cache", "Vary": vary}
+    if etag_coincide(request.headers.get("if-none-match"), *compresion.variantes_etag(entrada.etag)):
+        return Response(status_code=304, headers=cabeceras)
+    
+    if codificacion is None:
+        return Response(entrada.cuerpo, media_type=media_type, headers=cabeceras)
+    cabeceras["Content-Encoding"] = codificacion
+    return Response(entrada.codificado(codificacion), media_type=media_type, headers=cabeceras)
+
+
+def responder_datos(entrada, request):
+    """
+    Respuesta para datos JSON negociando el formato: MessagePack con tabla
+    de textos si el cliente lo pide en Accept y JSON en otro caso.
+    """
+    if binario.prefiere_binario(request.headers.get("accept")):
+        return responder_entrada(entrada.binaria(), request, binario.TIPO, vary="Accept, Accept-Encoding")
+    return responder_entrada(entrada, request, "application/json", vary="Accept, Accept-Encoding")
+
+
+def responder_ndjson(entrada, request):
+    """
+    Respuesta en streaming con un registro por línea (ndjson.py). Se
+    comprime con gzip sobre la marcha si el cliente lo acepta.
+    """
+    etag = ndjson.etag(entrada)
+    codificacion = compresion.elegir_codificacion(request.headers.get("accept-encoding"), ("gzip",))
+    cabeceras = {"ETag": compresion.etag_codificado(etag, codificacion), "Cache-Control": "no-cache",
+                 "Vary": "Accept, Accept-Encoding", "X-Accel-Buffering": "no"}
+    if etag_coincide(request.headers.get("if-none-match"), *compresion.variantes_etag(etag)):
+        return Response(status_code=304, headers=cabeceras)
+
+    cuerpo = ndjson.lineas(entrada.datos)
+    if codificacion is not None:
+        cuerpo = compresion.comprimir_flujo(cuerpo)
+        cabeceras["Content-Encoding"] = codificacion
+    return StreamingResponse(cuerpo, media_type=ndjson.TIPO, headers=cabeceras)
+
+
+def pagina_con_activos(nombre):
+    """
+    Entrada de caché de una página HTML con sus referencias a imágenes
+    reescritas según data/activos/manifest.json.
+
+    Para index.html se usa la versión reescrita por la etapa activos (con
+    sus hermanos precomprimidos) mientras no sea más antigua que la página
+    ni que el manifiesto. Si no, se reescribe aquí y se recalcula solo
+    cuando cambia la página o el manifiesto.
+    """
+    pagina = cache_paginas.obtener(nombre)
+    if pagina is None:
+        return None
+    manifiesto = cache.obtener(activos.MANIFIESTO[len("data/"):])
+    if nombre == activos.PAGINA:
+        construida = cache.obtener(activos.PAGINA_REESCRITA[len("data/"):])
+        if (construida is not None and construida.mtime_ns >= pagina.mtime_ns
+                and (manifiesto is None or construida.mtime_ns >= manifiesto.mtime_ns)):
+            return construida
+    firma = (pagina.etag, manifiesto.etag if manifiesto is not None else None)
+    guardada = paginas_con_activos.get(nombre)
+    if guardada is not None and guardada[0] == firma:
+        return guardada[1]
+    cuerpo = activos.reescribir_pagina(pagina.cuerpo, manifiesto.datos if manifiesto is not None else {})
+    entrada = EntradaCache(None, cuerpo, 0, len(cuerpo))
+    paginas_con_activos[nombre] = (firma, entrada)
+    return entrada
+
+
+class ConvertidorColeccion(Convertor):
+    """Solo casa con los nombres de colección, para no tapar otras rutas /api/..."""
+    regex = "|".join(indices.COLECCIONES)
+
+    def convert(self, value):
+        return value
+
+    def to_string(self, value):
+        return value
+
+
+register_url_convertor("coleccion", ConvertidorColeccion())
+
+
 class SaveRequest(BaseModel):
     ruta: str
     datos: Dict[str, Any] | List[Any]
 
 
+class SaveBatchRequest(BaseModel):
+    archivos: List[SaveRequest]
+
+
+def escribir_json_lote(lote):
+    """
+    Serializa y escribe uno o varios archivos de data/ como una unidad y
+    encarga registrar la versión anterior de cada uno en el historial de
+    backups (en segundo plano, fuera del candado). Es bloqueante: se
+    ejecuta en el pool de escritura.
+
+    Args:
+        lote: lista de (nombre_archivo, datos, bytes anteriores, bytes nuevos);
+              los anteriores vienen de la caché y si son None se leen del
+              disco; si los nuevos son None se serializan los datos
+
+    Returns:
+        Los bytes escritos de cada archivo, en el mismo orden
+    """
+    escrituras = []
+    anteriores = []
+    for nombre_archivo, datos, anterior, cuerpo in lote:
+        file_path = DATA_DIR / nombre_archivo
+        
+        # La versión actual se lee antes de sobrescribirla
+        if anterior is None and file_path.exists():
+            anterior = file_path.read_bytes()
+        anteriores.append(anterior)
+    
+    # Serializar y guardar los archivos (temporales + fsync + renames atómicos)
+    etiqueta = lote[0][0] if len(lote) == 1 else "lote"
+    with metricas.GUARDADOS.medir(archivo=etiqueta):
+        for (nombre_archivo, datos, _, cuerpo), anterior in zip(lote, anteriores):
+            if cuerpo is None:
+                cuerpo = codec_json.volcar(datos)
+            escrituras.append((DATA_DIR / nombre_archivo, cuerpo, anterior))
+        escritura.escribir_lote(escrituras)
+
+    # Registrar en el historial las versiones sobrescritas
+    for (nombre_archivo, *_), anterior in zip(lote, anteriores):
+        if anterior is not None:
+            backups.en_segundo_plano(registrar_version, nombre_archivo, anterior)
+    return [cuerpo for _, cuerpo, _ in escrituras]
+
+
+def registrar_version(nombre_archivo, cuerpo):
+    """Añade una versión al historial de backups (en el hilo de backups)"""
+    with metricas.BACKUPS.medir(archivo=nombre_archivo):
+        backups.almacen.guardar(nombre_archivo, cuerpo)
+
+
+async def guardar_json(nombre_archivo, datos):
+    """
+    Guarda un archivo de data/ sin bloquear el bucle de eventos y actualiza
+    la caché. Los guardados del mismo archivo se serializan con su candado.
+
+    Returns:
+        La entrada de caché con el contenido recién escrito
+    """
+    async with escritura.candado(nombre_archivo):
+        return await _guardar_sin_candado(nombre_archivo, datos)
+
+
+async def guardar_lote(archivos):
+    """
+    Guarda varios archivos de data/ a la vez. Los candados se toman en orden
+    alfabético para que dos lotes concurrentes no se bloqueen entre sí.
+
+    Args:
+        archivos: lista de (nombre_archivo, datos)
+
+    Returns:
+        Las entradas de caché de cada archivo, en el mismo orden
+    """
+    async with contextlib.AsyncExitStack() as pila:
+        for nombre_archivo in sorted(nombre for nombre, _ in archivos):
+            await pila.enter_async_context(escritura.candado(nombre_archivo))
+        return await _guardar_lote_sin_candado(archivos)
+
+
+async def _guardar_sin_candado(nombre_archivo, datos):
+    """Guardado de un solo archivo; quien llama ya tiene su candado"""
+    entradas = await _guardar_lote_sin_candado([(nombre_archivo, datos)])
+    return entradas[0]
+
+
+async def _guardar_lote_sin_candado(archivos, cuerpos=None):
+    """
+    Escritura, actualización de caché, notificación y reprocesado (una sola
+    vez para todo el lote); quien llama ya tiene los candados. cuerpos, si
+    se indica, trae ya los bytes a escribir de cada archivo (o None).
+    """
+    anteriores = [cache.obtener(nombre) for nombre, _ in archivos]
+    cuerpos = cuerpos or [None] * len(archivos)
+    cuerpos = await escritura.en_hilo(escribir_json_lote, [
+        (nombre, datos, anterior.cuerpo if anterior else None, cuerpo)
+        for (nombre, datos), anterior, cuerpo in zip(archivos, anteriores, cuerpos)
+    ])
+    
+    entradas = []
+    for (nombre_archivo, datos), anterior, cuerpo in zip(archivos, anteriores, cuerpos):
+        entrada = cache.actualizar(nombre_archivo, cuerpo, datos)
+        notificados[nombre_archivo] = entrada
+        entradas.append(entrada)
+    cola_reprocesado.encolar(*(f"data/{nombre}" for nombre, _ in archivos))
+
+    # Los archivos ya están en disco: un fallo al notificar no puede
+    # convertir el guardado en un error para el cliente
+    for (nombre_archivo, datos), anterior, entrada in zip(archivos, anteriores, entradas):
+        try:
+            ids = None
+            if anterior is not None:
+                ids = await escritura.en_hilo(eventos.ids_cambiados, anterior.datos, datos)
+            canal_eventos.cambio(f"data/{nombre_archivo}", entrada.etag, ids)
+        except Exception as e:
+            print(f"✗ No se pudo notificar el cambio de {nombre_archivo}: {e}")
+    return entradas
+
+
 @app.get("/", response_class=HTMLResponse)
-async def root():
-    """Sirve el archivo index.html como página principal."""
-    index_path = BASE_DIR / "index.html"
-    if index_path.exists():
-        return FileResponse(index_path, media_type="text/html")
+async def root(request: Request):
+    """Sirve el archivo index.html como página principal, con las imágenes con huella."""
+    entrada = pagina_con_activos("index.html")
+    if entrada is not None:
+        return responder_entrada(entrada, request, "text/html; charset=utf-8")
     else:
         return HTMLResponse(
             content="<h1>Error</h1><p>index.html no encontrado</p>",
@@ -93,22 +491,14 @@ async def save_file(request: SaveRequest):
                 detail="Ruta no permitida"
             )
         
-        # Crear backup antes de guardar
-        if file_path.exists():
-            backup_path = file_path.with_suffix('.json.bak')
-            with open(file_path, 'r', encoding='utf-8') as f:
-                backup_data = f.read()
-            with open(backup_path, 'w', encoding='utf-8') as f:
-                f.write(backup_data)
-        
-        # Guardar el archivo
-        with open(file_path, 'w', encoding='utf-8') as f:
-            json.dump(request.datos, f, ensure_ascii=False, indent=2)
+        # Crear backup y guardar el archivo
+        entrada = await guardar_json(nombre_archivo, request.datos)
         
         return {
             "success": True,
             "message": f"✓ {request.ruta} guardado correctamente",
-            "archivo": nombre_archivo
+            "archivo": nombre_archivo,
+            "etag": entrada.etag
         }
     
     except HTTPException:
@@ -120,6 +510,172 @@ async def save_file(request: SaveRequest):
         )
 
 
+@app.post("/api/save/batch")
+async def save_batch(request: SaveBatchRequest):
+    """
+    Guarda varios archivos JSON en una sola petición.
+
+    Se validan todos antes de escribir nada; después se escriben como una
+    unidad (si uno falla, ninguno cambia) y el reprocesado se lanza una vez.
+    """
+    nombres = [archivo.ruta.split("/")[-1] for archivo in request.archivos]
+    if not nombres:
+        raise HTTPException(status_code=400, detail="El lote está vacío")
+    no_permitidos = [nombre for nombre in nombres if nombre not in ALLOWED_FILES]
+    if no_permitidos:
+        raise HTTPException(
+            status_code=403,
+            detail=f"Archivos no permitidos: {', '.join(no_permitidos)}"
+        )
+    if len(set(nombres)) != len(nombres):
+        raise HTTPException(status_code=400, detail="Un archivo aparece más de una vez en el lote")
+    
+    try:
+        entradas = await guardar_lote([
+            (nombre, archivo.datos) for nombre, archivo in zip(nombres, request.archivos)
+        ])
+    except Exception as e:
+        raise HTTPException(
+            status_code=500,
+            detail=f"Error al guardar el lote (no se ha modificado ningún archivo): {str(e)}"
+        )
+    
+    return {
+        "success": True,
+        "message": f"✓ {len(nombres)} archivos guardados correctamente",
+        "archivos": [
+            {"archivo": nombre, "etag": entrada.etag}
+            for nombre, entrada in zip(nombres, entradas)
+        ]
+    }
+
+
+@app.patch("/api/data/{nombre_archivo}")
+async def patch_file(nombre_archivo: str, request: Request):
+    """
+    Modifica parcialmente un archivo de datos.
+
+    El cuerpo puede ser:
+      - una lista de operaciones JSON Patch (RFC 6902), o
+      - un objeto {"upsert": [registros], "eliminar": [ids]} que inserta o
+        reemplaza registros por 'id' en las colecciones.
+
+    El resultado se valida con el esquema del archivo (422 si no encaja).
+    Si se envía If-Match, el cambio solo se aplica si el archivo sigue en
+    esa versión (412 en otro caso).
+    """
+    if nombre_archivo not in ALLOWED_FILES:
+        raise HTTPException(
+            status_code=403,
+            detail=f"Archivo no permitido: {nombre_archivo}"
+        )
+
+    try:
+        cambios = codec_json.cargar(await request.body())
+    except ValueError:
+        raise HTTPException(status_code=400, detail="El cuerpo no es JSON válido")
+
+    async with escritura.candado(nombre_archivo):
+        entrada = cache.obtener(nombre_archivo)
+        if entrada is None:
+            raise HTTPException(status_code=404, detail="Archivo no encontrado")
+
+        if_match = request.headers.get("if-match")
+        if if_match and not etag_coincide(if_match, *compresion.variantes_etag(entrada.etag)):
+            raise HTTPException(
+                status_code=412,
+                detail="El archivo ha cambiado desde la versión indicada en If-Match"
+            )
+
+        try:
+            if isinstance(cambios, dict):
+                if not cambios or not set(cambios) <= {"upsert", "eliminar"}:
+                    raise json_patch.ErrorPatch("Se esperaba {'upsert': [...], 'eliminar': [...]}")
+                datos = json_patch.aplicar_upserts(
+                    entrada.datos,
+                    cambios.get("upsert", []),
+                    cambios.get("eliminar", [])
+                )
+                operaciones = len(cambios.get("upsert", [])) + len(cambios.get("eliminar", []))
+            else:
+                datos = json_patch.aplicar_patch(entrada.datos, cambios)
+                operaciones = len(cambios)
+        except json_patch.PruebaFallida as e:
+            raise HTTPException(status_code=409, detail=str(e))
+        except json_patch.ErrorPatch as e:
+            raise HTTPException(status_code=422, detail=str(e))
+
+        # El resultado tiene que cumplir el esquema igual que un PUT
+        try:
+            await escritura.en_hilo(esquemas.validar, nombre_archivo, datos)
+        except esquemas.ErrorEsquema as e:
+            raise HTTPException(status_code=422, detail=str(e))
+
+        try:
+            entrada = await _guardar_sin_candado(nombre_archivo, datos)
+        except Exception as e:
+            raise HTTPException(
+                status_code=500,
+                detail=f"Error al guardar archivo: {str(e)}"
+            )
+
+    return {
+        "success": True,
+        "message": f"✓ data/{nombre_archivo} actualizado ({operaciones} cambios)",
+        "archivo": nombre_archivo,
+        "etag": entrada.etag
+    }
+
+
+@app.put("/api/data/{nombre_archivo}")
+async def put_file(nombre_archivo: str, request: Request):
+    """
+    Guarda un archivo completo enviando su contenido JSON como cuerpo.
+
+    Es la vía rápida para archivos grandes: no pasa por pydantic, el cuerpo
+    se parsea una sola vez y se valida con el esquema del archivo
+    (esquemas.py). Se escribe tal cual solo si coincide byte a byte con la
+    serialización canónica; si no, se guarda reserializado. Admite If-Match
+    como PATCH.
+    """
+    if nombre_archivo not in ALLOWED_FILES:
+        raise HTTPException(
+            status_code=403,
+            detail=f"Archivo no permitido: {nombre_archivo}"
+        )
+
+    cuerpo = await request.body()
+    try:
+        datos = await escritura.en_hilo(esquemas.validar_cuerpo, nombre_archivo, cuerpo)
+    except esquemas.ErrorEsquema as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    cuerpo = await escritura.en_hilo(esquemas.cuerpo_canonico, cuerpo, datos)
+
+    async with escritura.candado(nombre_archivo):
+        if_match = request.headers.get("if-match")
+        if if_match:
+            entrada = cache.obtener(nombre_archivo)
+            if entrada is None or not etag_coincide(if_match, *compresion.variantes_etag(entrada.etag)):
+                raise HTTPException(
+                    status_code=412,
+                    detail="El archivo ha cambiado desde la versión indicada en If-Match"
+                )
+        try:
+            entradas = await _guardar_lote_sin_candado([(nombre_archivo, datos)], [cuerpo])
+        except Exception as e:
+            raise HTTPException(
+                status_code=500,
+                detail=f"Error al guardar archivo: {str(e)}"
+            )
+
+    return {
+        "success": True,
+        "message": f"✓ data/{nombre_archivo} guardado correctamente",
+        "archivo": nombre_archivo,
+        "etag": entradas[0].etag
+    }
+
+
 @app.get("/api/files")
 async def list_files():
     """Lista los archivos JSON disponibles."""
@@ -141,12 +697,73 @@ async def list_files():
     return {"archivos": files}
 
 
+@app.get("/api/backups/{nombre_archivo}")
+async def list_backups(nombre_archivo: str):
+    """Lista las versiones guardadas de un archivo (la más reciente al final)."""
+    if nombre_archivo not in ALLOWED_FILES:
+        raise HTTPException(status_code=403, detail=f"Archivo no permitido: {nombre_archivo}")
+    versiones = await escritura.en_hilo(backups.almacen.versiones, nombre_archivo)
+    return {"archivo": nombre_archivo, "versiones": versiones}
+
+
+def buscar_version(nombre_archivo, hash_version):
+    """Hash completo de una versión del archivo a partir de un prefijo"""
+    if nombre_archivo not in ALLOWED_FILES:
+        raise HTTPException(status_code=403, detail=f"Archivo no permitido: {nombre_archivo}")
+    coincidencias = backups.almacen.coincidencias(nombre_archivo, hash_version)
+    if len(coincidencias) != 1:
+        raise HTTPException(status_code=404, detail="Versión no encontrada")
+    return coincidencias[0]
+
+
+@app.get("/api/backups/{nombre_archivo}/{hash_version}")
+async def get_backup(nombre_archivo: str, hash_version: str):
+    """Contenido de una versión guardada."""
+    hash_completo = buscar_version(nombre_archivo, hash_version)
+    cuerpo = await escritura.en_hilo(backups.almacen.leer, hash_completo)
+    return Response(cuerpo, media_type="application/json", headers={"ETag": f'"{hash_completo}"'})
+
+
+@app.post("/api/backups/{nombre_archivo}/{hash_version}/restore")
+async def restore_backup(nombre_archivo: str, hash_version: str):
+    """Restaura una versión; la actual pasa al historial como en cualquier guardado."""
+    hash_completo = buscar_version(nombre_archivo, hash_version)
+    cuerpo = await escritura.en_hilo(backups.almacen.leer, hash_completo)
+    entrada = await guardar_json(nombre_archivo, codec_json.cargar(cuerpo))
+    return {
+        "success": True,
+        "message": f"✓ data/{nombre_archivo} restaurado a la versión {hash_completo[:12]}",
+        "archivo": nombre_archivo,
+        "etag": entrada.etag
+    }
+
+
+@app.get("/api/build/status")
+async def build_status():
+    """Estado del reprocesado en segundo plano de data/processed/."""
+    return cola_reprocesado.estado()
+
+
+@app.get("/api/events")
+async def events(request: Request):
+    """
+    Canal Server-Sent Events con un evento 'cambio' por cada archivo de
+    data/ escrito (fuente o procesado): {"archivo", "etag", "ids"}.
+    """
+    ultimo_id = request.headers.get("last-event-id") or None
+    return StreamingResponse(
+        canal_eventos.suscribir(ultimo_id),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
 @app.get("/timeline-editor", response_class=HTMLResponse)
-async def timeline_editor():
+async def timeline_editor(request: Request):
     """Sirve el editor de timeline."""
-    editor_path = BASE_DIR / "timeline_editor.html"
-    if editor_path.exists():
-        return FileResponse(editor_path, media_type="text/html")
+    entrada = cache_paginas.obtener("timeline_editor.html")
+    if entrada is not None:
+        return responder_entrada(entrada, request, "text/html; charset=utf-8")
     else:
         return HTMLResponse(
             content="<h1>Error</h1><p>timeline_editor.html no encontrado</p>",
@@ -167,24 +784,14 @@ async def save_timeline(request: SaveRequest):
                 detail="Este endpoint solo guarda timeline.json"
             )
         
-        file_path = DATA_DIR / "timeline.json"
-        
-        # Crear backup antes de guardar
-        if file_path.exists():
-            backup_path = file_path.with_suffix('.json.bak')
-            with open(file_path, 'r', encoding='utf-8') as f:
-                backup_data = f.read()
-            with open(backup_path, 'w', encoding='utf-8') as f:
-                f.write(backup_data)
-        
-        # Guardar el archivo
-        with open(file_path, 'w', encoding='utf-8') as f:
-            json.dump(request.datos, f, ensure_ascii=False, indent=2)
+        # Crear backup y guardar el archivo
+        entrada = await guardar_json("timeline.json", request.datos)
         
         return {
             "success": True,
             "message": "✓ Timeline guardado correctamente",
-            "archivo": "timeline.json"
+            "archivo": "timeline.json",
+            "etag": entrada.etag
         }
     
     except HTTPException:
@@ -196,24 +803,161 @@ async def save_timeline(request: SaveRequest):
         )
 
 
+@app.get("/metrics")
+async def metrics():
+    """Métricas del servidor en formato de texto de Prometheus."""
+    return Response(metricas.exponer(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
+
+@app.get("/api/bootstrap")
+async def bootstrap(request: Request, partes: str = "fuentes,procesados"):
+    """
+    Todos los datos del primer render en una sola respuesta con un único
+    ETag: los archivos fuente y/o los procesados (incluidos network_data y
+    timeline_visual_data), según partes.
+    """
+    elegidas = [p for p in partes.split(",") if p]
+    desconocidas = [p for p in elegidas if p not in paquete_inicial.PARTES]
+    if not elegidas or desconocidas:
+        raise HTTPException(
+            status_code=400,
+            detail=f"partes debe ser una lista de: {', '.join(paquete_inicial.PARTES)}"
+        )
+    return responder_datos(paquetes.obtener(elegidas), request)
+
+
+@app.get("/api/search")
+def search(q: str, limite: int = 20, colecciones: str | None = None):
+    """
+    Búsqueda de texto insensible a tildes y a variantes (plural, género)
+    en los campos de texto de todas las colecciones. Devuelve los
+    resultados ordenados por relevancia con el campo y un fragmento.
+    Se ejecuta en el pool de hilos de FastAPI (función síncrona).
+    """
+    if not 1 <= limite <= 100:
+        raise HTTPException(status_code=400, detail="limite debe estar entre 1 y 100")
+    elegidas = None
+    if colecciones:
+        elegidas = set(colecciones.split(","))
+        desconocidas = elegidas - set(busqueda.COLECCIONES)
+        if desconocidas:
+            raise HTTPException(status_code=400, detail=f"Colecciones desconocidas: {', '.join(sorted(desconocidas))}")
+    
+    for coleccion, archivo in busqueda.COLECCIONES.items():
+        if elegidas is None or coleccion in elegidas:
+            buscador.actualizar(coleccion, cache.obtener(archivo))
+    resultados = buscador.buscar(q, limite, elegidas)
+    return {"consulta": q, "total": len(resultados), "resultados": resultados}
+
+
+@app.get("/api/{coleccion:coleccion}")
+async def query_collection(coleccion: str, request: Request):
+    """
+    Consulta una colección usando índices en memoria.
+
+    Cualquier parámetro que no sea campos, limite o cursor es un filtro:
+    ?etapa=inventrola&personajes_implicados=sismico. Los filtros sobre
+    campos distintos se combinan con AND; varios valores del mismo campo
+    (repetido o separados por comas) con OR. Los campos id, etiquetas,
+    etapa, personajes_implicados y localizacion usan índice.
+    """
+    parametros = request.query_params
+    filtros = {}
+    for campo, valor in parametros.multi_items():
+        if campo not in ("campos", "limite", "cursor"):
+            filtros.setdefault(campo, []).extend(v for v in valor.split(",") if v)
+    campos = [c for c in parametros.get("campos", "").split(",") if c] or None
+    
+    entrada = cache.obtener(indices.COLECCIONES[coleccion])
+    if entrada is None:
+        raise HTTPException(status_code=404, detail="Archivo no encontrado")
+    try:
+        limite = int(parametros.get("limite", indices.LIMITE_POR_DEFECTO))
+        indice = indices.indice_de(coleccion, entrada)
+        resultado = indices.consultar(indice, filtros, campos, limite, parametros.get("cursor"))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    return {"coleccion": coleccion, "version": entrada.etag, **resultado}
+
+
+@app.api_route("/data/{ruta:path}.json", methods=["GET", "HEAD"])
+async def servir_json(ruta: str, request: Request):
+    """
+    Sirve los JSON de data/ desde la caché en memoria.
+
+    Responde con ETag fuerte basado en el contenido, devuelve 304 si el
+    cliente ya tiene esa versión (If-None-Match) y envía la versión
+    precomprimida que acepte el cliente. Con Accept: application/msgpack
+    envía la versión binaria (binario.py) y con application/x-ndjson los
+    registros uno por línea en streaming (ndjson.py).
+    """
+    entrada = cache.obtener(f"{ruta}.json")
+    if entrada is None:
+        raise HTTPException(status_code=404, detail="Archivo no encontrado")
+    if ndjson.prefiere_ndjson(request.headers.get("accept")):
+        return responder_ndjson(entrada, request)
+    return responder_datos(entrada, request)
+
+
+@app.api_route("/data/activos/{ruta:path}", methods=["GET", "HEAD"])
+async def servir_activo(ruta: str):
+    """
+    Sirve los recursos con huella de contenido como inmutables: el navegador
+    los guarda un año sin revalidar (otro contenido tendría otro nombre).
+    """
+    directorio = (BASE_DIR / activos.DIRECTORIO).resolve()
+    archivo = (directorio / ruta).resolve()
+    if directorio not in archivo.parents or not archivo.is_file():
+        raise HTTPException(status_code=404, detail="Archivo no encontrado")
+    return FileResponse(archivo, headers={"Cache-Control": CACHE_INMUTABLE})
+
+
+# Los montajes estáticos van después de las rutas para que /data/*.json
+# pase por la caché y el resto de /data (imágenes) se sirva tal cual
+app.mount("/data", StaticFiles(directory=str(DATA_DIR)), name="data")
+
+# Montar directorio raíz para servir archivos HTML como timeline_editor.html
+app.mount("/static", StaticFiles(directory=str(BASE_DIR)), name="static")
+
+
 if __name__ == "__main__":
+    import argparse
     import uvicorn
-    import sys
+    
+    parser = argparse.ArgumentParser(description="Servidor de Radio Micelio")
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--workers", type=int, default=None,
+                        help="Modo producción: número de procesos, sin recarga automática")
+    args = parser.parse_args()
     
     print("🚀 Iniciando servidor FastAPI...")
     print(f"📁 Directorio de datos: {DATA_DIR}")
-    print("🌐 Servidor disponible en: http://localhost:8000")
-    print("📄 Interfaz web: http://localhost:8000/")
-    print("📚 Documentación API: http://localhost:8000/docs")
-    print("\n💡 Para ejecutar con uvicorn directamente (recomendado):")
-    print("   uvicorn server:app --host 0.0.0.0 --port 8000 --reload\n")
+    print(f"🌐 Servidor disponible en: http://localhost:{args.port}")
+    print(f"📄 Interfaz web: http://localhost:{args.port}/")
+    print(f"📚 Documentación API: http://localhost:{args.port}/docs")
     
-    # Usar import string para que funcione con uvicorn
-    uvicorn.run(
-        "server:app",
-        host="0.0.0.0",
-        port=8000,
-        reload=True,
-        log_level="info"
-    )
-
+    if args.workers is None:
+        print("\n💡 Para ejecutar con uvicorn directamente (recomendado):")
+        print("   uvicorn server:app --host 0.0.0.0 --port 8000 --reload\n")
+        # Usar import string para que funcione con uvicorn
+        uvicorn.run(
+            "server:app",
+            host=args.host,
+            port=args.port,
+            reload=True,
+            log_level="info"
+        )
+    else:
+        # Los workers heredan la variable y activan la vigilancia entre procesos
+        os.environ["RADIO_MICELIO_WORKERS"] = str(args.workers)
+        print(f"🏭 Modo producción: {args.workers} workers, sin recarga automática\n")
+        uvicorn.run(
+            "server:app",
+            host=args.host,
+            port=args.port,
+            workers=args.workers,
+            reload=False,
+            log_level="info"
+        )
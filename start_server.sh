@@ -1,5 +1,13 @@
 #!/bin/bash
 # Script para iniciar el servidor FastAPI con uvicorn
+#
+# Uso:
+#   ./start_server.sh                  # desarrollo, con recarga automática
+#   ./start_server.sh --produccion [N] # N workers (4 por defecto), sin recarga
+
+if [ "$1" = "--produccion" ]; then
+    exec python server.py --workers "${2:-4}"
+fi
 
 echo "🚀 Iniciando servidor FastAPI..."
 echo "📁 Directorio de datos: $(pwd)/data"
@@ -10,4 +18,3 @@ echo ""
 
 uvicorn server:app --host 0.0.0.0 --port 8000 --reload
 
-
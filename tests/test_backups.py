@@ -0,0 +1,43 @@
+import backups
+
+
+def test_restaurar_version_que_reaparece(tmp_path):
+    almacen = backups.AlmacenBackups(tmp_path)
+    a = b'[{"id": "a"}]'
+    b = b'[{"id": "a"}, {"id": "b"}]'
+    hash_a = almacen.guardar('personajes.json', a, fecha='2026-01-01T00:00:00')
+    almacen.guardar('personajes.json', b, fecha='2026-01-01T00:01:00')
+    almacen.guardar('personajes.json', a, fecha='2026-01-01T00:02:00')
+
+    assert [v['hash'] for v in almacen.versiones('personajes.json')].count(hash_a) == 2
+    assert almacen.coincidencias('personajes.json', hash_a[:12]) == [hash_a]
+    assert almacen.leer(hash_a) == a
+
+
+def test_restaurar_desde_la_linea_de_ordenes(tmp_path, monkeypatch):
+    almacen = backups.AlmacenBackups(tmp_path / 'backups')
+    monkeypatch.setattr(backups, 'almacen', almacen)
+    monkeypatch.setattr(backups, 'BASE_DIR', tmp_path)
+    (tmp_path / 'data').mkdir()
+    a, b = b'{"v": 1}', b'{"v": 2}'
+    hash_a = almacen.guardar('introduccion.json', a)
+    almacen.guardar('introduccion.json', b)
+    almacen.guardar('introduccion.json', a)
+    (tmp_path / 'data' / 'introduccion.json').write_bytes(b)
+
+    assert backups.main(['restaurar', 'introduccion.json', hash_a[:8]]) == 0
+    assert (tmp_path / 'data' / 'introduccion.json').read_bytes() == a
+
+
+def test_sin_delta_si_la_base_supera_la_ventana_de_zlib(tmp_path):
+    almacen = backups.AlmacenBackups(tmp_path)
+    pequeno = b'{"texto": "%s"}' % (b'a' * 100)
+    grande = b'{"texto": "%s"}' % (b'b' * (backups.MAX_BASE_DELTA + 1))
+    almacen.guardar('tramas.json', pequeno)
+    hash_delta = almacen.guardar('tramas.json', pequeno + b' ')
+    almacen.guardar('tramas.json', grande)
+    hash_completo = almacen.guardar('tramas.json', grande + b' ')
+
+    assert almacen._cabecera(hash_delta) is not None
+    assert almacen._cabecera(hash_completo) is None
+    assert almacen.leer(hash_completo) == grande + b' '
@@ -0,0 +1,33 @@
+import asyncio
+
+import reprocesado
+
+
+def test_un_error_al_terminar_no_para_la_cola(tmp_path, monkeypatch):
+    # preprocess_all.py de mentira: solo informa de su única etapa
+    (tmp_path / 'preprocess_all.py').write_text("print('Ejecutado: etapa.py')\n")
+    monkeypatch.setattr(reprocesado, 'BASE_DIR', tmp_path)
+    monkeypatch.setattr(reprocesado.preprocess_all, 'etapas_afectadas',
+                        lambda cambios: [{'script': 'etapa.py', 'nombre': 'etapa'}])
+    llamadas = []
+
+    def al_terminar(etapas):
+        llamadas.append(etapas)
+        raise RuntimeError("fallo al notificar")
+
+    async def construir_dos_veces():
+        cola = reprocesado.ColaReprocesado(debounce=0.01, al_terminar=al_terminar)
+        for veces in (1, 2):
+            cola.encolar('data/tramas.json')
+            while cola.construcciones < veces:
+                await asyncio.sleep(0.01)
+        # El trabajador sigue vivo tras los dos errores
+        assert not cola._tarea.done()
+        cola._tarea.cancel()
+        return cola
+
+    cola = asyncio.run(asyncio.wait_for(construir_dos_veces(), 30))
+    assert len(llamadas) == 2
+    assert cola.construcciones == 2
+    assert cola.estado()['estado'] == 'inactivo'
+    assert cola.ultima['exito']
@@ -0,0 +1,188 @@
+#!/usr/bin/env python3
+"""
+Vigilancia de cambios en archivos para el modo --watch del preprocesamiento.
+
+En Linux usa inotify (vía ctypes, sin dependencias externas); en otros
+sistemas, o si inotify no está disponible, recurre a sondeo de mtimes.
+Ambos vigilantes devuelven rutas relativas a la base con '/' como separador.
+"""
+
+import ctypes
+import ctypes.util
+import os
+import select
+import struct
+import time
+from pathlib import Path
+
+# Constantes de <sys/inotify.h>
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_ISDIR = 0x40000000
+IN_Q_OVERFLOW = 0x00004000
+
+MASCARA = IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE
+EVENTO = struct.Struct('iIII')
+
+
+def es_relevante(ruta):
+    """Descarta temporales, copias de seguridad y archivos ocultos"""
+    nombre = ruta.rsplit('/', 1)[-1]
+    return not (nombre.startswith('.') or nombre.endswith(('~', '.tmp', '.swp'))
+                or '.bak' in nombre)
+
+
+class VigilanteInotify:
+    """Vigila directorios con inotify; los de 'arboles' incluyen sus subdirectorios"""
+
+    def __init__(self, base, directorios=(), arboles=()):
+        self.base = Path(base)
+        libc_nombre = ctypes.util.find_library('c')
+        if not libc_nombre:
+            raise OSError("libc no encontrada")
+        self._libc = ctypes.CDLL(libc_nombre, use_errno=True)
+        self._fd = self._libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self._fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 falló")
+        self._directorios = {}
+        self._arboles = set()
+        for directorio in directorios:
+            self._agregar(self.base / directorio)
+        for directorio in arboles:
+            self._arboles.add(self.base / directorio)
+            self._agregar_arbol(self.base / directorio)
+
+    def _agregar(self, directorio):
+        """Registra un único directorio"""
+        wd = self._libc.inotify_add_watch(self._fd, os.fsencode(directorio), MASCARA)
+        if wd < 0:
+            raise OSError(ctypes.get_errno(), f"inotify_add_watch falló en {directorio}")
+        self._directorios[wd] = Path(directorio)
+
+    def _agregar_arbol(self, directorio):
+        """Registra un directorio y sus subdirectorios"""
+        for actual, _, _ in os.walk(directorio):
+            self._agregar(actual)
+
+    def esperar(self, timeout=None):
+        """Espera eventos hasta timeout segundos y devuelve las rutas cambiadas"""
+        listos, _, _ = select.select([self._fd], [], [], timeout)
+        if not listos:
+            return set()
+
+        cambios = set()
+        while True:
+            try:
+                buffer = os.read(self._fd, 64 * 1024)
+            except BlockingIOError:
+                break
+            desplazamiento = 0
+            while desplazamiento < len(buffer):
+                wd, mascara, _, longitud = EVENTO.unpack_from(buffer, desplazamiento)
+                desplazamiento += EVENTO.size
+                nombre = buffer[desplazamiento:desplazamiento + longitud].rstrip(b'\0')
+                desplazamiento += longitud
+
+                if mascara & IN_Q_OVERFLOW:
+                    # Se perdieron eventos: marcar cada directorio vigilado como cambiado
+                    cambios.update(self._relativa(d) + '/' for d in self._directorios.values())
+                    continue
+                directorio = self._directorios.get(wd)
+                if directorio is None or not nombre:
+                    continue
+                ruta = directorio / os.fsdecode(nombre)
+                if mascara & IN_ISDIR:
+                    if mascara & (IN_CREATE | IN_MOVED_TO) and self._en_arbol(directorio):
+                        self._agregar_arbol(ruta)
+                    continue
+                relativa = self._relativa(ruta)
+                if es_relevante(relativa):
+                    cambios.add(relativa)
+        return cambios
+
+    def _en_arbol(self, directorio):
+        """Indica si el directorio pertenece a algún árbol vigilado"""
+        return any(directorio == a or a in directorio.parents for a in self._arboles)
+
+    def _relativa(self, ruta):
+        return ruta.relative_to(self.base).as_posix()
+
+    def cerrar(self):
+        os.close(self._fd)
+
+
+class VigilanteSondeo:
+    """Vigila directorios comparando mtimes y tamaños periódicamente"""
+
+    def __init__(self, base, directorios=(), arboles=(), intervalo=0.25):
+        self.base = Path(base)
+        self.directorios = [self.base / d for d in directorios]
+        self.arboles = [self.base / d for d in arboles]
+        self.intervalo = intervalo
+        self._estado = self._instantanea()
+
+    def _instantanea(self):
+        rutas = []
+        for directorio in self.directorios:
+            if directorio.is_dir():
+                rutas.extend(p for p in directorio.iterdir() if p.is_file())
+        for directorio in self.arboles:
+            for actual, _, archivos in os.walk(directorio):
+                rutas.extend(Path(actual) / nombre for nombre in archivos)
+
+        estado = {}
+        for ruta in rutas:
+            try:
+                info = ruta.stat()
+            except FileNotFoundError:
+                continue
+            estado[ruta.relative_to(self.base).as_posix()] = (info.st_mtime_ns, info.st_size)
+        return estado
+
+    def esperar(self, timeout=None):
+        """Sondea hasta detectar cambios o agotar timeout segundos"""
+        limite = None if timeout is None else time.monotonic() + timeout
+        while True:
+            nuevo = self._instantanea()
+            cambios = {
+                ruta for ruta in set(nuevo) | set(self._estado)
+                if nuevo.get(ruta) != self._estado.get(ruta) and es_relevante(ruta)
+            }
+            self._estado = nuevo
+            if cambios:
+                return cambios
+            if limite is not None and time.monotonic() >= limite:
+                return set()
+            espera = self.intervalo if limite is None else min(self.intervalo, max(0, limite - time.monotonic()))
+            time.sleep(espera)
+
+    def cerrar(self):
+        pass
+
+
+def crear_vigilante(base, directorios=(), arboles=(), sondeo=False):
+    """Crea un vigilante inotify si es posible; si no, uno de sondeo"""
+    if not sondeo:
+        try:
+            return VigilanteInotify(base, directorios, arboles)
+        except (OSError, AttributeError):
+            pass
+    return VigilanteSondeo(base, directorios, arboles)
+
+
+def esperar_rafaga(vigilante, debounce):
+    """
+    Bloquea hasta el primer cambio y sigue acumulando mientras lleguen más
+    antes de que pasen debounce segundos sin actividad.
+    """
+    cambios = set()
+    while not cambios:
+        cambios = vigilante.esperar(None)
+    while True:
+        mas = vigilante.esperar(debounce)
+        if not mas:
+            return cambios
+        cambios |= mas